@@ -0,0 +1,31 @@
+"""index offers in stock by shop_id
+
+Revision ID: 9c1e4b7a2d35
+Revises: 5d0213c2e410
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9c1e4b7a2d35"
+down_revision = "5d0213c2e410"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        op.f("ix_offers_shop_id_in_stock"),
+        "offers",
+        ["shop_id"],
+        unique=False,
+        postgresql_where=sa.text("in_stock"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_offers_shop_id_in_stock"), table_name="offers")
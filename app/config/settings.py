@@ -1,8 +1,10 @@
+import socket
 from typing import Any
 
+from pydantic import Field, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
-from app.constants import Entity, LogFormatType
+from app.constants import CountryCode, Entity, LogFormatType, RedisQueueTransport
 
 
 class Settings(BaseSettings):
@@ -19,6 +21,21 @@ class Settings(BaseSettings):
     REDIS_PORT: int = 6379
     REDIS_USER: str = ""
     REDIS_PASSWORD: str = ""
+    # Transport of entity messages between consumers and workers
+    REDIS_QUEUE_TRANSPORT: RedisQueueTransport = RedisQueueTransport.LIST
+    # Messages are routed to per-country queues, messages without country
+    # go to the entity queue
+    REDIS_QUEUE_SHARD_BY_COUNTRY: bool = False
+    # Workers keep last applied version of offers and shops in Redis
+    REDIS_VERSION_MAP: bool = False
+    REDIS_VERSION_MAP_TTL: int = 6 * 60 * 60  # 6 hours in seconds
+    # Entities are written even if unchanged, stale versions are not dropped
+    FORCE_ENTITY_UPDATE: bool = False
+    # Batches failing on transient DB errors are retried with jittered exponential
+    # backoff, bad entities of batches failing on data errors go to dead-letter lists
+    RETRY_ATTEMPTS: int = 3
+    RETRY_BASE_DELAY: float = 0.1
+    RETRY_MAX_DELAY: float = 2
 
     PROMETHEUS_PORT: int = 9090
 
@@ -55,12 +72,73 @@ class ApiSettings(Settings):
 
 class WorkerSetting(Settings):
     WORKER_BUFFER_SIZE: int = 100
+    # Buffer is also flushed above this size of buffered raw messages, 0 disables it
+    WORKER_BUFFER_MAX_BYTES: int = 0
+    # Buffer is also flushed once its oldest message waits this long, 0 disables it
+    WORKER_BUFFER_MAX_LINGER: float = 0
     WORKER_POP_TIMEOUT: float = 0.2
     WORKER_MESSAGE_LOG_INTERVAL: int = 1000
+    WORKER_STREAM_GROUP: str = "workers"
+    WORKER_STREAM_CONSUMER: str = Field(default_factory=socket.gethostname)
+    # Messages pending longer than this are claimed from other (crashed) workers
+    WORKER_STREAM_CLAIM_MIN_IDLE_TIME_MS: int = 60_000
+    WORKER_STREAM_CLAIM_INTERVAL: float = 30
+    # Countries drained by the worker if queues are sharded by country, all by default
+    WORKER_COUNTRIES: list[CountryCode] = []
+    # Weights of countries in round-robin over their queues, 1 if not set
+    WORKER_COUNTRY_WEIGHTS: dict[CountryCode, int] = {}
+    # Offer and shop messages older than versions in the Redis version map
+    # are dropped before the DB
+    WORKER_DROP_STALE_VERSIONS: bool = False
+    # Redis reads, decoding and DB writes run as concurrent stages
+    WORKER_PIPELINE: bool = False
+    # Batches read from Redis waiting for decoding
+    WORKER_PIPELINE_READ_BUFFER_SIZE: int = 10
+    # Decoded buffers waiting for the DB writer
+    WORKER_PIPELINE_WRITE_BUFFER_SIZE: int = 2
+    # Buffer is split into shards written concurrently on their own DB connections,
+    # a divisor of 20 aligns offer shards with the offers hash partitions
+    WORKER_DB_CONCURRENCY: int = 1
+    # Create schemas are built from message fields without dumping the whole message
+    WORKER_FAST_DECODE: bool = True
+    # Buffer size adapts between the bounds, it grows while write latency per message
+    # falls and shrinks when a write or waiting for a full buffer takes too long
+    WORKER_ADAPTIVE_BUFFER_SIZE: bool = False
+    WORKER_ADAPTIVE_MIN_BUFFER_SIZE: int = 10
+    WORKER_ADAPTIVE_MAX_BUFFER_SIZE: int = 1000
+    WORKER_ADAPTIVE_MAX_WRITE_LATENCY: float = 1
+    # Max residence of the oldest message in the buffer, 0 disables it
+    WORKER_ADAPTIVE_MAX_BUFFER_AGE: float = 0
+    # Availability and buyable workers drop messages of offers missing in a Bloom filter
+    # of offer ids, offer workers broadcast ids of written offers to keep it updated
+    WORKER_OFFER_ID_FILTER: bool = False
+    WORKER_OFFER_ID_FILTER_CAPACITY: int = 20_000_000
+    WORKER_OFFER_ID_FILTER_ERROR_RATE: float = 0.01
+    # Messages are parsed and create schemas built in a pool of this many processes,
+    # 0 decodes them in the event loop
+    WORKER_DECODE_PROCESSES: int = 0
 
 
 class ServiceSettings(Settings):
-    FORCE_ENTITY_UPDATE: bool = False
+    # Versions and fingerprints of offers and shops seen in the DB are kept in
+    # a process-local LRU cache, messages proven unchanged by it are dropped without
+    # a DB read
+    SERVICE_ENTITY_CACHE: bool = False
+    SERVICE_ENTITY_CACHE_SIZE: int = 100_000
+    # Offers and shops are compared and upserted by one statement returning previous
+    # rows, instead of being read and compared before the upsert
+    SERVICE_CONDITIONAL_UPSERT: bool = False
+    # Offers in stock of shops changing certification are read by a server-side cursor
+    # and their price events sent in chunks of this size
+    SERVICE_SHOP_FAN_OUT_BATCH_SIZE: int = 5000
+    # Price events of the same product and price type superseded by other events
+    # of the batch are dropped before they are sent
+    SERVICE_COALESCE_PRICE_EVENTS: bool = False
+    # Price events are encoded in the fixed-layout binary format instead of JSON,
+    # the event job must be deployed first as it reads both
+    SERVICE_BINARY_PRICE_EVENTS: bool = False
+    # Price events are pushed by pipelined commands of this many events
+    SERVICE_PRICE_EVENT_PUSH_CHUNK_SIZE: int = 1000
 
 
 class LogSettings(BaseSettings):
@@ -121,6 +199,37 @@ class ConsumerSettings(RabbitmqSettings):
     CONSUMER_MAX_DELAY: float = 1
     CONSUMER_REDIS_CAPACITY_THRESHOLD_IN_PERCENT: int = 95
     CONSUMER_ITERATOR_TIMEOUT: float = 1
+    CONSUMER_FAST_PREFILTER: bool = False
+    # Redis memory is sampled in background, 0 means memory is checked before each push
+    CONSUMER_REDIS_SAMPLE_INTERVAL: float = 0
+    # Sampled memory usage closer than margin to capacity threshold is checked again
+    CONSUMER_REDIS_SAMPLE_MARGIN_IN_PERCENT: float = 5
+    # Messages are acked after they are pushed to Redis, failed ones are requeued
+    CONSUMER_MANUAL_ACK: bool = False
+    # Consumer with manual ack waits this long after nacking a batch to full Redis
+    CONSUMER_REDIS_FULL_BACKOFF: float = 1
+    CONSUMER_REDIS_PUSH_CHUNK_SIZE: int = 100
+    # Only the highest version of messages with the same action and id is pushed
+    CONSUMER_DEDUPLICATE: bool = False
+    # Only fields used by workers are pushed, packed in compact envelopes
+    CONSUMER_COMPACT_ENVELOPE: bool = False
+    # Messages of one push chunk are packed into one compressed envelope
+    CONSUMER_COMPACT_ENVELOPE_BATCH: bool = False
+    # Consumption is throttled by depth of Redis queues, 0 high watermark disables it,
+    # it requires manual ack as RabbitMQ ignores prefetch count of no-ack consumers
+    CONSUMER_BACKPRESSURE_HIGH_WATERMARK: int = 0
+    CONSUMER_BACKPRESSURE_LOW_WATERMARK: int = 0
+    CONSUMER_BACKPRESSURE_MIN_PREFETCH_COUNT: int = 10
+    CONSUMER_BACKPRESSURE_MAX_DELAY_MULTIPLIER: float = 5
+    # Offer and shop messages older than versions in the Redis version map
+    # are not pushed
+    CONSUMER_DROP_STALE_VERSIONS: bool = False
+
+    @model_validator(mode="after")
+    def check_backpressure_manual_ack(self) -> "ConsumerSettings":
+        if self.CONSUMER_BACKPRESSURE_HIGH_WATERMARK > 0 and not self.CONSUMER_MANUAL_ACK:
+            raise ValueError("Consumer backpressure requires manual ack")
+        return self
 
     def rabbitmq_entity_queue_mapping(self, entity) -> dict:
         return self.CONSUMER_RABBITMQ_QUEUE_MAPPING.get(entity, {})
@@ -169,6 +278,12 @@ class ValidationJobSettings(BaseSettings):
 class JobSettings(Settings):
     JOB_BATCH_SIZE: int = 200
     JOB_QUEUE_POP_TIMEOUT: float = 0.2
+    # Batch size adapts between the bounds, it grows while processing latency per
+    # object falls and shrinks when a batch takes too long
+    JOB_ADAPTIVE_BATCH_SIZE: bool = False
+    JOB_ADAPTIVE_MIN_BATCH_SIZE: int = 20
+    JOB_ADAPTIVE_MAX_BATCH_SIZE: int = 2000
+    JOB_ADAPTIVE_MAX_LATENCY: float = 2
 
 
 base_settings = Settings()
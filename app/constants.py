@@ -72,6 +72,11 @@ class Job(StrEnum):
     PRICE_PUBLISH = "price-publish"
 
 
+class RedisQueueTransport(StrEnum):
+    LIST = "list"
+    STREAM = "stream"
+
+
 class Action(StrEnum):
     DELETE = "delete"
     CREATE = "create"
@@ -118,6 +123,7 @@ ENTITY_VERSION_COLUMNS: dict[Entity, str] = {
 }
 
 PRICE_EVENT_QUEUE = Job.EVENT_PROCESSING.value
+REDIS_STREAM_MSG_FIELD = b"msg"
 
 PRICE_PRECISION = 12
 PRICE_SCALE = 2
@@ -1,12 +1,67 @@
+import asyncio
 import logging
+import signal
+from contextlib import AsyncExitStack
+
+from aio_pika import connect_robust
+from aio_pika.abc import AbstractRobustConnection
 
 from app.config.settings import ConsumerSettings
 from app.constants import Entity
 from app.consumers.consumer import Consumer
+from app.consumers.redis_sampler import RedisMemorySampler
+from app.utils.redis_adapter import RedisAdapter
 
 logger = logging.getLogger(__name__)
 
 
-async def run_entity_consumer(entity: Entity) -> None:
-    consumer = Consumer(entity, ConsumerSettings())
-    await consumer.run()
+async def run_entity_consumers(entities: list[Entity]) -> None:
+    """
+    Run consumers of all entities in one event loop. Consumers share one Redis client
+    and one RabbitMQ connection per server, each consumer has its own channel.
+    If any consumer stops, all of them are stopped.
+    """
+    settings = ConsumerSettings()
+
+    async with AsyncExitStack() as stack:
+        redis = await stack.enter_async_context(RedisAdapter(settings.redis_dsn))
+
+        redis_sampler = None
+        if settings.CONSUMER_REDIS_SAMPLE_INTERVAL > 0:
+            redis_sampler = RedisMemorySampler(
+                redis, settings.CONSUMER_REDIS_SAMPLE_INTERVAL
+            )
+            redis_sampler.start()
+            stack.push_async_callback(redis_sampler.stop)
+
+        connections: dict[str, AbstractRobustConnection] = {}
+        consumers = []
+        for entity in dict.fromkeys(entities):
+            dsn = settings.rabbitmq_dsn(entity)
+            if dsn not in connections:
+                logger.info("Connecting to RabbitMQ %s", dsn)
+                connections[dsn] = await connect_robust(dsn)
+                stack.push_async_callback(connections[dsn].close)
+
+            consumers.append(
+                Consumer(
+                    entity,
+                    settings,
+                    redis=redis,
+                    rmq_connection=connections[dsn],
+                    redis_sampler=redis_sampler,
+                    handle_signals=False,
+                )
+            )
+
+        def stop_consumers(_signum=None, _frame=None) -> None:
+            for consumer in consumers:
+                consumer.stop()
+
+        for signum in [signal.SIGINT, signal.SIGTERM]:
+            signal.signal(signum, stop_consumers)
+
+        tasks = [asyncio.create_task(consumer.run()) for consumer in consumers]
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        stop_consumers()
+        await asyncio.gather(*tasks)
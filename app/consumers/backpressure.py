@@ -0,0 +1,43 @@
+class BackpressureController:
+    """
+    Throttle consumption by depth of downstream Redis queues. Below the low watermark
+    the consumer runs with its configured limits, between the watermarks the prefetch
+    count is lowered and the max delay stretched linearly, at the high watermark
+    the most restrictive limits are used and the consumer waits.
+    """
+
+    def __init__(
+        self,
+        high_watermark: int,
+        low_watermark: int,
+        min_prefetch_count: int,
+        max_delay_multiplier: float,
+    ):
+        if low_watermark > high_watermark:
+            raise ValueError("Low watermark must not be greater than high watermark")
+
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.min_prefetch_count = min_prefetch_count
+        self.max_delay_multiplier = max_delay_multiplier
+
+    def throttle_factor(self, queue_depth: int) -> float:
+        if queue_depth <= self.low_watermark:
+            return 0
+        if queue_depth >= self.high_watermark:
+            return 1
+        return (queue_depth - self.low_watermark) / (
+            self.high_watermark - self.low_watermark
+        )
+
+    def should_wait(self, queue_depth: int) -> bool:
+        return queue_depth >= self.high_watermark
+
+    def prefetch_count(self, queue_depth: int, prefetch_count: int) -> int:
+        min_prefetch_count = min(self.min_prefetch_count, prefetch_count)
+        factor = self.throttle_factor(queue_depth)
+        return round(prefetch_count - (prefetch_count - min_prefetch_count) * factor)
+
+    def max_delay(self, queue_depth: int, max_delay: float) -> float:
+        factor = self.throttle_factor(queue_depth)
+        return max_delay * (1 + (self.max_delay_multiplier - 1) * factor)
@@ -1,7 +1,15 @@
+import asyncio
 import signal
+from contextlib import AsyncExitStack
+from itertools import islice, repeat
 from logging import getLogger
+from uuid import UUID
 
-from aio_pika.abc import AbstractIncomingMessage
+from aio_pika.abc import (
+    AbstractIncomingMessage,
+    AbstractQueueIterator,
+    AbstractRobustConnection,
+)
 from api_principles.message import Message  # type: ignore[import-untyped]
 from api_principles.rabbitmq import (  # type: ignore[import-untyped]
     ContentTypeDecoder,
@@ -9,15 +17,27 @@ from api_principles.rabbitmq import (  # type: ignore[import-untyped]
 )
 from redis import RedisError
 from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
 
 from app.config.settings import ConsumerSettings
-from app.constants import Entity
+from app.constants import (
+    PRICE_EVENT_QUEUE,
+    REDIS_STREAM_MSG_FIELD,
+    CountryCode,
+    Entity,
+    RedisQueueTransport,
+)
+from app.consumers.backpressure import BackpressureController
 from app.consumers.rabbitmq_client import RabbitmqConsumerClient
+from app.consumers.redis_sampler import RedisMemorySampler, memory_usage_in_percent
 from app.exceptions import RedisFullError
-from app.metrics import ENTITY_METRICS
+from app.metrics import CONSUMER_PREFETCH_COUNT, ENTITY_METRICS
 from app.parsers import parser_from_entity
+from app.parsers.envelope import EnvelopeCodec, decode_message_body
 from app.schemas.message import InvalidMessageSchema
 from app.utils.redis_adapter import RedisAdapter
+from app.utils.redis_queue import entity_queue_name
+from app.utils.version_map import VERSION_MAP_ENTITIES, VersionMap
 
 
 class DummyDecoder(ContentTypeDecoder):
@@ -27,43 +47,128 @@ class DummyDecoder(ContentTypeDecoder):
             body=[original_message.body],
             metadata={
                 "routing_key": original_message.routing_key,
+                "message": original_message,
             },
         )
 
 
 class Consumer(RabbitMQBatchConsumer):
-    def __init__(self, entity: Entity, settings: ConsumerSettings):
+    def __init__(  # noqa: PLR0913
+        self,
+        entity: Entity,
+        settings: ConsumerSettings,
+        redis: Redis | None = None,
+        rmq_connection: AbstractRobustConnection | None = None,
+        redis_sampler: RedisMemorySampler | None = None,
+        handle_signals: bool = True,
+    ):
+        """
+        Redis client, RabbitMQ connection and Redis sampler can be shared by consumers
+        running in one process, they are not closed by the consumer.
+        """
         self.entity = entity
-        self.rmq = RabbitmqConsumerClient(entity, settings)
-        self.redis: Redis | None = None
+        self.rmq = RabbitmqConsumerClient(entity, settings, connection=rmq_connection)
+        self.redis: Redis | None = redis
+        self.shared_redis = redis is not None
         self.redis_dsn = settings.redis_dsn
-        self.redis_list = f"rmq-{entity.value}"
+        self.redis_transport = settings.REDIS_QUEUE_TRANSPORT
+        self.redis_list = entity_queue_name(entity, self.redis_transport)
+        # Per-country queues, messages of other countries go to the entity queue
+        self.country_queues: dict[str, str] = {}
+        if settings.REDIS_QUEUE_SHARD_BY_COUNTRY:
+            self.country_queues = {
+                country: entity_queue_name(entity, self.redis_transport, country)
+                for country in CountryCode
+            }
         self.redis_capacity = settings.CONSUMER_REDIS_CAPACITY_THRESHOLD_IN_PERCENT
+        self.redis_sample_interval = settings.CONSUMER_REDIS_SAMPLE_INTERVAL
+        self.redis_sample_margin = settings.CONSUMER_REDIS_SAMPLE_MARGIN_IN_PERCENT
+        self.redis_sampler = redis_sampler
+        self.shared_redis_sampler = redis_sampler is not None
         self.parser = parser_from_entity(entity, throw_errors=False)
         self.filtered_countries = settings.filtered_countries(entity)
         self.iterator_timeout = settings.CONSUMER_ITERATOR_TIMEOUT
-        self.register_signals()
+        self.manual_ack = settings.CONSUMER_MANUAL_ACK
+        self.redis_full_backoff = settings.CONSUMER_REDIS_FULL_BACKOFF
+        self.deduplicate = settings.CONSUMER_DEDUPLICATE
+        self.envelope_codec: EnvelopeCodec | None = None
+        if settings.CONSUMER_COMPACT_ENVELOPE:
+            self.envelope_codec = EnvelopeCodec(entity)
+        self.envelope_batch = settings.CONSUMER_COMPACT_ENVELOPE_BATCH
+        self.push_chunk_size = settings.CONSUMER_REDIS_PUSH_CHUNK_SIZE
+        self.version_map: VersionMap | None = None
+        if (
+            settings.CONSUMER_DROP_STALE_VERSIONS
+            and not settings.FORCE_ENTITY_UPDATE
+            and entity in VERSION_MAP_ENTITIES
+        ):
+            self.version_map = VersionMap(entity)
+        # Messages are decoded once by the filter for stages which need their fields
+        self.decode_bodies = bool(
+            self.deduplicate or self.version_map or self.envelope_codec
+        )
+        self.should_consume = True
+        self.decoder = DummyDecoder()
+        self.backpressure: BackpressureController | None = None
+        if settings.CONSUMER_BACKPRESSURE_HIGH_WATERMARK > 0:
+            self.backpressure = BackpressureController(
+                settings.CONSUMER_BACKPRESSURE_HIGH_WATERMARK,
+                settings.CONSUMER_BACKPRESSURE_LOW_WATERMARK,
+                settings.CONSUMER_BACKPRESSURE_MIN_PREFETCH_COUNT,
+                settings.CONSUMER_BACKPRESSURE_MAX_DELAY_MULTIPLIER,
+            )
+        # Redis queues downstream of the consumer and whether they are streams
+        is_stream = self.redis_transport == RedisQueueTransport.STREAM
+        self.watched_lists = {
+            self.redis_list: is_stream,
+            **{name: is_stream for name in self.country_queues.values()},
+            PRICE_EVENT_QUEUE: False,
+        }
+        self.parse_message_body = (
+            self.parser.prefilter_message_body
+            if settings.CONSUMER_FAST_PREFILTER
+            else self.parser.parse_message_body
+        )
+        if handle_signals:
+            self.register_signals()
         self.logger = getLogger(self.__class__.__name__)
 
     async def run(self):
         try:
-            async with RedisAdapter(self.redis_dsn) as redis, self.rmq:
+            async with AsyncExitStack() as stack:
+                redis = self.redis
+                if not self.shared_redis:
+                    redis = await stack.enter_async_context(RedisAdapter(self.redis_dsn))
+                await stack.enter_async_context(self.rmq)
+                self.base_prefetch_count = self.rmq.prefetch_count
+                self.base_max_delay = self.rmq.max_delay
                 super().__init__(
                     self.rmq.queue,
-                    decoder=DummyDecoder(),
+                    decoder=self.decoder,
                     max_delay=self.rmq.max_delay,
                     max_item_count=self.rmq.prefetch_count,
                     iterator_timeout=self.iterator_timeout,
                     iterator_timeout_sleep=0.05,
                 )
                 self.redis = redis
+                if not self.shared_redis_sampler and self.redis_sample_interval > 0:
+                    self.redis_sampler = RedisMemorySampler(
+                        redis, self.redis_sample_interval
+                    )
+                    self.redis_sampler.start()
+                if self.redis_sampler:
+                    for name, is_stream in self.watched_lists.items():
+                        self.redis_sampler.watch_list(name, is_stream)
 
                 self.logger.info(
                     "Start consuming %s queue %s",
                     self.entity.value,
                     self.rmq.queue_name,
                 )
-                await self.consume()
+                if self.manual_ack:
+                    await self.consume_with_manual_ack()
+                else:
+                    await self.consume()
 
         except Exception as exc:
             self.stop()
@@ -73,6 +178,8 @@ class Consumer(RabbitMQBatchConsumer):
                 str(exc),
             )
         finally:
+            if self.redis_sampler and not self.shared_redis_sampler:
+                await self.redis_sampler.stop()
             self.logger.info(
                 "Consumer %s for queue %s stopped",
                 self.entity.value,
@@ -83,8 +190,23 @@ class Consumer(RabbitMQBatchConsumer):
         if not self.redis:
             raise RuntimeError("Redis not initialized")
 
-        memory = await self.redis.info("memory")
-        return memory["used_memory"] / memory["maxmemory"] * 100
+        return memory_usage_in_percent(await self.redis.info("memory"))
+
+    async def get_sampled_redis_memory_usage(self) -> float:
+        """
+        Use memory usage sampled in background, Redis is asked directly only
+        if there is no fresh sample or the sample is close to the capacity threshold.
+        """
+        if not self.redis_sampler:
+            return await self.get_redis_memory_usage()
+
+        memory_usage = self.redis_sampler.fresh_memory_usage()
+        if (
+            memory_usage is None
+            or memory_usage >= self.redis_capacity - self.redis_sample_margin
+        ):
+            return await self.redis_sampler.get_memory_usage()
+        return memory_usage
 
     async def on_batch(self, messages: list[Message]):
         if messages:
@@ -94,22 +216,122 @@ class Consumer(RabbitMQBatchConsumer):
             if not self.redis:
                 raise RuntimeError("Redis not initialized")
 
-            await self.process_message_buffer(messages)
+            if self.manual_ack:
+                await self.process_message_buffer_with_ack(messages)
+            else:
+                await self.process_message_buffer(messages)
 
-    async def process_message_buffer(self, messages: list[Message]):
-        msg_bodies = []
+        if self.backpressure:
+            await self.apply_backpressure()
+
+    async def get_queue_depth(self) -> int:
+        """Return length of the longest Redis queue downstream of the consumer"""
+        if self.redis_sampler:
+            return max(
+                self.redis_sampler.list_lengths.get(name, 0)
+                for name in self.watched_lists
+            )
+
+        async with self.redis.pipeline(transaction=False) as pipe:  # type: ignore[union-attr]
+            for name, is_stream in self.watched_lists.items():
+                pipe.xlen(name) if is_stream else pipe.llen(name)
+            return max(await pipe.execute())
+
+    async def apply_backpressure(self) -> None:
+        """
+        Adjust prefetch count and max delay by depth of Redis queues,
+        wait until the depth falls below the high watermark.
+        """
+        if not self.backpressure:
+            return
+
+        queue_depth = await self.get_queue_depth()
+        if self.backpressure.should_wait(queue_depth):
+            self.logger.warning(
+                "Redis queues reached %i messages, consumer %s is waiting",
+                queue_depth,
+                self.entity.value,
+            )
+        while self.should_consume and self.backpressure.should_wait(queue_depth):
+            await asyncio.sleep(self.base_max_delay)
+            queue_depth = await self.get_queue_depth()
+
+        prefetch_count = self.backpressure.prefetch_count(
+            queue_depth, self.base_prefetch_count
+        )
+        if prefetch_count != self.rmq.prefetch_count:
+            self.logger.info(
+                "Redis queues have %i messages, setting %s consumer prefetch count to %i",
+                queue_depth,
+                self.entity.value,
+                prefetch_count,
+            )
+            await self.rmq.set_prefetch_count(prefetch_count)
+            self.max_item_count = prefetch_count
+            CONSUMER_PREFETCH_COUNT.labels(entity=self.entity.value).set(prefetch_count)
+
+        self.rmq.max_delay = self.max_delay = self.backpressure.max_delay(
+            queue_depth, self.base_max_delay
+        )
+
+    async def consume_with_manual_ack(self) -> None:
+        """
+        Consume messages in batches of at most `prefetch_count` messages collected
+        within `max_delay` seconds. Messages are acked once pushed to Redis.
+        """
+        async with self.rmq.iterator(timeout=self.iterator_timeout) as queue_iter:
+            while self.should_consume:
+                messages = await self.read_batch(queue_iter)
+                await self.on_batch(messages)
+
+    async def read_batch(self, queue_iter: AbstractQueueIterator) -> list[Message]:
+        messages: list[Message] = []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.rmq.max_delay
+        while (
+            self.should_consume
+            and len(messages) < self.rmq.prefetch_count
+            and loop.time() < deadline
+        ):
+            try:
+                messages.append(self.decoder.decode(await anext(queue_iter)))
+            except asyncio.TimeoutError:  # noqa: PERF203
+                continue
+        return messages
+
+    def get_queue_name(self, country_code: str | None) -> str:
+        return self.country_queues.get(country_code or "", self.redis_list)
+
+    def filter_message_bodies(self, messages: list[Message]) -> list[bytes | None]:
+        """
+        Return message bodies which should be pushed to Redis,
+        invalid messages and messages from filtered countries are replaced by None.
+        Redis queue of the message and the decoded message, if later stages need it,
+        are stored in its metadata.
+        """
+        msg_bodies: list[bytes | None] = []
         skipped_messages, skipped_countries = 0, set()
 
         for msg in messages:
-            msg_schema = self.parser.parse_message_body(msg.body[0])
+            msg_dict = None
+            if self.decode_bodies:
+                msg_dict = msg.metadata["msg_dict"] = decode_message_body(msg.body[0])
+            msg_schema = (
+                self.parser.parse_message_dict(msg_dict, msg.body[0])
+                if msg_dict is not None
+                else self.parse_message_body(msg.body[0])
+            )
             if isinstance(msg_schema, InvalidMessageSchema):
+                msg_bodies.append(None)
                 continue
 
             if msg_schema.country_code in self.filtered_countries:
                 skipped_messages += 1
                 skipped_countries.add(msg_schema.country_code)
+                msg_bodies.append(None)
                 continue
 
+            msg.metadata["redis_queue"] = self.get_queue_name(msg_schema.country_code)
             msg_bodies.append(msg.body[0])
 
         if skipped_messages:
@@ -119,19 +341,153 @@ class Consumer(RabbitMQBatchConsumer):
                 skipped_countries,
             )
 
-        if not msg_bodies:
+        if self.deduplicate:
+            return self.collapse_message_bodies(
+                msg_bodies, self.get_message_dicts(messages)
+            )
+        return msg_bodies
+
+    @staticmethod
+    def get_message_dicts(messages: list[Message]) -> list[dict | None]:
+        """Messages decoded by `filter_message_bodies`, None if they were not"""
+        return [msg.metadata.get("msg_dict") for msg in messages]
+
+    def collapse_message_bodies(
+        self, msg_bodies: list[bytes | None], msg_dicts: list[dict | None]
+    ) -> list[bytes | None]:
+        """
+        Keep only the highest version of messages with the same action and id,
+        collapsed messages are replaced by None. Messages without id or version are kept.
+        """
+        latest: dict[tuple[str, UUID], tuple[int, int]] = {}
+        collapsed_bodies = list(msg_bodies)
+        for i, (body, msg_dict) in enumerate(zip(msg_bodies, msg_dicts, strict=True)):
+            if body is None or msg_dict is None:
+                continue
+            try:
+                msg_id = self.parser.get_message_id(msg_dict)
+                version = self.parser.get_version(msg_dict)
+            except (ValueError, TypeError):
+                continue
+            if msg_id is None or version is None:
+                continue
+
+            key = (self.parser.get_action(msg_dict), msg_id)
+            if key in latest:
+                latest_version, latest_index = latest[key]
+                if latest_version > version:
+                    collapsed_bodies[i] = None
+                    continue
+                collapsed_bodies[latest_index] = None
+            latest[key] = (version, i)
+
+        collapsed = sum(body is not None for body in msg_bodies) - sum(
+            body is not None for body in collapsed_bodies
+        )
+        if collapsed:
+            ENTITY_METRICS.labels(
+                entity=self.entity.value, phase="consumer", operation="collapsed"
+            ).inc(collapsed)
+        return collapsed_bodies
+
+    async def drop_stale_message_bodies(
+        self, msg_bodies: list[bytes | None], msg_dicts: list[dict | None]
+    ) -> list[bytes | None]:
+        """
+        Replace messages at or below versions applied by workers by None,
+        messages are kept if the version map can't be read.
+        """
+        if not self.version_map:
+            return msg_bodies
+
+        indexed_messages = []
+        for i, (body, msg_dict) in enumerate(zip(msg_bodies, msg_dicts, strict=True)):
+            if body is None or msg_dict is None:
+                continue
+            try:
+                msg_id = self.parser.get_message_id(msg_dict)
+                version = self.parser.get_version(msg_dict)
+            except (ValueError, TypeError):
+                continue
+            if msg_id is not None and version is not None:
+                indexed_messages.append(
+                    (i, (msg_id, version, self.parser.get_action(msg_dict)))
+                )
+
+        try:
+            stale = await self.version_map.find_stale(
+                self.redis, [msg for _, msg in indexed_messages]  # type: ignore[arg-type]
+            )
+        except RedisError as exc:
+            self.logger.error("Error while reading version map: %s", exc)
+            return msg_bodies
+
+        fresh_bodies = list(msg_bodies)
+        for (i, _), is_stale in zip(indexed_messages, stale, strict=True):
+            if is_stale:
+                fresh_bodies[i] = None
+
+        if stale_count := sum(stale):
+            ENTITY_METRICS.labels(
+                entity=self.entity.value, phase="consumer", operation="stale"
+            ).inc(stale_count)
+        return fresh_bodies
+
+    async def process_message_buffer(self, messages: list[Message]):
+        msg_bodies = self.filter_message_bodies(messages)
+        msg_dicts = self.get_message_dicts(messages)
+        msg_bodies = await self.drop_stale_message_bodies(msg_bodies, msg_dicts)
+        kept = [
+            (body, msg.metadata["redis_queue"], msg_dict)
+            for msg, body, msg_dict in zip(messages, msg_bodies, msg_dicts, strict=True)
+            if body is not None
+        ]
+
+        if not kept:
             self.logger.info("No messages, nothing to be pushed to Redis")
         else:
-            await self.push_messages_to_redis(msg_bodies)
+            bodies, queue_names, kept_dicts = map(list, zip(*kept, strict=True))
+            await self.push_messages_to_redis(bodies, queue_names, kept_dicts)
 
-    async def push_messages_to_redis(self, msg_bodies: list[bytes]) -> None:
+    def encode_message_bodies(
+        self, msg_bodies: list[bytes], msg_dicts: list[dict | None] | None = None
+    ) -> list[bytes]:
+        """
+        Pack messages into compact envelopes if enabled, messages already decoded
+        by the filter are not decoded again
+        """
+        if not self.envelope_codec:
+            return msg_bodies
+
+        if not self.envelope_batch:
+            return self.envelope_codec.encode(msg_bodies, msg_dicts=msg_dicts)
+
+        return [
+            envelope
+            for i in range(0, len(msg_bodies), self.push_chunk_size)
+            for envelope in self.envelope_codec.encode(
+                msg_bodies[i : i + self.push_chunk_size],
+                batch=True,
+                msg_dicts=(
+                    msg_dicts[i : i + self.push_chunk_size] if msg_dicts else None
+                ),
+            )
+        ]
+
+    async def push_messages_to_redis(
+        self,
+        msg_bodies: list[bytes],
+        queue_names: list[str] | None = None,
+        msg_dicts: list[dict | None] | None = None,
+    ) -> None:
+        """Push messages to their queues, to the entity queue if queues are not given"""
         self.logger.info(
             "Pushing %i message(s) to redis list %s",
             len(msg_bodies),
-            self.redis_list,
+            self.describe_queues(queue_names),
         )
         try:
-            if await self.get_redis_memory_usage() > self.redis_capacity:
+            if await self.get_sampled_redis_memory_usage() > self.redis_capacity:
                 self.logger.error(
                     "Redis is %i pct full, %i messages are nacked",
                     self.redis_capacity,
@@ -142,19 +498,205 @@ class Consumer(RabbitMQBatchConsumer):
                 )
                 raise RedisFullError("Redis is full.")
             else:
-                await self.redis.lpush(  # type: ignore[union-attr]
-                    self.redis_list, *msg_bodies
-                )
+                async with self.redis.pipeline(  # type: ignore[union-attr]
+                    transaction=False
+                ) as pipe:
+                    self.queue_messages(pipe, msg_bodies, queue_names, msg_dicts)
+                    await pipe.execute()
         except RedisError as exc:
             self.logger.error("Error while pushing messages to redis: %s", exc)
             ENTITY_METRICS.labels(
                 entity=self.entity.value, phase="consumer", operation="discard"
             ).inc(len(msg_bodies))
 
+    async def process_message_buffer_with_ack(self, messages: list[Message]) -> None:
+        """
+        Push messages to Redis in chunks over one pipeline and ack them.
+        Messages in chunks which failed to be pushed are nacked and requeued,
+        skipped messages are acked together with their chunk. When Redis is full
+        all messages are nacked and consuming goes on after a backoff.
+        """
+        msg_bodies = self.filter_message_bodies(messages)
+        msg_dicts = self.get_message_dicts(messages)
+        msg_bodies = await self.drop_stale_message_bodies(msg_bodies, msg_dicts)
+        chunks = [
+            (
+                messages[i : i + self.push_chunk_size],
+                msg_bodies[i : i + self.push_chunk_size],
+                msg_dicts[i : i + self.push_chunk_size],
+            )
+            for i in range(0, len(messages), self.push_chunk_size)
+        ]
+        try:
+            pushed = await self.push_chunks_to_redis(
+                [[body for body in bodies if body] for _, bodies, _ in chunks],
+                [
+                    [
+                        msg.metadata["redis_queue"]
+                        for msg, body in zip(chunk_messages, bodies, strict=True)
+                        if body
+                    ]
+                    for chunk_messages, bodies, _ in chunks
+                ],
+                [
+                    [
+                        msg_dict
+                        for body, msg_dict in zip(bodies, dicts, strict=True)
+                        if body
+                    ]
+                    for _, bodies, dicts in chunks
+                ],
+            )
+        except RedisFullError:
+            await self.settle_messages([(messages, False)])
+            self.logger.warning(
+                "Redis is full, %s consumer waits %.1fs",
+                self.entity.value,
+                self.redis_full_backoff,
+            )
+            await asyncio.sleep(self.redis_full_backoff)
+            return
+
+        await self.settle_messages(
+            [
+                (chunk_messages, is_pushed)
+                for (chunk_messages, _, _), is_pushed in zip(chunks, pushed, strict=True)
+            ]
+        )
+
+    async def push_chunks_to_redis(
+        self,
+        chunks: list[list[bytes]],
+        chunk_queue_names: list[list[str]] | None = None,
+        chunk_msg_dicts: list[list[dict | None]] | None = None,
+    ) -> list[bool]:
+        """
+        Push chunks of messages using one pipeline, return which chunks were pushed.
+        Queues of messages in chunks default to the entity queue, messages are
+        decoded for envelopes unless their decoded `chunk_msg_dicts` are given.
+        """
+        msg_count = sum(len(bodies) for bodies in chunks)
+        if not msg_count:
+            self.logger.info("No messages, nothing to be pushed to Redis")
+            return [True] * len(chunks)
+
+        queue_names_of_chunks: list[list[str] | None] = [None] * len(chunks)
+        if chunk_queue_names:
+            queue_names_of_chunks = list(chunk_queue_names)
+        msg_dicts_of_chunks: list[list[dict | None] | None] = [None] * len(chunks)
+        if chunk_msg_dicts:
+            msg_dicts_of_chunks = list(chunk_msg_dicts)
+        self.logger.info(
+            "Pushing %i message(s) to redis list %s",
+            msg_count,
+            self.describe_queues(
+                [name for names in chunk_queue_names or [] for name in names]
+            ),
+        )
+        try:
+            if await self.get_sampled_redis_memory_usage() > self.redis_capacity:
+                self.logger.error(
+                    "Redis is %i pct full, %i messages are nacked",
+                    self.redis_capacity,
+                    msg_count,
+                )
+                raise RedisFullError("Redis is full.")
+
+            async with self.redis.pipeline(  # type: ignore[union-attr]
+                transaction=False
+            ) as pipe:
+                command_counts = [
+                    (
+                        self.queue_messages(pipe, bodies, queue_names, msg_dicts)
+                        if bodies
+                        else 0
+                    )
+                    for bodies, queue_names, msg_dicts in zip(
+                        chunks, queue_names_of_chunks, msg_dicts_of_chunks, strict=True
+                    )
+                ]
+                results = iter(await pipe.execute(raise_on_error=False))
+        except RedisError as exc:
+            self.logger.error("Error while pushing messages to redis: %s", exc)
+            return [not bodies for bodies in chunks]
+
+        pushed = []
+        for command_count in command_counts:
+            errors = [
+                result
+                for result in islice(results, command_count)
+                if isinstance(result, Exception)
+            ]
+            if errors:
+                self.logger.error("Error while pushing messages to redis: %s", errors[0])
+            pushed.append(not errors)
+        return pushed
+
+    def queue_messages(
+        self,
+        pipe: Pipeline,
+        msg_bodies: list[bytes],
+        queue_names: list[str] | None = None,
+        msg_dicts: list[dict | None] | None = None,
+    ) -> int:
+        """Queue push of messages to the pipeline, return number of queued commands"""
+        queues: dict[str, tuple[list[bytes], list[dict | None]]] = {}
+        for queue_name, msg_body, msg_dict in zip(
+            queue_names or repeat(self.redis_list),
+            msg_bodies,
+            msg_dicts or repeat(None),
+        ):
+            queue_bodies, queue_dicts = queues.setdefault(queue_name, ([], []))
+            queue_bodies.append(msg_body)
+            queue_dicts.append(msg_dict)
+
+        command_count = 0
+        for queue_name, (queue_bodies, queue_dicts) in queues.items():
+            encoded_bodies = self.encode_message_bodies(
+                queue_bodies, queue_dicts if msg_dicts else None
+            )
+            if self.redis_transport == RedisQueueTransport.STREAM:
+                for msg_body in encoded_bodies:
+                    pipe.xadd(queue_name, {REDIS_STREAM_MSG_FIELD: msg_body})
+                command_count += len(encoded_bodies)
+            else:
+                pipe.lpush(queue_name, *encoded_bodies)
+                command_count += 1
+        return command_count
+
+    def describe_queues(self, queue_names: list[str] | None) -> str:
+        return ", ".join(sorted(set(queue_names))) if queue_names else self.redis_list
+
+    async def settle_messages(self, chunks: list[tuple[list[Message], bool]]) -> None:
+        """
+        Ack or nack chunks of messages, consecutive chunks with the same result
+        are settled at once by the delivery tag of their last message.
+        """
+        for i, (chunk_messages, is_pushed) in enumerate(chunks):
+            next_chunk = chunks[i + 1] if i + 1 < len(chunks) else None
+            if next_chunk and next_chunk[1] == is_pushed:
+                continue
+
+            last_message: AbstractIncomingMessage = chunk_messages[-1].metadata["message"]
+            if is_pushed:
+                await last_message.ack(multiple=True)
+            else:
+                await last_message.nack(multiple=True, requeue=True)
+
+        nacked = sum(len(msgs) for msgs, is_pushed in chunks if not is_pushed)
+        if nacked:
+            ENTITY_METRICS.labels(
+                entity=self.entity.value, phase="consumer", operation="nacked"
+            ).inc(nacked)
+
     def stop(self, _signum=None, _frame=None) -> None:
         self.logger.info("Stopping %s consumer", self.entity.value)
         self.stop_consuming()
 
+    def stop_consuming(self) -> None:
+        self.should_consume = False
+        super().stop_consuming()
+
     def register_signals(self) -> None:
         for signum in [signal.SIGINT, signal.SIGTERM]:
             signal.signal(signum, self.stop)
@@ -1,6 +1,10 @@
 import logging
 
-from aio_pika.abc import AbstractQueueIterator, AbstractRobustQueue
+from aio_pika.abc import (
+    AbstractQueueIterator,
+    AbstractRobustConnection,
+    AbstractRobustQueue,
+)
 
 from app.config.settings import ConsumerSettings
 from app.constants import Entity
@@ -10,8 +14,14 @@ logger = logging.getLogger(__name__)
 
 
 class RabbitmqConsumerClient(BaseRabbitmqAdapter):
-    def __init__(self, entity: Entity, settings: ConsumerSettings):
+    def __init__(
+        self,
+        entity: Entity,
+        settings: ConsumerSettings,
+        connection: AbstractRobustConnection | None = None,
+    ):
         super().__init__(settings.rabbitmq_dsn(entity))
+        self.shared_connection = connection
         self.settings = settings
         self.entity = entity
         self.exchange_name = settings.rabbitmq_exchange_name(entity)
@@ -21,13 +31,31 @@ class RabbitmqConsumerClient(BaseRabbitmqAdapter):
         self.create_queues = settings.CONSUMER_RABBITMQ_CREATE_QUEUES
         self.prefetch_count = settings.RABBITMQ_PREFETCH_COUNT
         self.max_delay = settings.rmq_max_delay(entity)
+        self.no_ack = not settings.CONSUMER_MANUAL_ACK
         self.queue: AbstractRobustQueue
 
     async def connect(self):
-        await super().connect()
+        if self.shared_connection:
+            self.connection = self.shared_connection
+            self.channel = await self.connection.channel()
+        else:
+            await super().connect()
         await self.channel.set_qos(prefetch_count=self.prefetch_count)
         await self._init_queue()
 
+    async def disconnect(self):
+        if not self.shared_connection:
+            await super().disconnect()
+        elif self.channel:
+            await self.channel.close()
+            logger.info("Closed RabbitMQ channel of queue %s", self.queue_name)
+
+    async def set_prefetch_count(self, prefetch_count: int) -> None:
+        await self.channel.set_qos(  # type: ignore[union-attr]
+            prefetch_count=prefetch_count
+        )
+        self.prefetch_count = prefetch_count
+
     async def _init_queue(self):
         if self.create_queues:
             queue_operation = "Declare"
@@ -53,5 +81,7 @@ class RabbitmqConsumerClient(BaseRabbitmqAdapter):
             self.queue = await self.channel.get_queue(self.queue_name)
         logger.info("%s queue %s", queue_operation, self.queue_name)
 
-    def iterator(self) -> AbstractQueueIterator:
-        return self.queue.iterator(timeout=self.max_delay, no_ack=True)
+    def iterator(self, timeout: float | None = None) -> AbstractQueueIterator:
+        return self.queue.iterator(
+            timeout=self.max_delay if timeout is None else timeout, no_ack=self.no_ack
+        )
@@ -0,0 +1,87 @@
+import asyncio
+import time
+from contextlib import suppress
+from logging import getLogger
+from typing import Any, Mapping
+
+from redis import RedisError
+from redis.asyncio import Redis
+
+# Samples older than this number of intervals are not trusted
+STALE_SAMPLE_INTERVALS = 3
+
+
+def memory_usage_in_percent(memory: Mapping[str, Any]) -> float:
+    """Used memory in percent of maxmemory, Redis without maxmemory is never full"""
+    if not memory["maxmemory"]:
+        return 0.0
+    return memory["used_memory"] / memory["maxmemory"] * 100
+
+
+class RedisMemorySampler:
+    """
+    Periodically samples Redis memory usage and lengths of watched lists, so consumers
+    do not need to call INFO before every push. One sampler can be shared by
+    all consumers using the same Redis.
+    """
+
+    def __init__(self, redis: Redis, interval: float):
+        self.redis = redis
+        self.interval = interval
+        # Watched lists and whether they are streams
+        self.lists: dict[str, bool] = {}
+        self.memory_usage: float | None = None
+        # Monotonic time of the last memory usage sample
+        self.sampled_at: float | None = None
+        self.list_lengths: dict[str, int] = {}
+        self.task: asyncio.Task | None = None
+        self.logger = getLogger(self.__class__.__name__)
+
+    def watch_list(self, name: str, is_stream: bool = False) -> None:
+        self.lists[name] = is_stream
+
+    async def get_memory_usage(self) -> float:
+        memory = await self.redis.info("memory")
+        self.memory_usage = memory_usage_in_percent(memory)
+        self.sampled_at = time.monotonic()
+        return self.memory_usage
+
+    def fresh_memory_usage(self) -> float | None:
+        """Sampled memory usage, None if there is no sample or it is stale"""
+        if (
+            self.sampled_at is None
+            or time.monotonic() - self.sampled_at > STALE_SAMPLE_INTERVALS * self.interval
+        ):
+            return None
+        return self.memory_usage
+
+    async def sample(self) -> None:
+        await self.get_memory_usage()
+        if self.lists:
+            lists = sorted(self.lists)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for name in lists:
+                    pipe.xlen(name) if self.lists[name] else pipe.llen(name)
+                lengths = await pipe.execute()
+            self.list_lengths = dict(zip(lists, lengths, strict=True))
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.sample()
+            except RedisError as exc:
+                self.logger.error("Error while sampling redis: %s", exc)
+            except Exception:
+                self.logger.exception("Unexpected error while sampling redis")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self.task
+            self.task = None
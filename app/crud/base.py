@@ -7,8 +7,9 @@ from asyncpg.exceptions import (
     InterfaceError,
     TransactionRollbackError,
 )
-from sqlalchemy import Table
+from sqlalchemy import Select, Table, and_, cast, column, exists, select, tuple_
 from sqlalchemy import text as sa_text
+from sqlalchemy import values as sa_values
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncConnection
 
@@ -21,6 +22,11 @@ CreateSchemaTypeT = TypeVar("CreateSchemaTypeT", bound=EntityModel)
 
 
 class CRUDBase(Generic[DBSchemaTypeT, CreateSchemaTypeT]):
+    # Entities with own rows, which can be inserted by `upsert_many_conditionally`
+    supports_conditional_upsert = True
+    # Entities with own rows, whose last seen versions can be cached by services
+    supports_entity_cache = True
+
     def __init__(
         self,
         table: Table,
@@ -62,6 +68,10 @@ class CRUDBase(Generic[DBSchemaTypeT, CreateSchemaTypeT]):
         rows = await db_conn.execute(stmt)
         return [self.db_scheme.model_validate(row) for row in rows]
 
+    def select_in(self, obj_ids: list[UUID]) -> Select:
+        """Select rows of given ids with columns of the DB schema"""
+        return select(self.table).where(self.table.c.id.in_(obj_ids))
+
     async def create_many(
         self, db_conn: AsyncConnection, objs_in: list[CreateSchemaTypeT]
     ) -> list[DBSchemaTypeT]:
@@ -129,6 +139,91 @@ class CRUDBase(Generic[DBSchemaTypeT, CreateSchemaTypeT]):
         ]
         return await self._do_upsert_many(db_conn, self.updatable_columns, values)
 
+    async def upsert_many_conditionally(
+        self,
+        db_conn: AsyncConnection,
+        entities: list[CreateSchemaTypeT],
+        force: bool = False,
+    ) -> list[tuple[UUID, DBSchemaTypeT | None]]:
+        """
+        Insert new rows and update existing ones only when the entity version is
+        not older and, unless forced, an updatable column changed, in one statement.
+        Unchanged rows are not rewritten, rows older than a stored row of the same ID
+        are not inserted.
+
+        :param db_conn: Database connection
+        :param entities: List of entities to be upserted
+        :param force: Update rows of not older versions even when nothing changed
+        :return: IDs of written rows with their previous state, None for inserted rows
+        """
+        if not entities:
+            return []
+        now = utc_now()
+        values = sorted(
+            ({**e.model_dump(), "created_at": now, "updated_at": now} for e in entities),
+            key=lambda x: x["id"],
+        )
+        # Reads the snapshot of the statement, so it sees rows before the upsert
+        old = self.select_in([v["id"] for v in values]).cte("old")
+
+        columns = list(values[0])
+        rows = sa_values(
+            *(column(c, self.table.c[c].type) for c in columns), name="rows"
+        ).data([tuple(v[c] for c in columns) for v in values])
+        # Conflicts are on the primary key, which includes the partition key, so an
+        # older message with another partition key would otherwise insert a new row
+        newer_exists = exists().where(
+            old.c.id == rows.c.id, old.c.version > rows.c.version
+        )
+        # Typeless NULLs of VALUES would be text, so they are cast to column types
+        stmt = insert(self.table).from_select(
+            columns,
+            select(*(cast(rows.c[c], self.table.c[c].type) for c in columns)).where(
+                ~newer_exists
+            ),
+        )
+        condition = stmt.excluded.version >= self.table.c.version
+        if not force:
+            compared = [
+                c for c in self.updatable_columns if c not in ("version", "updated_at")
+            ]
+            condition = and_(
+                condition,
+                tuple_(*(self.table.c[c] for c in compared)).is_distinct_from(
+                    tuple_(*(stmt.excluded[c] for c in compared))
+                ),
+            )
+        upserted = (
+            stmt.on_conflict_do_update(
+                index_elements=self.table.primary_key.columns,
+                set_={k: stmt.excluded[k] for k in self.updatable_columns},
+                where=condition,
+            )
+            .returning(self.table.c.id.label("upserted_id"))
+            .cte("upserted")
+        )
+        res = await db_conn.execute(
+            select(upserted.c.upserted_id, old).select_from(
+                upserted.outerjoin(old, old.c.id == upserted.c.upserted_id)
+            )
+        )
+
+        result: list[tuple[UUID, DBSchemaTypeT | None]] = []
+        for row in res.mappings():
+            old_row = dict(row)
+            upserted_id = old_row.pop("upserted_id")
+            result.append(
+                (
+                    upserted_id,
+                    (
+                        None
+                        if old_row["id"] is None
+                        else self.db_scheme.model_validate(old_row)
+                    ),
+                )
+            )
+        return result
+
     async def remove_many(
         self, db_conn: AsyncConnection, ids_versions: list[tuple[UUID, int]]
     ) -> list[UUID]:
@@ -2,7 +2,7 @@ import logging
 from typing import AsyncGenerator
 from uuid import UUID
 
-from sqlalchemy import bindparam, text, tuple_
+from sqlalchemy import Select, bindparam, select, text, tuple_
 from sqlalchemy.ext.asyncio import AsyncConnection
 
 from app.constants import (
@@ -14,6 +14,7 @@ from app.constants import (
 from app.crud.base import CRUDBase
 from app.custom_types import OfferPk
 from app.db.tables.offer import offer_table
+from app.db.tables.shop import shop_table
 from app.schemas.offer import OfferCreateSchema, OfferDBSchema, PopulationOfferSchema
 
 logger = logging.getLogger(__name__)
@@ -37,6 +38,17 @@ class CRUDOffer(CRUDBase[OfferDBSchema, OfferCreateSchema]):
         offers = await self.get_in(db_conn, [obj_id])
         return offers.pop() if offers else None
 
+    def select_in(self, obj_ids: list[UUID]) -> Select:
+        return (
+            select(offer_table, shop_table.c.certified.label("certified_shop"))
+            .select_from(
+                offer_table.outerjoin(
+                    shop_table, shop_table.c.id == offer_table.c.shop_id
+                )
+            )
+            .where(offer_table.c.id.in_(obj_ids))
+        )
+
     async def get_in(
         self, db_conn: AsyncConnection, obj_ids: list[UUID]
     ) -> list[OfferDBSchema]:
@@ -1,11 +1,10 @@
 import logging
+from typing import AsyncGenerator
 from uuid import UUID
 
-from sqlalchemy import and_
 from sqlalchemy.ext.asyncio import AsyncConnection
 
 from app.crud import CRUDBase
-from app.db.tables.offer import offer_table
 from app.db.tables.shop import shop_table
 from app.schemas.offer import OfferDBSchema
 from app.schemas.shop import ShopCreateSchema, ShopDBSchema
@@ -22,23 +21,35 @@ class CRUDShop(CRUDBase[ShopDBSchema, ShopCreateSchema]):
         )
 
     @staticmethod
-    async def get_offers_in_stock_for_shops(
-        db_conn: AsyncConnection, shop_ids: list[UUID]
-    ) -> list[OfferDBSchema]:
+    async def stream_offers_in_stock_for_shops(
+        db_conn: AsyncConnection, shop_ids: list[UUID], batch_size: int
+    ) -> AsyncGenerator[list[OfferDBSchema], None]:
         """
-        For each shop return all its offers which are in stock
+        For all shops yield their offers which are in stock in batches of size
+        `batch_size`, read through a server-side cursor. Asyncpg opens cursors only
+        in a transaction, which is started on the driver connection because
+        worker connections are in autocommit mode.
 
         :param db_conn: Database connection
         :param shop_ids: List of shop UUIDs
-        :return: List of offers
+        :param batch_size: Number of offers in a batch
+        :return: Batches of offers
         """
         if not shop_ids:
-            return []
-        stmt = offer_table.select().where(
-            and_(offer_table.c.shop_id.in_(shop_ids), offer_table.c.in_stock.is_(True))
-        )
-        res = await db_conn.execute(stmt)
-        return [OfferDBSchema.model_validate(row) for row in res]
+            return
+        raw_conn = await db_conn.get_raw_connection()
+        driver_conn = raw_conn.driver_connection
+        assert driver_conn is not None
+        async with driver_conn.transaction():
+            cursor = await driver_conn.cursor(
+                """
+                SELECT * FROM offers
+                WHERE offers.shop_id = ANY($1::uuid[]) AND offers.in_stock
+                """,
+                shop_ids,
+            )
+            while rows := await cursor.fetch(batch_size):
+                yield [OfferDBSchema.model_validate(dict(row)) for row in rows]
 
 
 crud_shop = CRUDShop()
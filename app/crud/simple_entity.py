@@ -19,6 +19,9 @@ class CRUDSimpleEntityBase(
 ):
     """CRUD for entities without table, corresponding to one column only"""
 
+    supports_conditional_upsert = False
+    supports_entity_cache = False
+
     def __init__(
         self,
         table: Table,
@@ -22,5 +22,9 @@ offer_table = sa.Table(
     sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
     sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
     sa.PrimaryKeyConstraint("product_id", "id"),
+    # Offers in stock of shops changing certification, partial index managed by alembic
+    sa.Index(
+        "ix_offers_shop_id_in_stock", "shop_id", postgresql_where=sa.text("in_stock")
+    ),
     postgresql_partition_by="HASH (product_id, id)",
 )
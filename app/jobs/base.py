@@ -1,11 +1,19 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
+from time import perf_counter
+from typing import Any
 
+from redis import RedisError
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncEngine
 
 from app.config.settings import JobSettings
-from app.metrics import JOB_METRICS, JOB_TIMER, PerformanceTimer
+from app.metrics import BATCH_SIZE, JOB_METRICS, JOB_TIMER, PerformanceTimer
+from app.utils import dump_to_json
+from app.utils.batch_size import AdaptiveBatchSize
+from app.utils.redis_queue import dead_letter_queue_name
+from app.utils.retry import RetryPolicy, bisect_data_errors, retry_transient
 
 
 class BaseJob:
@@ -22,6 +30,20 @@ class BaseJob:
         self.should_compute = True
         self.metrics = JOB_METRICS
         self.performance_metrics = JOB_TIMER
+        self.retry_policy = RetryPolicy(
+            settings.RETRY_ATTEMPTS, settings.RETRY_BASE_DELAY, settings.RETRY_MAX_DELAY
+        )
+        self.dead_letter_queue = dead_letter_queue_name(name)
+        self.adaptive_batch_size: AdaptiveBatchSize | None = None
+        if settings.JOB_ADAPTIVE_BATCH_SIZE:
+            self.adaptive_batch_size = AdaptiveBatchSize(
+                self.buffer_size,
+                settings.JOB_ADAPTIVE_MIN_BATCH_SIZE,
+                settings.JOB_ADAPTIVE_MAX_BATCH_SIZE,
+                settings.JOB_ADAPTIVE_MAX_LATENCY,
+                gauge=BATCH_SIZE.labels(kind="job", name=name),
+            )
+            self.buffer_size = self.adaptive_batch_size.size
 
     @asynccontextmanager
     async def get_db_conn(self):
@@ -36,19 +58,73 @@ class BaseJob:
 
     async def run(self) -> None:
         self.logger.info("Job started, reading queue %s", self.redis_queue)
-        try:
-            while self.should_compute:
+        errors = 0
+        while self.should_compute:
+            try:
                 objs = await self.read()
                 if len(objs) != 0:
                     self.logger.info("Processing %i objects", len(objs))
                     self.metrics.labels(name=self.name, stage="load").inc(len(objs))
+                    start = perf_counter()
                     with PerformanceTimer(
                         self.performance_metrics.labels(name=self.name)
                     ):
-                        await self.process(objs)
-        except Exception as ex:
-            self.logger.error("Job execution failed", exc_info=ex)
+                        await self.process_isolating_errors(objs)
+                    if self.adaptive_batch_size:
+                        self.adaptive_batch_size.record_batch(
+                            len(objs), perf_counter() - start
+                        )
+                        self.buffer_size = self.adaptive_batch_size.size
+                errors = 0
+            except Exception as ex:  # noqa: PERF203
+                errors += 1
+                self.logger.error("Job execution failed", exc_info=ex)
+                # Back off while the job keeps failing, e.g. on unavailable Redis
+                await asyncio.sleep(self.retry_policy.delay(errors))
         self.logger.info("Job with queue %s stopped", self.redis_queue)
 
+    async def process_isolating_errors(self, objs: list) -> None:
+        """
+        Process with retries of transient errors, batches failing on data errors
+        are bisected until bad objects are isolated and dead-lettered. The whole
+        batch is dead-lettered on other errors.
+        """
+        try:
+            await bisect_data_errors(objs, self.process_with_retries, self.dead_letter)
+        except Exception as ex:
+            self.logger.error("Failed to process %i objects", len(objs), exc_info=ex)
+            await self.dead_letter_many(objs, ex)
+
+    async def process_with_retries(self, objs: list) -> list:
+        await retry_transient(
+            lambda: self.process(objs), self.retry_policy, self.on_transient_error
+        )
+        return objs
+
+    def on_transient_error(self, _ex: Exception) -> None:
+        if self.adaptive_batch_size:
+            self.adaptive_batch_size.record_error()
+            self.buffer_size = self.adaptive_batch_size.size
+
+    async def dead_letter(self, obj: Any, ex: Exception) -> None:
+        await self.dead_letter_many([obj], ex)
+
+    async def dead_letter_many(self, objs: list, ex: Exception) -> None:
+        self.logger.error(
+            "Pushing %i objects to dead-letter list %s due to: %s",
+            len(objs),
+            self.dead_letter_queue,
+            ex,
+        )
+        try:
+            await self.redis.lpush(
+                self.dead_letter_queue,
+                *(dump_to_json({"data": obj, "error": str(ex)}) for obj in objs),
+            )
+        except RedisError as redis_ex:
+            self.logger.error("Error while pushing to dead-letter list: %s", redis_ex)
+            return
+        self.metrics.labels(name=self.name, stage="dead_letter").inc(len(objs))
+
     def stop(self) -> None:
         self.should_compute = False
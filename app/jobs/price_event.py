@@ -19,6 +19,7 @@ from app.schemas.product_price import ProductPriceDBSchema
 from app.services.event_processing import EventProcessingService
 from app.services.product_price import ProductPriceService
 from app.utils import utc_today
+from app.utils.price_event_codec import PriceEventCodec
 
 
 class PriceEventJob(BaseJob):
@@ -39,7 +40,7 @@ class PriceEventJob(BaseJob):
             await asyncio.sleep(self.redis_pop_timeout)
             return []
 
-        return [PriceEvent.model_validate_json(obj) for obj in res]
+        return PriceEventCodec.decode_many(res)
 
     async def process(self, objs: list[PriceEvent]) -> None:
         async with self.get_db_conn() as conn:
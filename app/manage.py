@@ -2,6 +2,7 @@ import asyncio
 import logging
 from pathlib import Path
 from time import sleep
+from typing import Annotated
 
 import click
 import typer
@@ -14,8 +15,8 @@ from app.config.settings import (
     ValidationJobSettings,
     WorkerSetting,
 )
-from app.constants import PRICE_EVENT_QUEUE, Entity, Job
-from app.consumer_app import run_entity_consumer
+from app.constants import PRICE_EVENT_QUEUE, CountryCode, Entity, Job
+from app.consumer_app import run_entity_consumers
 from app.db import db_adapter
 from app.job_app import job_app
 from app.jobs.entity_population import EntityPopulationJob
@@ -57,11 +58,17 @@ def make_db_migration(message: str):
 
 
 @app.command()
-def run_worker(entity: Entity):
+def run_worker(
+    entity: Entity,
+    countries: Annotated[
+        list[CountryCode] | None,
+        typer.Option("--country", help="Country queue to drain, can be repeated"),
+    ] = None,
+):
     init_sentry(server_name=f"{entity}-worker", component="worker")
     cname = entity.value.capitalize()
     try:
-        asyncio.run(run_message_worker(entity))
+        asyncio.run(run_message_worker(entity, countries))
     except asyncio.CancelledError:
         logger.info("%s consuming and processing task cancelled", cname)
     except Exception as exc:
@@ -71,12 +78,13 @@ def run_worker(entity: Entity):
 
 
 @app.command()
-def run_consumer(entity: Entity):
-    init_sentry(server_name=f"{entity}-consumer", component="consumer")
-    cname = entity.value.capitalize()
+def run_consumer(entities: list[Entity]):
+    server_name = "-".join(entity.value for entity in entities)
+    init_sentry(server_name=f"{server_name}-consumer", component="consumer")
+    cname = ", ".join(entity.value.capitalize() for entity in entities)
 
     try:
-        asyncio.run(run_entity_consumer(entity))
+        asyncio.run(run_entity_consumers(entities))
     except asyncio.CancelledError:
         logger.info("%s consumer task cancelled", cname)
     except Exception as exc:
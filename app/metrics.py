@@ -68,6 +68,43 @@ DB_CONNECTIONS = Gauge(
     ["state"],
 )
 
+CONSUMER_PREFETCH_COUNT = Gauge(
+    "consumer_prefetch_count",
+    "Prefetch count of the consumer adjusted by depth of Redis queues",
+    ["entity"],
+)
+
+REDIS_STREAM_METRICS = Gauge(
+    "redis_stream_group",
+    "Number of pending and not yet delivered messages of a stream consumer group",
+    ["stream", "group", "state"],
+)
+
+ENTITY_CACHE_METRICS = Counter(
+    "entity_cache",
+    "Lookups of incoming entities in the process-local entity cache",
+    ["entity", "result"],
+)
+
+PRICE_EVENT_METRICS = Counter(
+    "price_event_metrics",
+    "Price events generated by entity services and sent after coalescing",
+    ["entity", "operation"],
+)
+
+BATCH_SIZE = Gauge(
+    "batch_size",
+    "Current adaptive batch size of workers and jobs",
+    ["kind", "name"],
+)
+
+WORKER_STAGE_DURATION = Histogram(
+    "worker_stage_duration",
+    "Time spent by entity workers in read, decode, schema, write and buffer stages",
+    ["entity", "stage"],
+    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, INF],
+)
+
 POPULATION_JOB = Counter(
     "population_job",
     "Population job metrics",
@@ -1,4 +1,5 @@
 import logging
+import re
 from typing import cast
 
 import orjson
@@ -9,11 +10,29 @@ from app.schemas.message import InvalidMessageSchema, MessageSchema
 
 logger = logging.getLogger(__name__)
 
+# Matches a JSON string value which contains no escaped characters
+JSON_STRING_VALUE_PATTERN = rb'"([^"\\]*)"'
+
+
+def compile_key_path(keys: list[str]) -> re.Pattern[bytes]:
+    """
+    Compile a pattern which reads a string value of the last key in the path directly
+    from raw JSON bytes. Only the leaf key and its direct parent object are part
+    of the pattern, the rest of the path is ensured by requiring a single match.
+    """
+    *parents, leaf = keys
+    pattern = rb'"%s"\s*:\s*%s' % (re.escape(leaf.encode()), JSON_STRING_VALUE_PATTERN)
+    if parents:
+        pattern = rb'"%s"\s*:\s*\{[^{}]*?%s' % (re.escape(parents[-1].encode()), pattern)
+    return re.compile(pattern)
+
 
 class BaseParser:
     def __init__(self, entity: Entity, throw_errors: bool = True):
         self.throw_errors = throw_errors
         self.entity = entity
+        self.country_pattern = compile_key_path(self.country_key_path())
+        self.action_pattern = compile_key_path(["action"])
 
     def handle_missing_key(self, error_string: str, msg: dict):
         if self.throw_errors:
@@ -28,8 +47,12 @@ class BaseParser:
             msg_dict = msg_dict[key]
         return cast(str, msg_dict)
 
+    def country_key_path(self) -> list[str]:
+        """Override if the country code is not nested in the entity object"""
+        return [self.entity.value, "legacy", "countryCode"]
+
     def get_message_country(self, msg_body: dict):
-        return self.recursive_parser([self.entity, "legacy", "countryCode"], msg_body)
+        return self.recursive_parser(self.country_key_path(), msg_body)
 
     def get_message_id(self, msg_body: dict):
         raise NotImplementedError("Not implemented")
@@ -49,9 +72,32 @@ class BaseParser:
             logger.error("Failed to parse msg, msg is not a valid JSON %s", msg)
             return InvalidMessageSchema(entity=self.entity, msg=msg)  # type: ignore
 
+        return self.parse_message_dict(json_dict, msg)
+
+    def parse_message_dict(self, json_dict: dict, msg: bytes) -> MessageSchema:
+        """Build message schema of the message already decoded to `json_dict`"""
         return MessageSchema(
             entity=self.entity,
             country_code=self.get_message_country(json_dict),
             msg=msg,  # type: ignore
             action=self.get_action(json_dict),
         )
+
+    def prefilter_message_body(self, msg: bytes) -> MessageSchema | InvalidMessageSchema:
+        """
+        Read country code and action straight from the raw message without decoding
+        the whole JSON. If any of the keys is missing or ambiguous (found more than once)
+        the message is parsed by `parse_message_body`. The message is not validated
+        to be a JSON, invalid messages are discarded by the worker.
+        """
+        countries = self.country_pattern.findall(msg)
+        actions = self.action_pattern.findall(msg)
+        if len(countries) != 1 or len(actions) != 1:
+            return self.parse_message_body(msg)
+
+        return MessageSchema.model_construct(
+            entity=self.entity,
+            country_code=countries[0].decode(),
+            msg=msg.decode(),
+            action=actions[0].decode(),
+        )
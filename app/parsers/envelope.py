@@ -0,0 +1,166 @@
+import struct
+import zlib
+from typing import Any
+
+import orjson
+
+from app.constants import Entity
+
+ENVELOPE_MAGIC = 0xA5
+ENVELOPE_VERSION = 1
+ENVELOPE_FLAG_COMPRESSED = 0x01
+ENVELOPE_HEADER = struct.Struct(">BBB")
+
+# Paths of message fields used by workers, a new envelope version must be added
+# whenever a projection changes so workers can still read older envelopes
+ENVELOPE_PROJECTIONS: dict[int, dict[Entity, list[tuple[str, ...]]]] = {
+    1: {
+        Entity.OFFER: [
+            ("action",),
+            ("version",),
+            ("id",),
+            ("productId",),
+            ("shopId",),
+            ("legacy", "countryCode"),
+            ("prices",),
+        ],
+        Entity.SHOP: [
+            ("action",),
+            ("version",),
+            ("shop", "id"),
+            ("shop", "legacy", "countryCode"),
+            ("shop", "state", "verified"),
+            ("shop", "state", "paying"),
+            ("shop", "state", "enabled"),
+            ("shop", "certificate", "enabled"),
+        ],
+        Entity.AVAILABILITY: [
+            ("action",),
+            ("version",),
+            ("offerId",),
+            ("availability", "stockInfo"),
+            ("availability", "legacy", "countryCode"),
+        ],
+        Entity.BUYABLE: [
+            ("action",),
+            ("version",),
+            ("offerId",),
+            ("buyable",),
+            ("legacy", "countryCode"),
+        ],
+    }
+}
+
+
+def decode_message_body(msg_body: bytes) -> dict | None:
+    """Decode JSON object of the message, None if it is not a JSON object"""
+    try:
+        msg_dict = orjson.loads(msg_body)
+    except orjson.JSONDecodeError:
+        return None
+    return msg_dict if isinstance(msg_dict, dict) else None
+
+
+class EnvelopeCodec:
+    """
+    Compact envelope of entity messages pushed from consumer to worker.
+
+    Envelope starts with a header (magic byte, version, flags) followed by a JSON
+    list of records, optionally compressed. Each record contains only projected
+    fields of one message: a bitmask of present fields and their values in
+    projection order.
+    """
+
+    def __init__(self, entity: Entity, version: int = ENVELOPE_VERSION):
+        self.entity = entity
+        self.version = version
+        self.projection = ENVELOPE_PROJECTIONS[version][entity]
+
+    @staticmethod
+    def is_envelope(data: bytes | str) -> bool:
+        return isinstance(data, bytes) and data[:1] == bytes([ENVELOPE_MAGIC])
+
+    @staticmethod
+    def project(msg_body: dict, projection: list[tuple[str, ...]]) -> list[Any]:
+        mask, values = 0, []
+        for i, path in enumerate(projection):
+            value: Any = msg_body
+            for key in path:
+                if not isinstance(value, dict) or key not in value:
+                    break
+                value = value[key]
+            else:
+                mask |= 1 << i
+                values.append(value)
+        return [mask, *values]
+
+    @staticmethod
+    def expand(record: list[Any], projection: list[tuple[str, ...]]) -> dict:
+        mask, values = record[0], iter(record[1:])
+        msg_body: dict = {}
+        for i, path in enumerate(projection):
+            if not mask & (1 << i):
+                continue
+            parent = msg_body
+            for key in path[:-1]:
+                parent = parent.setdefault(key, {})
+            parent[path[-1]] = next(values)
+        return msg_body
+
+    def pack(self, records: list[list[Any]], compress: bool) -> bytes:
+        payload = orjson.dumps(records)
+        flags = 0
+        if compress:
+            payload = zlib.compress(payload)
+            flags |= ENVELOPE_FLAG_COMPRESSED
+        return ENVELOPE_HEADER.pack(ENVELOPE_MAGIC, self.version, flags) + payload
+
+    def encode(
+        self,
+        msg_bodies: list[bytes],
+        batch: bool = False,
+        msg_dicts: list[dict | None] | None = None,
+    ) -> list[bytes]:
+        """
+        Project messages into envelopes, one compressed envelope for all messages
+        if batch is set. Messages are decoded unless their decoded `msg_dicts` are
+        given. Messages which are not JSON objects are passed unchanged.
+        """
+        if msg_dicts is None:
+            msg_dicts = [decode_message_body(msg_body) for msg_body in msg_bodies]
+
+        records, envelopes = [], []
+        for msg_body, msg_dict in zip(msg_bodies, msg_dicts, strict=True):
+            if msg_dict is None:
+                envelopes.append(msg_body)
+                continue
+
+            record = self.project(msg_dict, self.projection)
+            if batch:
+                records.append(record)
+            else:
+                envelopes.append(self.pack([record], compress=False))
+
+        if records:
+            envelopes.append(self.pack(records, compress=True))
+        return envelopes
+
+    def decode(self, data: bytes) -> list[dict]:
+        if len(data) < ENVELOPE_HEADER.size:
+            raise ValueError("Envelope is too short")
+
+        magic, version, flags = ENVELOPE_HEADER.unpack_from(data)
+        if magic != ENVELOPE_MAGIC:
+            raise ValueError("Data is not an envelope")
+        if version not in ENVELOPE_PROJECTIONS:
+            raise ValueError(f"Unsupported envelope version {version}")
+
+        payload = data[ENVELOPE_HEADER.size :]
+        if flags & ENVELOPE_FLAG_COMPRESSED:
+            try:
+                payload = zlib.decompress(payload)
+            except zlib.error as exc:
+                raise ValueError(f"Failed to decompress envelope: {exc}") from exc
+
+        projection = ENVELOPE_PROJECTIONS[version][self.entity]
+        return [self.expand(record, projection) for record in orjson.loads(payload)]
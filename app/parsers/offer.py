@@ -4,8 +4,8 @@ from app.parsers.base import BaseParser
 
 
 class OfferMessageParser(BaseParser):
-    def get_message_country(self, msg_body: dict):
-        return self.recursive_parser(["legacy", "countryCode"], msg_body)
+    def country_key_path(self) -> list[str]:
+        return ["legacy", "countryCode"]
 
     def get_message_id(self, msg_body: dict):
         entity_id = self.recursive_parser(["id"], msg_body)
@@ -1,5 +1,5 @@
 from logging import getLogger
-from typing import Generic, TypeVar
+from typing import Any, Generic, TypeVar
 from uuid import UUID
 
 from redis.asyncio import Redis
@@ -9,11 +9,15 @@ from app.config.settings import ServiceSettings
 from app.constants import ENTITY_VERSION_COLUMNS, PRICE_EVENT_QUEUE, Entity
 from app.crud import crud_from_entity
 from app.crud.base import CreateSchemaTypeT, CRUDBase, DBSchemaTypeT
-from app.metrics import UPDATE_METRICS
+from app.metrics import ENTITY_CACHE_METRICS, PRICE_EVENT_METRICS, UPDATE_METRICS
 from app.schemas.price_event import PriceEvent
-from app.utils import dump_to_json
+from app.utils.entity_cache import EntityCache
+from app.utils.price_event import coalesce_price_events
+from app.utils.price_event_codec import PriceEventCodec
 
 CRUDTypeT = TypeVar("CRUDTypeT", bound=CRUDBase)
+# Original db entity and new entity, None for new and deleted entities respectively
+EntityChange = tuple[Any, Any]
 
 
 class BaseEntityService(
@@ -26,7 +30,28 @@ class BaseEntityService(
         self.crud = crud_from_entity(entity)
         self.entity = entity
         self.logger = getLogger(self.__class__.__name__)
-        self.force_entity_update = ServiceSettings().FORCE_ENTITY_UPDATE
+        settings = ServiceSettings()
+        self.force_entity_update = settings.FORCE_ENTITY_UPDATE
+        self.cache: EntityCache | None = None
+        # Forced updates rewrite unchanged entities, so nothing can be skipped.
+        # Entities without own rows live in offer rows, which other workers delete
+        # and recreate without invalidating the cache of this process.
+        if (
+            settings.SERVICE_ENTITY_CACHE
+            and not self.force_entity_update
+            and self.crud.supports_entity_cache
+        ):
+            self.cache = EntityCache(settings.SERVICE_ENTITY_CACHE_SIZE)
+        self.coalesce_price_events = settings.SERVICE_COALESCE_PRICE_EVENTS
+        self.price_event_codec = PriceEventCodec(
+            binary=settings.SERVICE_BINARY_PRICE_EVENTS
+        )
+        self.price_event_push_chunk_size = max(
+            settings.SERVICE_PRICE_EVENT_PUSH_CHUNK_SIZE, 1
+        )
+        self.conditional_upsert = (
+            settings.SERVICE_CONDITIONAL_UPSERT and self.crud.supports_conditional_upsert
+        )
 
     async def get_many(self, db_conn: AsyncConnection, skip: int = 0, limit: int = 100):
         return await self.crud.get_many(db_conn, skip=skip, limit=limit)
@@ -42,34 +67,123 @@ class BaseEntityService(
         if not msgs:
             return []
         msg_map = {msg.id: msg for msg in msgs}
+        if self.cache is not None:
+            msg_map = self.drop_cached_unchanged(msg_map)
+            if not msg_map:
+                return []
+        if self.conditional_upsert:
+            return await self.upsert_many_conditionally(db_conn, redis, msg_map)
         objs_from_db = {
             i.id: i for i in await self.crud.get_in(db_conn, list(msg_map.keys()))
         }
+        if self.cache is not None:
+            self.cache_db_objects(msg_map, objs_from_db)
         objs_to_upsert: list[CreateSchemaTypeT] = []
-        price_events: list[PriceEvent] = []
+        changes: list[EntityChange] = []
 
         for incoming_msg_id, incoming_msg in msg_map.items():
             obj_from_db = objs_from_db.get(incoming_msg_id)
             if self.should_be_updated(obj_from_db, incoming_msg):
-                if obj_from_db is None:
-                    price_events.extend(
-                        await self.generate_price_events_for_new(db_conn, incoming_msg)
-                    )
-                else:
-                    price_events.extend(
-                        await self.generate_price_events_for_updated(
-                            db_conn, obj_from_db, incoming_msg
-                        )
-                    )
+                changes.append((obj_from_db, incoming_msg))
                 objs_to_upsert.append(incoming_msg)
 
         if not objs_to_upsert:
             return []
 
         upserted_ids = await self.crud.upsert_many(db_conn, objs_to_upsert)
-        await self.send_price_events(redis, price_events)
+        if self.cache is not None:
+            self.cache_upserted(msg_map, upserted_ids)
+        await self.send_price_events_for_changes(db_conn, redis, changes)
+        return upserted_ids
+
+    async def upsert_many_conditionally(
+        self,
+        db_conn: AsyncConnection,
+        redis: Redis,
+        msg_map: dict[UUID, CreateSchemaTypeT],
+    ) -> list[UUID]:
+        """
+        Let the DB decide what `should_be_updated` would, price events are generated
+        from previous rows returned by the upsert
+        """
+        upserted = await self.crud.upsert_many_conditionally(
+            db_conn, list(msg_map.values()), force=self.force_entity_update
+        )
+        changes: list[EntityChange] = []
+        for upserted_id, obj_from_db in upserted:
+            if obj_from_db is not None:
+                UPDATE_METRICS.labels(
+                    update_type="forced" if self.force_entity_update else "standard",
+                    entity=self.entity.value,
+                ).inc()
+            changes.append((obj_from_db, msg_map[upserted_id]))
+
+        upserted_ids = [upserted_id for upserted_id, _ in upserted]
+        if self.cache is not None:
+            self.cache_upserted(msg_map, upserted_ids)
+        await self.send_price_events_for_changes(db_conn, redis, changes)
         return upserted_ids
 
+    @staticmethod
+    def compared_fields(msg_in: CreateSchemaTypeT) -> list[str]:
+        """Fields compared by `should_be_updated`, all DB schemas contain them"""
+        return sorted(msg_in.model_fields.keys() - {"version"})
+
+    def drop_cached_unchanged(
+        self, msg_map: dict[UUID, CreateSchemaTypeT]
+    ) -> dict[UUID, CreateSchemaTypeT]:
+        """
+        Drop messages older than the cached version or of the same version with
+        the same fingerprint, which `should_be_updated` would refuse
+        """
+        assert self.cache is not None
+        changed = {}
+        for msg_id, msg in msg_map.items():
+            entry = self.cache.get(msg_id)
+            if entry is None:
+                changed[msg_id] = msg
+                continue
+            version, fingerprint = entry
+            if msg.version > version or (
+                msg.version == version
+                and fingerprint != self.cache.fingerprint(msg, self.compared_fields(msg))
+            ):
+                changed[msg_id] = msg
+
+        misses = len(changed)
+        ENTITY_CACHE_METRICS.labels(entity=self.entity.value, result="hit").inc(
+            len(msg_map) - misses
+        )
+        ENTITY_CACHE_METRICS.labels(entity=self.entity.value, result="miss").inc(misses)
+        return changed
+
+    def cache_db_objects(
+        self, msg_map: dict[UUID, CreateSchemaTypeT], objs_from_db: dict
+    ) -> None:
+        assert self.cache is not None
+        for msg_id, msg in msg_map.items():
+            obj = objs_from_db.get(msg_id)
+            if obj is None:
+                self.cache.discard([msg_id])
+                continue
+            self.cache.set(
+                msg_id,
+                getattr(obj, msg.version_column),
+                self.cache.fingerprint(obj, self.compared_fields(msg)),
+            )
+
+    def cache_upserted(
+        self, msg_map: dict[UUID, CreateSchemaTypeT], upserted_ids: list[UUID]
+    ) -> None:
+        assert self.cache is not None
+        for msg_id in upserted_ids:
+            msg = msg_map[msg_id]
+            self.cache.set(
+                msg_id,
+                msg.version,
+                self.cache.fingerprint(msg, self.compared_fields(msg)),
+            )
+
     def should_be_updated(
         self, obj_in: DBSchemaTypeT | None, msg_in: CreateSchemaTypeT
     ) -> bool:
@@ -114,17 +228,42 @@ class BaseEntityService(
         ]
 
         deleted_ids = await self.crud.remove_many(db_conn, ids_versions_newer)
+        if self.cache is not None:
+            self.cache.discard(deleted_ids)
         deleted_ids_set = set(deleted_ids)
         old_entities = [e for e in old_entities if e.id in deleted_ids_set]
 
-        price_events = []
-        for old_entity in old_entities:
-            price_events.extend(
-                await self.generate_price_events_for_delete(db_conn, old_entity)
-            )
-        await self.send_price_events(redis, price_events)
+        await self.send_price_events_for_changes(
+            db_conn, redis, [(old_entity, None) for old_entity in old_entities]
+        )
         return deleted_ids
 
+    async def send_price_events_for_changes(
+        self, db_conn: AsyncConnection, redis: Redis, changes: list[EntityChange]
+    ) -> None:
+        """
+        Generate and send price events of written entities, each change is a pair
+        of the original db entity, None for new ones, and the new entity, None for
+        deleted ones.
+        """
+        price_events: list[PriceEvent] = []
+        for orig_db_entity, new_entity in changes:
+            if orig_db_entity is None:
+                price_events.extend(
+                    await self.generate_price_events_for_new(db_conn, new_entity)
+                )
+            elif new_entity is None:
+                price_events.extend(
+                    await self.generate_price_events_for_delete(db_conn, orig_db_entity)
+                )
+            else:
+                price_events.extend(
+                    await self.generate_price_events_for_updated(
+                        db_conn, orig_db_entity, new_entity
+                    )
+                )
+        await self.send_price_events(redis, price_events)
+
     async def generate_price_events_for_new(
         self, db_conn: AsyncConnection, new_entity: CreateSchemaTypeT
     ) -> list[PriceEvent]:
@@ -167,7 +306,23 @@ class BaseEntityService(
         raise NotImplementedError()
 
     async def send_price_events(self, redis: Redis, events: list[PriceEvent]):
-        if events:
-            events_json = [dump_to_json(e) for e in events]
-            await redis.lpush(PRICE_EVENT_QUEUE, *events_json)
-            self.logger.info("%i price events sent", len(events_json))
+        if self.coalesce_price_events and events:
+            PRICE_EVENT_METRICS.labels(
+                entity=self.entity.value, operation="generated"
+            ).inc(len(events))
+            events = coalesce_price_events(events)
+            PRICE_EVENT_METRICS.labels(entity=self.entity.value, operation="sent").inc(
+                len(events)
+            )
+        if not events:
+            return
+        encoded = self.price_event_codec.encode_many(events)
+        chunk_size = self.price_event_push_chunk_size
+        if len(encoded) <= chunk_size:
+            await redis.lpush(PRICE_EVENT_QUEUE, *encoded)
+        else:
+            async with redis.pipeline(transaction=False) as pipe:
+                for i in range(0, len(encoded), chunk_size):
+                    pipe.lpush(PRICE_EVENT_QUEUE, *encoded[i : i + chunk_size])
+                await pipe.execute()
+        self.logger.info("%i price events sent", len(encoded))
@@ -1,12 +1,16 @@
+from uuid import UUID
+
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncConnection
 
+from app import crud
 from app.constants import Entity, ProductPriceType
 from app.schemas.offer import (
     OfferCreateSchema,
     OfferDBSchema,
 )
 from app.schemas.price_event import PriceEvent, PriceEventAction
-from app.services.base import BaseEntityService
+from app.services.base import BaseEntityService, EntityChange
 from app.utils.price_event import create_price_event_from_offer
 
 
@@ -27,34 +31,107 @@ class OfferService(BaseEntityService[OfferDBSchema, OfferCreateSchema]):
             ]
         return []
 
+    async def send_price_events_for_changes(
+        self, db_conn: AsyncConnection, redis: Redis, changes: list[EntityChange]
+    ) -> None:
+        """
+        Certification of shops offers in stock moved to is read for all changes
+        at once, instead of once for each moved offer
+        """
+        certified_shops = await self.get_certified_shops(
+            db_conn,
+            [
+                new_offer.shop_id
+                for orig_db_offer, new_offer in changes
+                if orig_db_offer is not None
+                and new_offer is not None
+                and self.moved_in_stock(orig_db_offer, new_offer)
+            ],
+        )
+        price_events: list[PriceEvent] = []
+        for orig_db_offer, new_offer in changes:
+            if orig_db_offer is None:
+                price_events.extend(
+                    await self.generate_price_events_for_new(db_conn, new_offer)
+                )
+            elif new_offer is None:
+                price_events.extend(
+                    await self.generate_price_events_for_delete(db_conn, orig_db_offer)
+                )
+            else:
+                price_events.extend(
+                    await self.generate_price_events_for_updated(
+                        db_conn, orig_db_offer, new_offer, certified_shops
+                    )
+                )
+        await self.send_price_events(redis, price_events)
+
     async def generate_price_events_for_updated(
         self,
-        db_conn: AsyncConnection,  # noqa ARG002
+        db_conn: AsyncConnection,
         orig_db_offer: OfferDBSchema,
         new_offer: OfferCreateSchema,
+        certified_shops: dict[UUID, bool] | None = None,
     ) -> list[PriceEvent]:
         """
-        It generates all UPSERT events based on offer state (in_stock, buyable, certified_shop)
-        If `product_id` original offer and new offer is different it also
-        generates all necessary DELETE events for original offer.
+        It generates only events changing prices of the product: UPSERT events
+        with the old price for price types of the offer when its price changed,
+        UPSERT events for price types the offer joined and DELETE events for price
+        types it left, which happens when it moves to a shop of other certification.
+        If `product_id` original offer and new offer is different it generates
+        DELETE events for original offer and UPSERT events for the new product.
+        Changes of other fields, like `shop_id` or `version`, generate no events.
+        Certification of the new shop is taken from `certified_shops` when given.
         """
-        price_types = self.get_price_type_changes(orig_db_offer)
-
-        price_events = [
-            create_price_event_from_offer(
-                offer=new_offer,
-                price_type=price_type,
-                action=PriceEventAction.UPSERT,
-                old_price=orig_db_offer.price,
+        orig_price_types = self.get_price_type_changes(orig_db_offer)
+        new_price_types = orig_price_types
+        if self.moved_in_stock(orig_db_offer, new_offer):
+            if certified_shops is None:
+                certified_shops = await self.get_certified_shops(
+                    db_conn, [new_offer.shop_id]
+                )
+            new_price_types = self.get_price_type_changes(
+                orig_db_offer.model_copy(
+                    update={
+                        "certified_shop": certified_shops.get(new_offer.shop_id, False)
+                    }
+                )
             )
-            for price_type in price_types
-        ]
+
         if orig_db_offer.product_id != new_offer.product_id:
-            price_events.extend(
-                await self.generate_price_events_for_delete(db_conn, orig_db_offer)
-            )
+            return [
+                *self.create_price_events(
+                    new_offer, new_price_types, PriceEventAction.UPSERT
+                ),
+                *await self.generate_price_events_for_delete(db_conn, orig_db_offer),
+            ]
 
-        return price_events
+        price_changed = (orig_db_offer.price, orig_db_offer.currency_code) != (
+            new_offer.price,
+            new_offer.currency_code,
+        )
+        return [
+            *self.create_price_events(
+                new_offer,
+                (
+                    [t for t in new_price_types if t in orig_price_types]
+                    if price_changed
+                    else []
+                ),
+                PriceEventAction.UPSERT,
+                old_price=orig_db_offer.price,
+            ),
+            *self.create_price_events(
+                new_offer,
+                [t for t in new_price_types if t not in orig_price_types],
+                PriceEventAction.UPSERT,
+            ),
+            *self.create_price_events(
+                orig_db_offer,
+                [t for t in orig_price_types if t not in new_price_types],
+                PriceEventAction.DELETE,
+            ),
+        ]
 
     async def generate_price_events_for_delete(
         self, db_conn: AsyncConnection, orig_db_offer: OfferDBSchema  # noqa ARG002
@@ -70,6 +147,37 @@ class OfferService(BaseEntityService[OfferDBSchema, OfferCreateSchema]):
             for price_type in price_types
         ]
 
+    @staticmethod
+    def create_price_events(
+        offer: OfferDBSchema | OfferCreateSchema,
+        price_types: list[ProductPriceType],
+        action: PriceEventAction,
+        old_price: float | None = None,
+    ) -> list[PriceEvent]:
+        return [
+            create_price_event_from_offer(
+                offer=offer, price_type=price_type, action=action, old_price=old_price
+            )
+            for price_type in price_types
+        ]
+
+    @staticmethod
+    def moved_in_stock(
+        orig_db_offer: OfferDBSchema, new_offer: OfferCreateSchema
+    ) -> bool:
+        """Offer in stock moved to another shop, possibly of other certification"""
+        return bool(orig_db_offer.in_stock) and orig_db_offer.shop_id != new_offer.shop_id
+
+    @staticmethod
+    async def get_certified_shops(
+        db_conn: AsyncConnection, shop_ids: list[UUID]
+    ) -> dict[UUID, bool]:
+        """Certification of existing shops of given IDs"""
+        if not shop_ids:
+            return {}
+        shops = await crud.shop.get_in(db_conn, list(set(shop_ids)))
+        return {shop.id: shop.certified for shop in shops}
+
     @staticmethod
     def get_price_type_changes(offer: OfferDBSchema) -> list[ProductPriceType]:
         """
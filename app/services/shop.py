@@ -1,32 +1,50 @@
+from typing import AsyncGenerator
 from uuid import UUID
 
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncConnection
 
 from app import crud
+from app.config.settings import ServiceSettings
 from app.constants import Entity, ProductPriceType
 from app.schemas.price_event import PriceEvent, PriceEventAction
 from app.schemas.shop import (
     ShopCreateSchema,
     ShopDBSchema,
 )
-from app.services.base import BaseEntityService
+from app.services.base import BaseEntityService, EntityChange
 from app.utils.price_event import create_price_event_from_offer
 
 
 class ShopService(BaseEntityService[ShopDBSchema, ShopCreateSchema]):
     def __init__(self):
         super().__init__(Entity.SHOP)
+        self.fan_out_batch_size = ServiceSettings().SERVICE_SHOP_FAN_OUT_BATCH_SIZE
+
+    async def send_price_events_for_changes(
+        self, db_conn: AsyncConnection, redis: Redis, changes: list[EntityChange]
+    ) -> None:
+        """
+        Offers of all shops with the same certification change are fanned out at once,
+        so the memory does not grow with the number of offers of the shops
+        """
+        shop_ids: dict[PriceEventAction, list[UUID]] = {}
+        for orig_db_shop, new_shop in changes:
+            event_action = self.get_certification_change(orig_db_shop, new_shop)
+            if event_action:
+                shop_ids.setdefault(event_action, []).append(
+                    (new_shop or orig_db_shop).id
+                )
+
+        for event_action, action_shop_ids in shop_ids.items():
+            await self.send_shop_price_events(
+                db_conn, redis, action_shop_ids, event_action
+            )
 
     async def generate_price_events_for_new(
         self, db_conn: AsyncConnection, new_shop: ShopCreateSchema
     ) -> list[PriceEvent]:
-        if new_shop.certified:
-            return await self.generate_shop_price_events(
-                db_conn,
-                new_shop.id,
-                PriceEventAction.UPSERT,
-            )
-        return []
+        return await self.generate_price_events_for_change(db_conn, None, new_shop)
 
     async def generate_price_events_for_updated(
         self,
@@ -34,38 +52,76 @@ class ShopService(BaseEntityService[ShopDBSchema, ShopCreateSchema]):
         orig_db_shop: ShopDBSchema,
         new_shop: ShopCreateSchema,
     ) -> list[PriceEvent]:
-        event_action: PriceEventAction | None = None
-
-        if not orig_db_shop.certified and new_shop.certified:
-            event_action = PriceEventAction.UPSERT
-        if orig_db_shop.certified and not new_shop.certified:
-            event_action = PriceEventAction.DELETE
-
-        if not event_action:
-            return []
-
-        return await self.generate_shop_price_events(db_conn, new_shop.id, event_action)
+        return await self.generate_price_events_for_change(
+            db_conn, orig_db_shop, new_shop
+        )
 
     async def generate_price_events_for_delete(
         self, db_conn: AsyncConnection, orig_db_shop: ShopDBSchema
     ) -> list[PriceEvent]:
-        if orig_db_shop.certified:
-            return await self.generate_shop_price_events(
-                db_conn,
-                orig_db_shop.id,
-                PriceEventAction.DELETE,
-            )
-        return []
+        return await self.generate_price_events_for_change(db_conn, orig_db_shop, None)
 
-    @staticmethod
-    async def generate_shop_price_events(
-        db_conn: AsyncConnection, shop_id: UUID, action: PriceEventAction
+    async def generate_price_events_for_change(
+        self,
+        db_conn: AsyncConnection,
+        orig_db_shop: ShopDBSchema | None,
+        new_shop: ShopCreateSchema | None,
     ) -> list[PriceEvent]:
+        """
+        Collected price events of one shop change, changes written by the service
+        are sent by `send_price_events_for_changes` without collecting the events
+        """
+        event_action = self.get_certification_change(orig_db_shop, new_shop)
+        shop = new_shop or orig_db_shop
+        if not event_action or shop is None:
+            return []
         return [
-            create_price_event_from_offer(
-                offer=offer,
-                price_type=ProductPriceType.IN_STOCK_CERTIFIED,
-                action=action,
+            event
+            async for events in self.stream_shop_price_events(
+                db_conn, [shop.id], event_action
             )
-            for offer in await crud.shop.get_offers_in_stock_for_shops(db_conn, [shop_id])
+            for event in events
         ]
+
+    @staticmethod
+    def get_certification_change(
+        orig_db_shop: ShopDBSchema | None, new_shop: ShopCreateSchema | None
+    ) -> PriceEventAction | None:
+        """
+        Action of price events of offers in stock when the shop is created, updated
+        or deleted, None when certification of the shop did not change
+        """
+        was_certified = orig_db_shop is not None and orig_db_shop.certified
+        is_certified = new_shop is not None and new_shop.certified
+
+        if not was_certified and is_certified:
+            return PriceEventAction.UPSERT
+        if was_certified and not is_certified:
+            return PriceEventAction.DELETE
+        return None
+
+    async def send_shop_price_events(
+        self,
+        db_conn: AsyncConnection,
+        redis: Redis,
+        shop_ids: list[UUID],
+        action: PriceEventAction,
+    ) -> None:
+        async for events in self.stream_shop_price_events(db_conn, shop_ids, action):
+            await self.send_price_events(redis, events)
+
+    async def stream_shop_price_events(
+        self, db_conn: AsyncConnection, shop_ids: list[UUID], action: PriceEventAction
+    ) -> AsyncGenerator[list[PriceEvent], None]:
+        """Price events of offers in stock of the shops in batches"""
+        async for offers in crud.shop.stream_offers_in_stock_for_shops(
+            db_conn, shop_ids, self.fan_out_batch_size
+        ):
+            yield [
+                create_price_event_from_offer(
+                    offer=offer,
+                    price_type=ProductPriceType.IN_STOCK_CERTIFIED,
+                    action=action,
+                )
+                for offer in offers
+            ]
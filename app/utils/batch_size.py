@@ -0,0 +1,65 @@
+from prometheus_client import Gauge
+
+# Multipliers of the batch size when it grows and shrinks
+GROWTH_FACTOR = 1.25
+SHRINK_FACTOR = 0.5
+
+
+class AdaptiveBatchSize:
+    """
+    Batch size adjusted within bounds by processed batches. It grows while
+    the latency per item of full batches keeps falling, as happens in a backlog,
+    and halves when a batch takes longer than the max latency, on transient
+    errors like deadlocks or when a batch waits longer than the max age to fill.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        min_size: int,
+        max_size: int,
+        max_latency: float,
+        max_age: float = 0,
+        gauge: Gauge | None = None,
+    ):
+        self.min_size = max(min_size, 1)
+        self.max_size = max(max_size, self.min_size)
+        self.max_latency = max_latency
+        self.max_age = max_age
+        self.gauge = gauge
+        self.item_latency: float | None = None
+        self.size = self.min_size
+        self.set_size(size)
+
+    def set_size(self, size: int) -> None:
+        self.size = min(max(size, self.min_size), self.max_size)
+        if self.gauge is not None:
+            self.gauge.set(self.size)
+
+    def grow(self) -> None:
+        self.set_size(max(int(self.size * GROWTH_FACTOR), self.size + 1))
+
+    def shrink(self) -> None:
+        self.set_size(int(self.size * SHRINK_FACTOR))
+        # Latency of smaller batches is measured again before it can grow
+        self.item_latency = None
+
+    def record_batch(self, count: int, duration: float) -> None:
+        if duration > self.max_latency:
+            self.shrink()
+            return
+        # Partial batches mean there is no backlog to batch
+        if not count or count < self.size:
+            return
+
+        item_latency = duration / count
+        if self.item_latency is not None and item_latency <= self.item_latency:
+            self.grow()
+        self.item_latency = item_latency
+
+    def record_age(self, age: float) -> None:
+        if self.max_age and age > self.max_age:
+            self.shrink()
+
+    def record_error(self) -> None:
+        self.shrink()
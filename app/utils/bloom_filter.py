@@ -0,0 +1,39 @@
+import hashlib
+import math
+from typing import Iterable
+
+HALF_DIGEST_SIZE = 8
+
+
+class BloomFilter:
+    """
+    Set of byte keys with false positives at the given rate up to the capacity,
+    bit positions are derived from a 128-bit digest of the key by double hashing
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / max(capacity, 1) * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, key: bytes) -> list[int]:
+        digest = hashlib.blake2b(key, digest_size=2 * HALF_DIGEST_SIZE).digest()
+        first = int.from_bytes(digest[:HALF_DIGEST_SIZE], "little")
+        second = int.from_bytes(digest[HALF_DIGEST_SIZE:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, key: bytes) -> None:
+        bits = self.bits
+        for position in self.positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def add_many(self, keys: Iterable[bytes]) -> None:
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key: bytes) -> bool:
+        bits = self.bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self.positions(key)
+        )
@@ -0,0 +1,46 @@
+import hashlib
+from collections import OrderedDict
+from typing import Any, Iterable
+from uuid import UUID
+
+from app.utils import dump_to_json_bytes
+
+FINGERPRINT_DIGEST_SIZE = 8
+
+
+class EntityCache:
+    """
+    Bounded LRU cache of (version, fingerprint) of entities as last seen in the DB
+    by this process, the fingerprint is a digest of values of compared fields.
+    Least recently used entities are evicted above the max size.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries: OrderedDict[UUID, tuple[int, int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def fingerprint(entity: Any, fields: Iterable[str]) -> int:
+        """Digest stable across processes, unlike `hash` of randomized strings"""
+        values = dump_to_json_bytes([getattr(entity, field, None) for field in fields])
+        digest = hashlib.blake2b(values, digest_size=FINGERPRINT_DIGEST_SIZE).digest()
+        return int.from_bytes(digest)
+
+    def get(self, entity_id: UUID) -> tuple[int, int] | None:
+        entry = self.entries.get(entity_id)
+        if entry is not None:
+            self.entries.move_to_end(entity_id)
+        return entry
+
+    def set(self, entity_id: UUID, version: int, fingerprint: int) -> None:
+        self.entries[entity_id] = (version, fingerprint)
+        self.entries.move_to_end(entity_id)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def discard(self, entity_ids: Iterable[UUID]) -> None:
+        for entity_id in entity_ids:
+            self.entries.pop(entity_id, None)
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+from uuid import UUID
+
+from redis import RedisError
+from redis.asyncio import Redis
+from redis.asyncio.client import PubSub
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.db.tables import offer as offer_table
+from app.utils.bloom_filter import BloomFilter
+
+# Redis channel with raw 16-byte ids of offers written by offer workers
+OFFER_IDS_CHANNEL = "pps-offer-ids"
+UUID_SIZE = 16
+LOAD_BATCH_SIZE = 10_000
+
+logger = logging.getLogger(__name__)
+
+
+class OfferIdFilter:
+    """
+    Bloom filter of ids of offers in the DB, loaded from the offers table and
+    updated by ids broadcast by offer workers. Offers are never removed, deleted
+    offers are only false positives. Until the filter is loaded or when
+    the broadcast subscription fails, all offers are reported as known.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.ready = False
+        self.pubsub: PubSub | None = None
+        self.listener: asyncio.Task | None = None
+
+    def __contains__(self, offer_id: UUID) -> bool:
+        return not self.ready or offer_id.bytes in self.bloom
+
+    def add_packed(self, packed_ids: bytes) -> None:
+        self.bloom.add_many(
+            packed_ids[i : i + UUID_SIZE] for i in range(0, len(packed_ids), UUID_SIZE)
+        )
+
+    async def start(self, db_engine: AsyncEngine, redis: Redis) -> None:
+        # Subscribed before loading, so offers written meanwhile are not missed
+        self.pubsub = redis.pubsub()
+        await self.pubsub.subscribe(OFFER_IDS_CHANNEL)
+        self.listener = asyncio.create_task(self.listen(self.pubsub))
+
+        count = 0
+        async with db_engine.connect() as conn:
+            result = await conn.stream(
+                select(offer_table.c.id).execution_options(yield_per=LOAD_BATCH_SIZE)
+            )
+            async for rows in result.partitions():
+                self.bloom.add_many(row[0].bytes for row in rows)
+                count += len(rows)
+        self.ready = self.listener is not None and not self.listener.done()
+        logger.info("Offer id filter loaded with %i offers", count)
+
+    async def listen(self, pubsub: PubSub) -> None:
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    self.add_packed(message["data"])
+        except RedisError as exc:
+            logger.error("Offer id broadcast failed, filter is disabled: %s", exc)
+        finally:
+            self.ready = False
+
+    async def stop(self) -> None:
+        self.ready = False
+        if self.listener is not None:
+            self.listener.cancel()
+            await asyncio.gather(self.listener, return_exceptions=True)
+            self.listener = None
+        if self.pubsub is not None:
+            await self.pubsub.aclose()  # type: ignore[attr-defined]
+            self.pubsub = None
+
+    @staticmethod
+    async def broadcast(redis: Redis, offer_ids: list[UUID]) -> None:
+        if offer_ids:
+            await redis.publish(
+                OFFER_IDS_CHANNEL, b"".join(offer_id.bytes for offer_id in offer_ids)
+            )
@@ -1,4 +1,5 @@
 import datetime as dt
+from uuid import UUID
 
 from sqlalchemy import Connection, TextClause
 from sqlalchemy import text as sa_text
@@ -62,3 +63,90 @@ async def async_create_product_prices_part_tables_for_day(
 
     for stmt in hash_partitions_stmts:
         await db_conn.execute(stmt)
+
+
+# Hash partitions of the offers table, see migration creating partitioned offers
+OFFER_HASH_PARTITIONS = 20
+# Seed of hash functions used by PostgreSQL hash partitioning
+HASH_PARTITION_SEED = 0x7A5B22367996DCFD
+
+UINT32_MASK = 0xFFFFFFFF
+UINT64_MASK = 0xFFFFFFFFFFFFFFFF
+# Jenkins hash consumes data in blocks of three 32-bit words
+HASH_BLOCK_SIZE = 12
+
+
+def _rot(x: int, k: int) -> int:
+    return ((x << k) | (x >> (32 - k))) & UINT32_MASK
+
+
+def _mix(a: int, b: int, c: int) -> tuple[int, int, int]:
+    a = ((a - c) & UINT32_MASK) ^ _rot(c, 4)
+    c = (c + b) & UINT32_MASK
+    b = ((b - a) & UINT32_MASK) ^ _rot(a, 6)
+    a = (a + c) & UINT32_MASK
+    c = ((c - b) & UINT32_MASK) ^ _rot(b, 8)
+    b = (b + a) & UINT32_MASK
+    a = ((a - c) & UINT32_MASK) ^ _rot(c, 16)
+    c = (c + b) & UINT32_MASK
+    b = ((b - a) & UINT32_MASK) ^ _rot(a, 19)
+    a = (a + c) & UINT32_MASK
+    c = ((c - b) & UINT32_MASK) ^ _rot(b, 4)
+    b = (b + a) & UINT32_MASK
+    return a, b, c
+
+
+def _final(a: int, b: int, c: int) -> tuple[int, int, int]:
+    c = ((c ^ b) - _rot(b, 14)) & UINT32_MASK
+    a = ((a ^ c) - _rot(c, 11)) & UINT32_MASK
+    b = ((b ^ a) - _rot(a, 25)) & UINT32_MASK
+    c = ((c ^ b) - _rot(b, 16)) & UINT32_MASK
+    a = ((a ^ c) - _rot(c, 4)) & UINT32_MASK
+    b = ((b ^ a) - _rot(a, 14)) & UINT32_MASK
+    c = ((c ^ b) - _rot(b, 24)) & UINT32_MASK
+    return a, b, c
+
+
+def hash_bytes_extended(data: bytes, seed: int) -> int:
+    """Port of PostgreSQL `hash_bytes_extended` (Jenkins lookup3) for little-endian"""
+    length = len(data)
+    a = b = c = (0x9E3779B9 + length + 3923095) & UINT32_MASK
+    if seed:
+        a = (a + (seed >> 32)) & UINT32_MASK
+        b = (b + (seed & UINT32_MASK)) & UINT32_MASK
+        a, b, c = _mix(a, b, c)
+
+    pos = 0
+    while length - pos >= HASH_BLOCK_SIZE:
+        a = (a + int.from_bytes(data[pos : pos + 4], "little")) & UINT32_MASK
+        b = (b + int.from_bytes(data[pos + 4 : pos + 8], "little")) & UINT32_MASK
+        c = (c + int.from_bytes(data[pos + 8 : pos + 12], "little")) & UINT32_MASK
+        a, b, c = _mix(a, b, c)
+        pos += HASH_BLOCK_SIZE
+
+    tail = data[pos:]
+    # The lowest byte of c is reserved for the length
+    a = (a + int.from_bytes(tail[0:4], "little")) & UINT32_MASK
+    b = (b + int.from_bytes(tail[4:8], "little")) & UINT32_MASK
+    c = (c + (int.from_bytes(tail[8:11], "little") << 8)) & UINT32_MASK
+
+    a, b, c = _final(a, b, c)
+    return (b << 32) | c
+
+
+def hash_combine64(a: int, b: int) -> int:
+    return a ^ ((b + 0x49A0F4DD15E5A8E3 + (a << 54) + (a >> 7)) & UINT64_MASK)
+
+
+def uuid_hash_partition(values: list[UUID], modulus: int) -> int:
+    """Remainder of the hash partition PostgreSQL routes a row with UUID keys to"""
+    row_hash = 0
+    for value in values:
+        row_hash = hash_combine64(
+            row_hash, hash_bytes_extended(value.bytes, HASH_PARTITION_SEED)
+        )
+    return row_hash % modulus
+
+
+def get_offer_partition(product_id: UUID, offer_id: UUID) -> int:
+    return uuid_hash_partition([product_id, offer_id], OFFER_HASH_PARTITIONS)
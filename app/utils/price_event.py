@@ -1,3 +1,6 @@
+from collections import defaultdict
+from operator import attrgetter
+
 from app.constants import ProductPriceType
 from app.schemas.offer import OfferCreateSchema, OfferDBSchema
 from app.schemas.price_event import PriceEvent, PriceEventAction
@@ -28,3 +31,45 @@ def create_price_event_from_offer(
             include={"product_id", "price", "country_code", "currency_code"}
         ),
     )
+
+
+def coalesce_price_events(events: list[PriceEvent]) -> list[PriceEvent]:
+    """
+    Drop price events which cannot change the result of other events of the same
+    product and price type, kept events are not modified and keep their order.
+
+    Upserts of new prices, without the old price, and deletes of the same action
+    are reduced to those with the lowest and the highest price. Prices between
+    them can neither become the new min or max price nor be the min or max price
+    triggering its recomputation. Upserts replacing the old price are only
+    deduplicated, as any old price may be the one to recompute.
+    """
+    ranges: dict[tuple, list[PriceEvent]] = defaultdict(list)
+    for event in events:
+        if event.price is not None and event.old_price is None:
+            ranges[(event.product_id, event.type, event.action)].append(event)
+    kept_bounds = set()
+    for ranged_events in ranges.values():
+        kept_bounds.add(id(min(ranged_events, key=attrgetter("price"))))
+        kept_bounds.add(id(max(ranged_events, key=attrgetter("price"))))
+
+    seen_replacements: set[tuple] = set()
+    coalesced = []
+    for event in events:
+        if event.price is None:
+            coalesced.append(event)
+        elif event.old_price is None:
+            if id(event) in kept_bounds:
+                coalesced.append(event)
+        else:
+            replacement = (
+                event.product_id,
+                event.type,
+                event.action,
+                event.price,
+                event.old_price,
+            )
+            if replacement not in seen_replacements:
+                seen_replacements.add(replacement)
+                coalesced.append(event)
+    return coalesced
@@ -0,0 +1,149 @@
+import struct
+from datetime import UTC, datetime, timedelta
+from enum import StrEnum
+from typing import Any
+from uuid import UUID
+
+from app.constants import PRICE_SCALE, CountryCode, CurrencyCode, ProductPriceType
+from app.schemas.price_event import PriceEvent, PriceEventAction
+from app.utils import dump_to_json_bytes
+
+PRICE_EVENT_VERSION = 1
+# JSON events are objects, binary events start with the layout version instead
+JSON_FIRST_BYTE = ord("{")
+PRICE_FACTOR = 10**PRICE_SCALE
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+MICROSECOND = timedelta(microseconds=1)
+
+FLAG_HAS_PRICE = 0x01
+FLAG_HAS_OLD_PRICE = 0x02
+
+# Version, product id, type, action, flags, country code, currency code,
+# price and old price scaled by the price scale, created at in epoch microseconds
+PRICE_EVENT_LAYOUTS: dict[int, struct.Struct] = {
+    1: struct.Struct(">B16sBBBBBqqq"),
+}
+# Codes of enum members are their positions, members are listed explicitly so
+# the codes do not depend on the enum declarations and may only be appended
+PRICE_EVENT_ENUMS: dict[int, dict[type[StrEnum], tuple[Any, ...]]] = {
+    1: {
+        ProductPriceType: (
+            ProductPriceType.ALL_OFFERS,
+            ProductPriceType.MARKETPLACE,
+            ProductPriceType.IN_STOCK,
+            ProductPriceType.IN_STOCK_CERTIFIED,
+        ),
+        PriceEventAction: (PriceEventAction.UPSERT, PriceEventAction.DELETE),
+        CountryCode: (
+            CountryCode.BA,
+            CountryCode.BG,
+            CountryCode.HR,
+            CountryCode.CZ,
+            CountryCode.HU,
+            CountryCode.RO,
+            CountryCode.RS,
+            CountryCode.SI,
+            CountryCode.SK,
+        ),
+        CurrencyCode: (
+            CurrencyCode.BAM,
+            CurrencyCode.EUR,
+            CurrencyCode.BGN,
+            CurrencyCode.HRK,
+            CurrencyCode.CZK,
+            CurrencyCode.HUF,
+            CurrencyCode.RON,
+            CurrencyCode.RSD,
+        ),
+    }
+}
+
+
+class PriceEventCodec:
+    """
+    Versioned fixed-layout binary encoding of price events in the event queue.
+    JSON events are still decoded, so producers and the job can be rolled out
+    in any order as long as the job is deployed before producers encode events.
+    """
+
+    def __init__(self, binary: bool = True, version: int = PRICE_EVENT_VERSION):
+        self.binary = binary
+        self.version = version
+        self.layout = PRICE_EVENT_LAYOUTS[version]
+        self.codes = {
+            enum: {member: code for code, member in enumerate(members)}
+            for enum, members in PRICE_EVENT_ENUMS[version].items()
+        }
+
+    def encode(self, event: PriceEvent) -> bytes:
+        if not self.binary:
+            return dump_to_json_bytes(event)
+
+        flags = 0
+        if event.price is not None:
+            flags |= FLAG_HAS_PRICE
+        if event.old_price is not None:
+            flags |= FLAG_HAS_OLD_PRICE
+        return self.layout.pack(
+            self.version,
+            event.product_id.bytes,
+            self.codes[ProductPriceType][event.type],
+            self.codes[PriceEventAction][event.action],
+            flags,
+            self.codes[CountryCode][event.country_code],
+            self.codes[CurrencyCode][event.currency_code],
+            round((event.price or 0) * PRICE_FACTOR),
+            round((event.old_price or 0) * PRICE_FACTOR),
+            (event.created_at - EPOCH) // MICROSECOND,
+        )
+
+    def encode_many(self, events: list[PriceEvent]) -> list[bytes]:
+        return [self.encode(event) for event in events]
+
+    @staticmethod
+    def decode_many(data: list[bytes]) -> list[PriceEvent]:
+        """Decode events of any version and encoding"""
+        return [PriceEventCodec.decode(item) for item in data]
+
+    @staticmethod
+    def decode(data: bytes) -> PriceEvent:
+        if not data:
+            raise ValueError("Price event is empty")
+        if data[0] == JSON_FIRST_BYTE:
+            return PriceEvent.model_validate_json(data)
+
+        version = data[0]
+        layout = PRICE_EVENT_LAYOUTS.get(version)
+        if layout is None:
+            raise ValueError(f"Unsupported price event version {version}")
+        if len(data) != layout.size:
+            raise ValueError(f"Price event of version {version} has invalid size")
+
+        (
+            _,
+            product_id,
+            price_type,
+            action,
+            flags,
+            country_code,
+            currency_code,
+            price,
+            old_price,
+            created_at,
+        ) = layout.unpack(data)
+        enums = PRICE_EVENT_ENUMS[version]
+        try:
+            return PriceEvent.model_construct(
+                product_id=UUID(bytes=product_id),
+                type=enums[ProductPriceType][price_type],
+                action=enums[PriceEventAction][action],
+                price=price / PRICE_FACTOR if flags & FLAG_HAS_PRICE else None,
+                old_price=(
+                    old_price / PRICE_FACTOR if flags & FLAG_HAS_OLD_PRICE else None
+                ),
+                country_code=enums[CountryCode][country_code],
+                currency_code=enums[CurrencyCode][currency_code],
+                created_at=EPOCH + created_at * MICROSECOND,
+            )
+        except IndexError as exc:
+            raise ValueError(f"Unknown enum code in price event: {exc}") from exc
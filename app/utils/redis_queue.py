@@ -0,0 +1,40 @@
+from app.constants import CountryCode, Entity, RedisQueueTransport
+
+
+def entity_queue_name(
+    entity: Entity,
+    transport: RedisQueueTransport,
+    country_code: CountryCode | str | None = None,
+) -> str:
+    """
+    Name of Redis key with entity messages passed from consumer to worker,
+    queues sharded by country have the country code suffix
+    """
+    name = f"rmq-{entity.value}"
+    if transport == RedisQueueTransport.STREAM:
+        name = f"rmq-stream-{entity.value}"
+    if country_code:
+        name = f"{name}-{country_code}"
+    return name
+
+
+def entity_queue_names(
+    entity: Entity,
+    transport: RedisQueueTransport,
+    countries: list[CountryCode] | None = None,
+) -> list[str]:
+    """
+    Names of per-country queues of the entity, all countries and the queue
+    of messages without country if countries are not given
+    """
+    if countries:
+        return [entity_queue_name(entity, transport, country) for country in countries]
+    return [
+        *(entity_queue_name(entity, transport, country) for country in CountryCode),
+        entity_queue_name(entity, transport),
+    ]
+
+
+def dead_letter_queue_name(name: str) -> str:
+    """Name of Redis list with entities of a worker or job which failed to process"""
+    return f"dead-letter-{name}"
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import random
+from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeVar
+
+from sqlalchemy.exc import DBAPIError
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE classes and codes of errors which can pass when the batch is retried:
+# transaction rollbacks (deadlocks, serialization failures) and lock timeouts
+TRANSIENT_SQLSTATES = ("40", "55P03")
+# Data exceptions and integrity violations caused by values of some rows
+DATA_SQLSTATES = ("22", "23")
+
+
+@dataclass
+class RetryPolicy:
+    attempts: int = 3
+    base_delay: float = 0.1
+    max_delay: float = 2
+
+    def delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+def get_sqlstate(exc: BaseException) -> str | None:
+    """SQLSTATE of asyncpg errors, also wrapped by SQLAlchemy"""
+    for err in (exc, getattr(exc, "orig", None), exc.__cause__):
+        sqlstate = getattr(err, "sqlstate", None)
+        if isinstance(sqlstate, str):
+            return sqlstate
+    return None
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    if isinstance(exc, DBAPIError) and exc.connection_invalidated:
+        return True
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    sqlstate = get_sqlstate(exc)
+    return sqlstate is not None and sqlstate.startswith(TRANSIENT_SQLSTATES)
+
+
+def is_data_error(exc: BaseException) -> bool:
+    sqlstate = get_sqlstate(exc)
+    return sqlstate is not None and sqlstate.startswith(DATA_SQLSTATES)
+
+
+async def retry_transient(
+    func: Callable[[], Awaitable[T]],
+    policy: RetryPolicy,
+    on_retry: Callable[[Exception], None] | None = None,
+) -> T:
+    """Await the function again after a jittered backoff while it fails transiently"""
+    attempt = 1
+    while True:
+        try:
+            return await func()
+        except Exception as exc:  # noqa: PERF203
+            if attempt >= policy.attempts or not is_transient_error(exc):
+                raise
+            delay = policy.delay(attempt)
+            logger.warning(
+                "Transient error in attempt %i, retrying in %.3fs: %s",
+                attempt,
+                delay,
+                exc,
+            )
+            if on_retry is not None:
+                on_retry(exc)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+async def bisect_data_errors(
+    items: list[T],
+    func: Callable[[list[T]], Awaitable[list[R]]],
+    on_bad_item: Callable[[T, Exception], Awaitable[None]],
+) -> list[R]:
+    """
+    Call the function with the batch, when it fails on a data error the batch
+    is split in halves recursively until bad items are isolated and passed
+    to `on_bad_item`. Results of good items are returned.
+    """
+    if not items:
+        return []
+    try:
+        return await func(items)
+    except Exception as exc:
+        if not is_data_error(exc):
+            raise
+        if len(items) == 1:
+            await on_bad_item(items[0], exc)
+            return []
+
+    middle = len(items) // 2
+    return [
+        *await bisect_data_errors(items[:middle], func, on_bad_item),
+        *await bisect_data_errors(items[middle:], func, on_bad_item),
+    ]
@@ -0,0 +1,83 @@
+from uuid import UUID
+
+from redis.asyncio import Redis
+
+from app.constants import Action, Entity
+
+# Entities owning their DB row. Availability and buyable live on offer rows deleted
+# and recreated by offer workers, their versions would outlive the rows.
+VERSION_MAP_ENTITIES = frozenset({Entity.OFFER, Entity.SHOP})
+DEFAULT_TTL = 6 * 60 * 60
+
+# Stored versions are only raised, so concurrent workers can't lower them.
+# The TTL is set only when the hash is created, so it expires and is rebuilt
+# regardless of updates.
+UPDATE_VERSIONS_SCRIPT = """
+for i = 2, #ARGV, 2 do
+    local current = redis.call("HGET", KEYS[1], ARGV[i])
+    if not current or tonumber(current) < tonumber(ARGV[i + 1]) then
+        redis.call("HSET", KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+end
+if redis.call("TTL", KEYS[1]) == -1 then
+    redis.call("EXPIRE", KEYS[1], ARGV[1])
+end
+return 0
+"""
+
+
+class VersionMap:
+    """
+    Last version of each entity applied by workers, kept in a Redis hash
+    keyed by raw entity id bytes. Messages at or below the applied version
+    are stale, deletes are stale only below it as deletes of the same version
+    are still applied. The hash is only a cache of versions in the DB and can
+    be dropped at any time, ids of deleted entities are removed from it
+    and the whole hash expires `ttl` seconds after it was created.
+    """
+
+    def __init__(self, entity: Entity, ttl: int = DEFAULT_TTL):
+        if entity not in VERSION_MAP_ENTITIES:
+            raise ValueError(f"Version map of {entity.value} entities is not supported")
+
+        self.entity = entity
+        self.ttl = ttl
+        self.key = f"pps-versions-{entity.value}"
+
+    async def get_many(self, redis: Redis, ids: list[UUID]) -> dict[UUID, int]:
+        if not ids:
+            return {}
+        versions = await redis.hmget(self.key, [i.bytes for i in ids])
+        return {
+            i: int(version)
+            for i, version in zip(ids, versions, strict=True)
+            if version is not None
+        }
+
+    async def update(self, redis: Redis, versions: dict[UUID, int]) -> None:
+        if not versions:
+            return
+        args = [arg for i, v in versions.items() for arg in (i.bytes, v)]
+        await redis.eval(UPDATE_VERSIONS_SCRIPT, 1, self.key, self.ttl, *args)
+
+    async def remove(self, redis: Redis, ids: list[UUID]) -> None:
+        if ids:
+            await redis.hdel(self.key, *(i.bytes for i in ids))
+
+    @staticmethod
+    def is_stale(action: str, version: int, applied_version: int | None) -> bool:
+        if applied_version is None:
+            return False
+        if action == Action.DELETE:
+            return version < applied_version
+        return version <= applied_version
+
+    async def find_stale(
+        self, redis: Redis, messages: list[tuple[UUID, int, str]]
+    ) -> list[bool]:
+        """Return which of (id, version, action) messages are stale"""
+        applied = await self.get_many(redis, list({i for i, _, _ in messages}))
+        return [
+            self.is_stale(action, version, applied.get(i))
+            for i, version, action in messages
+        ]
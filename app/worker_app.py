@@ -1,20 +1,22 @@
-from app.constants import Entity
+from app.constants import CountryCode, Entity
 from app.db import db_adapter
 from app.utils.redis_adapter import RedisAdapter
 from app.workers import WORKER_CLASS_MAP
 from app.workers.base import BaseMessageWorker
 
 
-async def run_message_worker(entity: Entity) -> None:
+async def run_message_worker(
+    entity: Entity, countries: list[CountryCode] | None = None
+) -> None:
     from app.config.settings import WorkerSetting
 
     worker_settings = WorkerSetting()
+    if countries:
+        worker_settings.WORKER_COUNTRIES = countries
 
     async with (
         db_adapter as db_engine,
-        RedisAdapter(
-            worker_settings.redis_dsn, encoding="utf-8", decode_responses=True
-        ) as redis,
+        RedisAdapter(worker_settings.redis_dsn, decode_responses=False) as redis,
     ):
         worker_class, message_schema = WORKER_CLASS_MAP[entity]
         worker: BaseMessageWorker = worker_class(
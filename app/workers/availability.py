@@ -4,6 +4,8 @@ from app.workers.base import BaseMessageWorker
 
 
 class AvailabilityMessageWorker(BaseMessageWorker[AvailabilityMessageSchema]):
+    filters_unknown_offers = True
+
     def to_create_schema(
         self, message: AvailabilityMessageSchema
     ) -> AvailabilityCreateSchema:
@@ -12,3 +14,13 @@ class AvailabilityMessageWorker(BaseMessageWorker[AvailabilityMessageSchema]):
             in_stock=message.availability.stock_info == StockInfo.IN_STOCK,
             **message.model_dump(),
         )
+
+    def to_create_schema_fast(
+        self, message: AvailabilityMessageSchema
+    ) -> AvailabilityCreateSchema:
+        return AvailabilityCreateSchema(
+            id=message.id,
+            version=message.version,
+            country_code=message.availability.legacy.country_code,
+            in_stock=message.availability.stock_info == StockInfo.IN_STOCK,
+        )
@@ -1,27 +1,41 @@
 import asyncio
 import signal
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import asynccontextmanager
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import partial
 from logging import getLogger
-from typing import Any, Generator, Generic, Type, TypeVar
+from time import monotonic, perf_counter
+from typing import Any, Generator, Generic, Self, Type, TypeVar
 from uuid import UUID
 
 import orjson
+from redis import RedisError
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
 
 from app.config.settings import WorkerSetting
 from app.constants import Action, Entity
 from app.exceptions import (
+    ParserError,
     WorkerError,
     WorkerFailedParseMsgError,
 )
-from app.metrics import ENTITY_METRICS
+from app.metrics import BATCH_SIZE, ENTITY_METRICS, WORKER_STAGE_DURATION
 from app.parsers import parser_from_entity
+from app.parsers.envelope import EnvelopeCodec
 from app.schemas.base import MessageModel
 from app.services import service_from_entity
+from app.utils import dump_to_json
+from app.utils.batch_size import AdaptiveBatchSize
+from app.utils.offer_filter import OfferIdFilter
+from app.utils.redis_queue import dead_letter_queue_name
+from app.utils.retry import RetryPolicy, bisect_data_errors, retry_transient
+from app.utils.version_map import VERSION_MAP_ENTITIES, VersionMap
+from app.workers.transport import TransportMessage, transport_from_settings
 
 MessageSchemaT = TypeVar("MessageSchemaT", bound=MessageModel)
+T = TypeVar("T")
 
 
 @dataclass
@@ -30,6 +44,24 @@ class Message:
     version: int
     body: dict[str, Any]
     action: Action
+    # Set by decode processes for upserts, which send messages back without body,
+    # None if the message is invalid or not desired
+    create_schema: Any = None
+    # Transport messages of the entity, acked once the entity is written
+    ack_ids: list = field(default_factory=list)
+
+
+@dataclass
+class DecodedBatch:
+    """Messages decoded in a decode process with counts for worker metrics"""
+
+    messages: list[Message] = field(default_factory=list)
+    # Ack ids of invalid transport messages, which have nothing to write
+    settled_ack_ids: list = field(default_factory=list)
+    read: int = 0
+    invalid: int = 0
+    desired: int = 0
+    schema_duration: float = 0
 
 
 class Metrics:
@@ -56,9 +88,36 @@ class Metrics:
         self.invalid_entities = ENTITY_METRICS.labels(
             entity=entity.value, phase="worker", operation="invalid"
         )  # Entities not parsed
+        self.stale_entities = ENTITY_METRICS.labels(
+            entity=entity.value, phase="worker", operation="stale"
+        )  # Entities older than versions in the version map
+        self.coalesced_entities = ENTITY_METRICS.labels(
+            entity=entity.value, phase="worker", operation="coalesced"
+        )  # Writes saved by coalescing messages of the same entity in the buffer
+        self.dead_lettered_entities = ENTITY_METRICS.labels(
+            entity=entity.value, phase="worker", operation="dead_letter"
+        )  # Entities failed to be written, pushed to the dead-letter list
+        self.read_duration = WORKER_STAGE_DURATION.labels(
+            entity=entity.value, stage="read"
+        )  # Reading a batch from the transport
+        self.decode_duration = WORKER_STAGE_DURATION.labels(
+            entity=entity.value, stage="decode"
+        )  # Parsing a batch into the buffer, including the decode pool round trip
+        self.schema_duration = WORKER_STAGE_DURATION.labels(
+            entity=entity.value, stage="schema"
+        )  # Building create schemas of a batch, in decode processes if enabled
+        self.write_duration = WORKER_STAGE_DURATION.labels(
+            entity=entity.value, stage="write"
+        )  # Writing a buffer to the DB and acking it
+        self.buffer_duration = WORKER_STAGE_DURATION.labels(
+            entity=entity.value, stage="buffer"
+        )  # Residence of the oldest message in the buffer until it is flushed
 
 
 class BaseMessageWorker(Generic[MessageSchemaT]):
+    # Entities of offers, messages of unknown offers can be dropped by the offer filter
+    filters_unknown_offers = False
+
     def __init__(  # noqa
         self,
         entity: Entity,
@@ -76,10 +135,58 @@ class BaseMessageWorker(Generic[MessageSchemaT]):
         self.redis = redis
         self.service = service_from_entity(entity)
         self.parser = parser_from_entity(entity, throw_errors=True)
+        self.envelope_codec = EnvelopeCodec(entity)
+        self.transport = transport_from_settings(entity, settings, redis)
+        self.pending_acks: list = []
+        self.version_map: VersionMap | None = None
+        if entity in VERSION_MAP_ENTITIES and (
+            settings.REDIS_VERSION_MAP or settings.WORKER_DROP_STALE_VERSIONS
+        ):
+            self.version_map = VersionMap(entity, settings.REDIS_VERSION_MAP_TTL)
+        # Forced updates rewrite entities of versions already applied
+        self.drop_stale_versions = bool(
+            self.version_map
+            and settings.WORKER_DROP_STALE_VERSIONS
+            and not settings.FORCE_ENTITY_UPDATE
+        )
+        self.retry_policy = RetryPolicy(
+            settings.RETRY_ATTEMPTS, settings.RETRY_BASE_DELAY, settings.RETRY_MAX_DELAY
+        )
+        self.dead_letter_queue = dead_letter_queue_name(entity.value)
+        self.use_offer_id_filter = settings.WORKER_OFFER_ID_FILTER
+        self.offer_filter: OfferIdFilter | None = None
+        if self.use_offer_id_filter and self.filters_unknown_offers:
+            self.offer_filter = OfferIdFilter(
+                settings.WORKER_OFFER_ID_FILTER_CAPACITY,
+                settings.WORKER_OFFER_ID_FILTER_ERROR_RATE,
+            )
 
         self.buffer_size = settings.WORKER_BUFFER_SIZE
+        self.buffer_max_bytes = settings.WORKER_BUFFER_MAX_BYTES
+        self.buffer_max_linger = settings.WORKER_BUFFER_MAX_LINGER
+        self.buffer_bytes = 0
+        self.buffer_started_at: float | None = None
+        self.adaptive_buffer_size: AdaptiveBatchSize | None = None
+        if settings.WORKER_ADAPTIVE_BUFFER_SIZE:
+            self.adaptive_buffer_size = AdaptiveBatchSize(
+                self.buffer_size,
+                settings.WORKER_ADAPTIVE_MIN_BUFFER_SIZE,
+                settings.WORKER_ADAPTIVE_MAX_BUFFER_SIZE,
+                settings.WORKER_ADAPTIVE_MAX_WRITE_LATENCY,
+                settings.WORKER_ADAPTIVE_MAX_BUFFER_AGE,
+                BATCH_SIZE.labels(kind="worker", name=entity.value),
+            )
+            self.buffer_size = self.adaptive_buffer_size.size
         self.redis_pop_timeout = settings.WORKER_POP_TIMEOUT
         self.message_log_interval = settings.WORKER_MESSAGE_LOG_INTERVAL
+        self.message_counter = 0
+        self.pipeline = settings.WORKER_PIPELINE
+        self.pipeline_read_buffer_size = settings.WORKER_PIPELINE_READ_BUFFER_SIZE
+        self.pipeline_write_buffer_size = settings.WORKER_PIPELINE_WRITE_BUFFER_SIZE
+        self.db_concurrency = max(settings.WORKER_DB_CONCURRENCY, 1)
+        self.fast_decode = settings.WORKER_FAST_DECODE
+        self.decode_processes = settings.WORKER_DECODE_PROCESSES
+        self.decode_pool: ProcessPoolExecutor | None = None
 
         self.metrics = Metrics(entity)
         self._logger = getLogger(__name__)
@@ -105,6 +212,34 @@ class BaseMessageWorker(Generic[MessageSchemaT]):
         """
         raise NotImplementedError("Not implemented")
 
+    def to_create_schema_fast(self, message: MessageSchemaT):
+        """
+        Override to build the same create schema as `to_create_schema` from fields
+        of the message only, without dumping and validating the whole message again
+        """
+        return self.to_create_schema(message)
+
+    @classmethod
+    def create_decoder(
+        cls, entity: Entity, message_schema: Type[MessageSchemaT], fast_decode: bool
+    ) -> Self:
+        """Worker only able to decode messages, without DB, Redis and transport"""
+        decoder = cls.__new__(cls)
+        decoder.entity = entity
+        decoder.message_schema = message_schema
+        decoder.parser = parser_from_entity(entity, throw_errors=True)
+        decoder.envelope_codec = EnvelopeCodec(entity)
+        decoder.fast_decode = fast_decode
+        decoder._logger = getLogger(__name__)
+        return decoder
+
+    def create_decode_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            self.decode_processes,
+            initializer=init_decode_process,
+            initargs=(type(self), self.entity, self.message_schema, self.fast_decode),
+        )
+
     @asynccontextmanager
     async def get_db_conn(self):
         async with self.db_engine.connect() as conn:
@@ -115,92 +250,454 @@ class BaseMessageWorker(Generic[MessageSchemaT]):
         if self.redis is None:
             raise WorkerError("Redis in worker is not connected.")
 
-        redis_list = f"rmq-{self.entity.value}"
+        await self.transport.setup()
         self._logger.info(
-            "Start consuming %ss from redis queue %s.", self.entity.value, redis_list
+            "Start consuming %ss from redis queue %s.",
+            self.entity.value,
+            self.transport.queue_name,
         )
 
-        counter = 0
+        if self.decode_processes:
+            self.decode_pool = self.create_decode_pool()
+        try:
+            if self.offer_filter:
+                await self.offer_filter.start(self.db_engine, self.redis)
+            if self.pipeline:
+                await self.consume_and_process_messages_pipelined()
+            else:
+                await self.consume_and_process_messages_sequentially()
+        finally:
+            if self.decode_pool:
+                self.decode_pool.shutdown(cancel_futures=True)
+                self.decode_pool = None
+            if self.offer_filter:
+                await self.offer_filter.stop()
+
+        self._logger.info("Stop consuming %ss", self.entity.value)
+
+    async def consume_and_process_messages_sequentially(self) -> None:
         while self.should_consume:
-            res = await self.redis.brpop(
-                keys=[redis_list], timeout=self.redis_pop_timeout
-            )
-            if res is None:
+            with self.metrics.read_duration.time():
+                res = await self.transport.read(self.buffer_size, self.redis_pop_timeout)
+            if not res:
                 await self.process_messages_in_buffer_bulk()
                 continue
 
-            _, msg = res
-            msgs = await self.redis.rpop(redis_list, count=self.buffer_size)
-            msgs = [msg] if msgs is None else [msg, *msgs]
+            await self.append_transport_messages_to_buffer(res)
+            if self.should_flush():
+                await self.process_messages_in_buffer_bulk()
 
-            self.metrics.read_entities.inc(len(msgs))
+    async def consume_and_process_messages_pipelined(self) -> None:
+        """
+        Read, decode and write messages in concurrent stages connected by bounded
+        queues, so the next buffer is read and decoded while the previous one
+        is written. Buffers are written one by one in the order they were decoded,
+        which keeps messages of each entity in order. The end of input is passed
+        down as None, a failing stage cancels the others through the task group.
+        """
+        read_queue: asyncio.Queue[list[TransportMessage] | None] = asyncio.Queue(
+            self.pipeline_read_buffer_size
+        )
+        write_queue: asyncio.Queue[tuple[dict[UUID, Message], list] | None] = (
+            asyncio.Queue(self.pipeline_write_buffer_size)
+        )
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(self.read_stage(read_queue))
+            tg.create_task(self.decode_stage(read_queue, write_queue))
+            tg.create_task(self.write_stage(write_queue))
 
-            counter += len(msgs)
-            if counter >= self.message_log_interval:
-                self._logger.info("Message sample:\n%s", msgs[0])
-                counter = 0
+    async def read_stage(
+        self, read_queue: asyncio.Queue[list[TransportMessage] | None]
+    ) -> None:
+        """Read messages until stopped, empty reads are passed to flush the buffer"""
+        while self.should_consume:
+            with self.metrics.read_duration.time():
+                res = await self.transport.read(self.buffer_size, self.redis_pop_timeout)
+            await read_queue.put(res)
+        await read_queue.put(None)
 
-            await self.append_messages_to_buffer(msgs)
-            if len(self.messages_buffer) >= self.buffer_size:
-                await self.process_messages_in_buffer_bulk()
+    async def decode_stage(
+        self,
+        read_queue: asyncio.Queue[list[TransportMessage] | None],
+        write_queue: asyncio.Queue[tuple[dict[UUID, Message], list] | None],
+    ) -> None:
+        while (res := await read_queue.get()) is not None:
+            if res:
+                await self.append_transport_messages_to_buffer(res)
+            if not res or self.should_flush():
+                await self.pass_buffer_to_writer(write_queue)
+        await self.pass_buffer_to_writer(write_queue)
+        await write_queue.put(None)
+
+    async def pass_buffer_to_writer(
+        self, write_queue: asyncio.Queue[tuple[dict[UUID, Message], list] | None]
+    ) -> None:
+        if self.messages_buffer or self.pending_acks:
+            await write_queue.put(self.take_buffer())
 
-        self._logger.info("Stop consuming %ss", self.entity.value)
+    async def write_stage(
+        self, write_queue: asyncio.Queue[tuple[dict[UUID, Message], list] | None]
+    ) -> None:
+        while (item := await write_queue.get()) is not None:
+            await self.write_messages(*item)
 
-    async def append_messages_to_buffer(self, redis_messages: list[str]) -> None:
+    async def append_transport_messages_to_buffer(
+        self, res: list[TransportMessage]
+    ) -> None:
+        msgs = [msg for _, msg in res]
+        self.buffer_bytes += sum(len(msg) for msg in msgs)
+        if self.buffer_started_at is None:
+            self.buffer_started_at = monotonic()
+
+        self.message_counter += len(msgs)
+        if self.message_counter >= self.message_log_interval:
+            self._logger.info("Message sample:\n%s", msgs[0])
+            self.message_counter = 0
+
+        with self.metrics.decode_duration.time():
+            await self.append_messages_to_buffer(msgs, [ack_id for ack_id, _ in res])
+
+    async def append_messages_to_buffer(
+        self, redis_messages: list[bytes] | list[str], ack_ids: list | None = None
+    ) -> None:
+        """
+        Parse messages into the buffer, ack ids of transport messages are kept with
+        their entities. Ack ids of invalid messages are acked with the buffer.
+        """
         self._logger.debug('Receive redis messages "%s"', redis_messages)
+        if ack_ids is None:
+            ack_ids = [None] * len(redis_messages)
+        if self.decode_pool:
+            await self.append_messages_to_buffer_in_pool(redis_messages, ack_ids)
+            return
 
-        for redis_msg in redis_messages:
-            try:
-                msg = self.parse_redis_message(redis_msg)
-            except WorkerFailedParseMsgError as exc:
-                self._logger.error(
-                    "Failed to parse incoming redis message: %s, due to: %s.",
-                    redis_msg,
-                    str(exc),
-                )
+        messages: list[bytes | str] = list(redis_messages)
+        for redis_msg, ack_id in zip(messages, ack_ids, strict=True):
+            msgs = self.parse_redis_messages_or_none(redis_msg)
+            if msgs is None:
+                self.metrics.read_entities.inc()
                 self.metrics.invalid_entities.inc()
-                return
-
-            if (
-                msg.identifier in self.messages_buffer
-                and self.messages_buffer[msg.identifier].version < msg.version  # noqa
-            ):
-                self.messages_buffer.pop(msg.identifier)
+                msgs = []
 
+            self.metrics.read_entities.inc(len(msgs))
+            if ack_id is not None:
+                if not msgs:
+                    self.pending_acks.append(ack_id)
+                for msg in msgs:
+                    msg.ack_ids.append(ack_id)
+            self.add_messages_to_buffer(msgs)
+
+    def add_messages_to_buffer(self, msgs: list[Message]) -> None:
+        """
+        Coalesce messages by entity, only the newest message of each entity
+        is written. A create followed by a newer delete is written as the delete
+        only, the entity could exist in the DB already. The written message takes
+        over ack ids of coalesced messages.
+        """
+        coalesced = 0
+        for msg in msgs:
+            buffered = self.messages_buffer.get(msg.identifier)
+            if buffered is not None:
+                coalesced += 1
+                if not self.supersedes(msg, buffered):
+                    buffered.ack_ids.extend(msg.ack_ids)
+                    continue
+                msg.ack_ids[:0] = buffered.ack_ids
             self.messages_buffer[msg.identifier] = msg
+        self.metrics.coalesced_entities.inc(coalesced)
 
     @staticmethod
-    def batched(
-        msgs: list[Message], batch_size: int
-    ) -> Generator[list[Message], None, None]:
+    def supersedes(msg: Message, buffered: Message) -> bool:
+        """Newer version wins, a delete wins over an upsert of the same version"""
+        if msg.version != buffered.version:
+            return msg.version > buffered.version
+        return msg.action == Action.DELETE or buffered.action != Action.DELETE
+
+    async def append_messages_to_buffer_in_pool(
+        self, redis_messages: list[bytes] | list[str], ack_ids: list
+    ) -> None:
+        """
+        Decode messages split into a chunk per decode process, chunks are added
+        to the buffer in order of messages
+        """
+        assert self.decode_pool is not None
+        if not redis_messages:
+            return
+        loop = asyncio.get_running_loop()
+        messages: list[bytes | str] = list(redis_messages)
+        chunk_size = -(-len(messages) // self.decode_processes)
+        batches = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    self.decode_pool,
+                    decode_in_process,
+                    chunk,
+                    ack_ids[i : i + chunk_size],
+                )
+                for i, chunk in zip(
+                    range(0, len(messages), chunk_size),
+                    self.batched(messages, chunk_size),
+                    strict=True,
+                )
+            )
+        )
+        for batch in batches:
+            self.pending_acks.extend(batch.settled_ack_ids)
+            self.metrics.read_entities.inc(batch.read)
+            self.metrics.invalid_entities.inc(batch.invalid)
+            self.metrics.filtered_entities.inc(batch.desired)
+            self.metrics.schema_duration.observe(batch.schema_duration)
+            self.add_messages_to_buffer(batch.messages)
+
+    def decode_messages(
+        self, redis_messages: list[bytes | str], ack_ids: list | None = None
+    ) -> DecodedBatch:
+        """
+        Parse messages and build create schemas of upserts, bodies are dropped
+        so only compact messages are sent back from decode processes
+        """
+        batch = DecodedBatch()
+        for redis_msg, ack_id in zip(
+            redis_messages, ack_ids or [None] * len(redis_messages), strict=True
+        ):
+            msgs = self.parse_redis_messages_or_none(redis_msg)
+            if msgs is None:
+                batch.read += 1
+                batch.invalid += 1
+                msgs = []
+
+            if ack_id is not None and not msgs:
+                batch.settled_ack_ids.append(ack_id)
+            batch.read += len(msgs)
+            start = perf_counter()
+            for msg in msgs:
+                if msg.action != Action.DELETE:
+                    msg.create_schema = self.decode_create_schema(msg, batch)
+                msg.body = {}
+                if ack_id is not None:
+                    msg.ack_ids.append(ack_id)
+            batch.schema_duration += perf_counter() - start
+            batch.messages.extend(msgs)
+        return batch
+
+    def decode_create_schema(self, message: Message, batch: DecodedBatch) -> Any:
+        to_create_schema = (
+            self.to_create_schema_fast if self.fast_decode else self.to_create_schema
+        )
+        try:
+            msg_in = self.to_message_schema(message)
+            if not self.is_desired_message(msg_in):
+                return None
+            batch.desired += 1
+            return to_create_schema(msg_in)
+        except Exception as exc:
+            self._logger.warning(
+                "Failed parsing %s message: %s. Message body: %s.",
+                self.entity.value,
+                str(exc),
+                message.body,
+            )
+            batch.invalid += 1
+            return None
+
+    @staticmethod
+    def batched(msgs: list[T], batch_size: int) -> Generator[list[T], None, None]:
         for i in range(0, len(msgs), batch_size):
             yield msgs[i : i + batch_size]
 
-    async def process_messages_in_buffer_bulk(self) -> None:
-        if not self.messages_buffer:
+    async def drop_stale_messages(self, messages_buffer: dict[UUID, Message]) -> None:
+        """Remove messages at or below versions in the version map from the buffer"""
+        if not self.version_map:
             return
 
+        messages = list(messages_buffer.values())
+        try:
+            stale = await self.version_map.find_stale(
+                self.redis,
+                [(msg.identifier, msg.version, msg.action) for msg in messages],
+            )
+        except RedisError as exc:
+            self._logger.error("Error while reading version map: %s", exc)
+            return
+
+        for msg, is_stale in zip(messages, stale, strict=True):
+            if is_stale:
+                messages_buffer.pop(msg.identifier)
+        self.metrics.stale_entities.inc(sum(stale))
+
+    async def update_version_map(
+        self, versions: dict[UUID, int], deleted_ids: list[UUID] | None = None
+    ) -> None:
+        """Store versions applied to the DB, failure only makes the map outdated"""
+        if not self.version_map:
+            return
+        try:
+            await self.version_map.update(self.redis, versions)
+            await self.version_map.remove(self.redis, deleted_ids or [])
+        except RedisError as exc:
+            self._logger.error("Error while updating version map: %s", exc)
+
+    def should_flush(self) -> bool:
+        """Buffer is full by count or bytes, or its oldest message lingers too long"""
+        if len(self.messages_buffer) >= self.buffer_size:
+            return True
+        if self.buffer_max_bytes and self.buffer_bytes >= self.buffer_max_bytes:
+            return True
+        return bool(
+            self.buffer_max_linger
+            and self.buffer_started_at is not None
+            and monotonic() - self.buffer_started_at >= self.buffer_max_linger
+        )
+
+    def take_buffer(self) -> tuple[dict[UUID, Message], list]:
+        """Swap out the buffer with its acks to be written"""
+        if self.buffer_started_at is not None:
+            age = monotonic() - self.buffer_started_at
+            self.metrics.buffer_duration.observe(age)
+            if self.adaptive_buffer_size:
+                self.adaptive_buffer_size.record_age(age)
+                self.buffer_size = self.adaptive_buffer_size.size
+        messages_buffer, self.messages_buffer = self.messages_buffer, {}
+        ack_ids, self.pending_acks = self.pending_acks, []
+        self.buffer_bytes, self.buffer_started_at = 0, None
+        return messages_buffer, ack_ids
+
+    async def process_messages_in_buffer_bulk(self) -> None:
+        await self.write_messages(*self.take_buffer())
+
+    async def write_messages(
+        self, messages_buffer: dict[UUID, Message], ack_ids: list
+    ) -> None:
+        """Write buffered messages to the DB and ack them in the transport"""
+        start = perf_counter()
+        await self.write_buffer(messages_buffer, ack_ids)
+        duration = perf_counter() - start
+        self.metrics.write_duration.observe(duration)
+        if self.adaptive_buffer_size and messages_buffer:
+            self.adaptive_buffer_size.record_batch(len(messages_buffer), duration)
+            self.buffer_size = self.adaptive_buffer_size.size
+
+    async def write_buffer(
+        self, messages_buffer: dict[UUID, Message], ack_ids: list
+    ) -> None:
+        """
+        Write buffered messages and ack transport messages of entities which were
+        written, dropped or dead-lettered. Transport messages of entities which
+        failed are left pending to be delivered again.
+        """
+        ack_ids = [
+            *ack_ids,
+            *(ack_id for msg in messages_buffer.values() for ack_id in msg.ack_ids),
+        ]
+        if self.drop_stale_versions and messages_buffer:
+            await self.drop_stale_messages(messages_buffer)
+
+        if messages_buffer:
+            shard_settled_ids = await asyncio.gather(
+                *(
+                    self.write_shard(shard)
+                    for shard in self.split_to_shards(list(messages_buffer.values()))
+                )
+            )
+            settled_ids = {msg_id for ids in shard_settled_ids for msg_id in ids}
+            unsettled_ack_ids = {
+                ack_id
+                for msg in messages_buffer.values()
+                if msg.identifier not in settled_ids
+                for ack_id in msg.ack_ids
+            }
+            if unsettled_ack_ids:
+                self._logger.warning(
+                    "%i %s messages failed to be written, they are left pending",
+                    len(unsettled_ack_ids),
+                    self.entity.value,
+                )
+                ack_ids = [
+                    ack_id for ack_id in ack_ids if ack_id not in unsettled_ack_ids
+                ]
+        await self.ack_messages(list(dict.fromkeys(ack_ids)))
+
+    def get_shard(self, message: Message) -> int:
+        """
+        Override to align shards with partitions of the entity table,
+        each entity is always written by the same shard
+        """
+        if message.identifier is None:
+            return 0
+        return message.identifier.int % self.db_concurrency
+
+    def split_to_shards(self, messages: list[Message]) -> list[list[Message]]:
+        if self.db_concurrency == 1:
+            return [messages]
+
+        shards: dict[int, list[Message]] = {}
+        for msg in messages:
+            shards.setdefault(self.get_shard(msg), []).append(msg)
+        return list(shards.values())
+
+    async def write_shard(self, messages: list[Message]) -> list[UUID]:
+        """
+        Write messages on one DB connection, upserts first and deletes after.
+        Return ids of entities which were written, skipped or dead-lettered.
+        """
         upsert_messages = []
         delete_messages = []
-        for msg in self.messages_buffer.values():
+        for msg in messages:
             if msg.action == Action.DELETE:
                 delete_messages.append(msg)
             else:
                 upsert_messages.append(msg)
 
+        settled_ids: list[UUID] = []
         if upsert_messages:
             async with self.get_db_conn() as db_conn:
                 for batch in self.batched(upsert_messages, self.buffer_size):
-                    await self.process_many_create_update_messages(db_conn, batch)
+                    settled_ids.extend(
+                        await self.process_many_create_update_messages(db_conn, batch)
+                    )
 
         if delete_messages:
             async with self.get_db_conn() as db_conn:
                 for batch in self.batched(delete_messages, self.buffer_size):
-                    await self.process_many_delete_messages(db_conn, batch)
+                    settled_ids.extend(
+                        await self.process_many_delete_messages(db_conn, batch)
+                    )
+        return settled_ids
+
+    async def ack_messages(self, ack_ids: list) -> None:
+        """Confirm to the transport that read messages were processed"""
+        if ack_ids:
+            await self.transport.ack(ack_ids)
+
+    def parse_redis_messages_or_none(
+        self, redis_message: bytes | str
+    ) -> list[Message] | None:
+        """
+        Parse messages of the transport message, None if it is invalid. Shared by
+        the event loop and decode processes, so invalid messages are settled by both.
+        """
+        try:
+            return self.parse_redis_messages(redis_message)
+        except WorkerFailedParseMsgError as exc:
+            self._logger.error(
+                "Failed to parse incoming redis message: %s, due to: %s.",
+                redis_message,
+                str(exc),
+            )
+            return None
 
-        self.messages_buffer.clear()
+    def parse_redis_messages(self, redis_message: bytes | str) -> list[Message]:
+        """Parse a compact envelope or a legacy JSON message"""
+        if not self.envelope_codec.is_envelope(redis_message):
+            return [self.parse_redis_message(redis_message)]
 
-    def parse_redis_message(self, redis_message: str) -> Message:
+        try:
+            msg_bodies = self.envelope_codec.decode(redis_message)  # type: ignore[arg-type]
+        except (ValueError, TypeError) as exc:
+            raise WorkerFailedParseMsgError(str(exc)) from exc
+        return [self.to_message(msg_body) for msg_body in msg_bodies]
+
+    def parse_redis_message(self, redis_message: bytes | str) -> Message:
         try:
             msg_body = orjson.loads(redis_message)
         except orjson.JSONDecodeError as exc:
@@ -208,11 +705,21 @@ class BaseMessageWorker(Generic[MessageSchemaT]):
         if not isinstance(msg_body, dict):
             raise WorkerFailedParseMsgError("Message body is not json dict object.")
 
+        return self.to_message(msg_body)
+
+    def to_message(self, msg_body: dict) -> Message:
+        """Message of the body, invalid ids, versions and actions fail parsing"""
+        try:
+            identifier = self.parser.get_message_id(msg_body)
+            version = self.parser.get_version(msg_body)
+            action = Action(self.parser.get_action(msg_body))
+        except (ParserError, ValueError, TypeError) as exc:
+            raise WorkerFailedParseMsgError(str(exc)) from exc
+        if identifier is None or version is None:
+            raise WorkerFailedParseMsgError("Message has no id or version.")
+
         return Message(
-            identifier=self.parser.get_message_id(msg_body),
-            version=self.parser.get_version(msg_body),
-            action=Action(self.parser.get_action(msg_body)),
-            body=msg_body,
+            identifier=identifier, version=version, action=action, body=msg_body
         )
 
     def to_message_schemas(self, messages: list[Message]) -> list:
@@ -233,10 +740,13 @@ class BaseMessageWorker(Generic[MessageSchemaT]):
         return msgs_in
 
     def to_create_schemas(self, messages: list[MessageSchemaT]) -> list:
+        to_create_schema = (
+            self.to_create_schema_fast if self.fast_decode else self.to_create_schema
+        )
         data_in = []
         for msg in messages:
             try:
-                data = self.to_create_schema(msg)
+                data = to_create_schema(msg)
                 data_in.append(data)
             except Exception as exc:  # noqa: PERF203
                 self._logger.warning(
@@ -249,27 +759,48 @@ class BaseMessageWorker(Generic[MessageSchemaT]):
 
         return data_in
 
+    def build_create_schemas(self, messages: list[Message]) -> list:
+        msgs_in = self.to_message_schemas(messages)
+
+        msgs_in = [msg for msg in msgs_in if self.is_desired_message(msg)]
+        filtered_out_msgs_len = len(messages) - len(msgs_in)
+        if filtered_out_msgs_len != 0:
+            self._logger.info("Filtered out %s messages", filtered_out_msgs_len)
+        self.metrics.filtered_entities.inc(len(msgs_in))
+
+        return self.to_create_schemas(msgs_in)
+
     async def process_many_create_update_messages(
         self, db_conn: AsyncConnection, messages: list[Message]
-    ) -> None:
+    ) -> list[UUID]:
+        """
+        Upsert messages, return ids of all of them unless they failed to be written
+        or dead-lettered, so they are delivered again
+        """
+        settled_ids = [msg.identifier for msg in messages]
         try:
-            msgs_in = self.to_message_schemas(messages)
-
-            msgs_in = [msg for msg in msgs_in if self.is_desired_message(msg)]
-            filtered_out_msgs_len = len(messages) - len(msgs_in)
-            if filtered_out_msgs_len != 0:
-                self._logger.info("Filtered out %s messages", filtered_out_msgs_len)
-            self.metrics.filtered_entities.inc(len(msgs_in))
-
-            data_in = self.to_create_schemas(msgs_in)
+            if self.offer_filter:
+                messages = self.drop_unknown_offers(messages)
+            if self.decode_pool:
+                data_in = [
+                    msg.create_schema for msg in messages if msg.create_schema is not None
+                ]
+            else:
+                with self.metrics.schema_duration.time():
+                    data_in = self.build_create_schemas(messages)
 
             self._logger.debug("Messages: %s", data_in)
-            upserted_ids = await self.service.upsert_many(db_conn, self.redis, data_in)
+            upserted_ids = await self.upsert_isolating_errors(db_conn, data_in)
             self._logger.info(
                 "Successfully upserted %i %ss.",
                 len(upserted_ids),
                 self.entity.value,
             )
+            upserted_ids_set = set(upserted_ids)
+            await self.update_version_map(
+                {data.id: data.version for data in data_in if data.id in upserted_ids_set}
+            )
+            await self.on_upserted(upserted_ids)
 
             self.metrics.updated_entities.inc(len(upserted_ids))
         except Exception as exc:
@@ -278,19 +809,88 @@ class BaseMessageWorker(Generic[MessageSchemaT]):
                 self.entity.value,
                 exc_info=exc,
             )
+            return []
+        return settled_ids
+
+    def drop_unknown_offers(self, messages: list[Message]) -> list[Message]:
+        assert self.offer_filter is not None
+        known = [msg for msg in messages if msg.identifier in self.offer_filter]
+        self.metrics.not_found_entities.inc(len(messages) - len(known))
+        return known
+
+    async def on_upserted(self, upserted_ids: list[UUID]) -> None:
+        """Override to act on entities written to the DB"""
+
+    async def upsert_isolating_errors(
+        self, db_conn: AsyncConnection, data_in: list
+    ) -> list[UUID]:
+        """
+        Upsert with retries of transient errors, batches failing on data errors
+        are bisected until bad entities are isolated and dead-lettered. The whole
+        batch is dead-lettered on other errors, errors are raised only when
+        the batch fails to be dead-lettered.
+        """
+        try:
+            return await bisect_data_errors(
+                data_in, partial(self.upsert_with_retries, db_conn), self.dead_letter
+            )
+        except Exception as exc:
+            await self.dead_letter_many(data_in, exc)
+            return []
+
+    async def upsert_with_retries(
+        self, db_conn: AsyncConnection, data_in: list
+    ) -> list[UUID]:
+        return await retry_transient(
+            partial(self.service.upsert_many, db_conn, self.redis, data_in),
+            self.retry_policy,
+            self.on_transient_error,
+        )
+
+    def on_transient_error(self, _exc: Exception) -> None:
+        if self.adaptive_buffer_size:
+            self.adaptive_buffer_size.record_error()
+            self.buffer_size = self.adaptive_buffer_size.size
+
+    async def dead_letter(self, data: Any, exc: Exception) -> None:
+        await self.dead_letter_many([data], exc)
+
+    async def dead_letter_many(self, data_in: list, exc: Exception) -> None:
+        self._logger.error(
+            "Pushing %i %ss to dead-letter list %s due to: %s",
+            len(data_in),
+            self.entity.value,
+            self.dead_letter_queue,
+            exc,
+        )
+        if not data_in:
+            return
+        try:
+            await self.redis.lpush(
+                self.dead_letter_queue,
+                *(dump_to_json({"data": data, "error": str(exc)}) for data in data_in),
+            )
+        except RedisError as redis_exc:
+            self._logger.error("Error while pushing to dead-letter list: %s", redis_exc)
+            raise
+        self.metrics.dead_lettered_entities.inc(len(data_in))
 
     async def process_many_delete_messages(
         self, db_conn: AsyncConnection, messages: list[Message]
-    ) -> None:
+    ) -> list[UUID]:
+        """
+        Delete messages, return ids of all of them unless they failed to be deleted
+        or dead-lettered, so they are delivered again
+        """
+        settled_ids = [msg.identifier for msg in messages]
         try:
             ids_versions = [(msg.identifier, msg.version) for msg in messages]
             self._logger.debug("ids versions: %s", ids_versions)
-            deleted_ids = await self.service.remove_many(
-                db_conn, self.redis, ids_versions
-            )
+            deleted_ids = await self.remove_isolating_errors(db_conn, ids_versions)
             self._logger.info(
                 "Successfully delete %i %ss.", len(deleted_ids), self.entity.value
             )
+            await self.update_version_map({}, deleted_ids)
             self.metrics.deleted_entities.inc(len(deleted_ids))
         except Exception as exc:
             self._logger.error(
@@ -298,6 +898,32 @@ class BaseMessageWorker(Generic[MessageSchemaT]):
                 self.entity.value,
                 exc_info=exc,
             )
+            return []
+        return settled_ids
+
+    async def remove_isolating_errors(
+        self, db_conn: AsyncConnection, ids_versions: list[tuple[UUID, int]]
+    ) -> list[UUID]:
+        """
+        Delete like `upsert_isolating_errors` upserts, ids and versions of entities
+        failed to be deleted are dead-lettered
+        """
+        try:
+            return await bisect_data_errors(
+                ids_versions, partial(self.remove_with_retries, db_conn), self.dead_letter
+            )
+        except Exception as exc:
+            await self.dead_letter_many(ids_versions, exc)
+            return []
+
+    async def remove_with_retries(
+        self, db_conn: AsyncConnection, ids_versions: list[tuple[UUID, int]]
+    ) -> list[UUID]:
+        return await retry_transient(
+            partial(self.service.remove_many, db_conn, self.redis, ids_versions),
+            self.retry_policy,
+            self.on_transient_error,
+        )
 
     def stop_consuming(self) -> None:
         self.should_consume = False
@@ -308,3 +934,26 @@ class BaseMessageWorker(Generic[MessageSchemaT]):
 
         for signum in [signal.SIGINT, signal.SIGTERM]:
             loop.add_signal_handler(signum, self.stop_consuming)
+
+
+# Decoder of the current decode process, set by the pool initializer
+_process_decoders: dict[str, BaseMessageWorker] = {}
+
+
+def init_decode_process(
+    worker_class: Type[BaseMessageWorker],
+    entity: Entity,
+    message_schema: Type[MessageModel],
+    fast_decode: bool,
+) -> None:
+    # Stopping is left to the worker, which shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.set_wakeup_fd(-1)
+    _process_decoders["decoder"] = worker_class.create_decoder(
+        entity, message_schema, fast_decode
+    )
+
+
+def decode_in_process(redis_messages: list[bytes | str], ack_ids: list) -> DecodedBatch:
+    return _process_decoders["decoder"].decode_messages(redis_messages, ack_ids)
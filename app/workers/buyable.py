@@ -3,7 +3,17 @@ from app.workers.base import BaseMessageWorker
 
 
 class BuyableMessageWorker(BaseMessageWorker[BuyableMessageSchema]):
+    filters_unknown_offers = True
+
     def to_create_schema(self, message: BuyableMessageSchema) -> BuyableCreateSchema:
         return BuyableCreateSchema(
             country_code=message.legacy.country_code, **message.model_dump()
         )
+
+    def to_create_schema_fast(self, message: BuyableMessageSchema) -> BuyableCreateSchema:
+        return BuyableCreateSchema(
+            id=message.id,
+            version=message.version,
+            country_code=message.legacy.country_code,
+            buyable=message.buyable,
+        )
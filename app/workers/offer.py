@@ -1,17 +1,41 @@
 import logging
+from uuid import UUID
 
 from pydantic import ValidationError
+from redis import RedisError
 
 from app.schemas.offer import OfferCreateSchema, OfferMessageSchema, OfferPrice
 
 from ..constants import PriceType
 from ..exceptions import WorkerFailedParseMsgError
-from .base import BaseMessageWorker
+from ..utils.offer_filter import OfferIdFilter
+from ..utils.pg_partitions import get_offer_partition
+from .base import BaseMessageWorker, Message
 
 logger = logging.getLogger(__name__)
 
 
 class OfferMessageWorker(BaseMessageWorker[OfferMessageSchema]):
+    async def on_upserted(self, upserted_ids: list[UUID]) -> None:
+        """Broadcast ids of written offers to offer id filters of other workers"""
+        if not self.use_offer_id_filter:
+            return
+        try:
+            await OfferIdFilter.broadcast(self.redis, upserted_ids)
+        except RedisError as exc:
+            logger.error("Error while broadcasting offer ids: %s", exc)
+
+    def get_shard(self, message: Message) -> int:
+        """Shard by the offers table partition of the offer"""
+        try:
+            if message.create_schema is not None:
+                product_id = message.create_schema.product_id
+            else:
+                product_id = UUID(message.body["productId"])
+        except (KeyError, TypeError, ValueError):
+            return super().get_shard(message)
+        return get_offer_partition(product_id, message.identifier) % self.db_concurrency
+
     def to_create_schema(self, message: OfferMessageSchema) -> OfferCreateSchema:
         price = self.parse_prices(message.prices)
 
@@ -22,6 +46,19 @@ class OfferMessageWorker(BaseMessageWorker[OfferMessageSchema]):
             **message.model_dump(),
         )
 
+    def to_create_schema_fast(self, message: OfferMessageSchema) -> OfferCreateSchema:
+        price = self.parse_prices(message.prices)
+        return OfferCreateSchema(
+            id=message.id,
+            version=message.version,
+            country_code=message.legacy.country_code,
+            # Missing product id fails validation as in `to_create_schema`
+            product_id=message.product_id,  # type: ignore[arg-type]
+            shop_id=message.shop_id,
+            price=price.amount,
+            currency_code=price.currency_code,
+        )
+
     @staticmethod
     def parse_prices(prices: list[OfferPrice]) -> OfferPrice:
         try:
@@ -14,6 +14,19 @@ class ShopMessageWorker(BaseMessageWorker[ShopMessageSchema]):
             **shop.state.model_dump(),
         )
 
+    def to_create_schema_fast(self, message: ShopMessageSchema) -> ShopCreateSchema:
+        shop = message.shop
+
+        return ShopCreateSchema(
+            id=shop.id,
+            version=message.version,
+            country_code=shop.legacy.country_code,
+            certified=shop.certificate.enabled or False,
+            verified=shop.state.verified or False,
+            paying=shop.state.paying or False,
+            enabled=shop.state.enabled or False,
+        )
+
     def is_desired_message(self, message: ShopMessageSchema) -> bool:
         shop = message.shop
         if any(
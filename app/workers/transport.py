@@ -0,0 +1,239 @@
+import asyncio
+from logging import getLogger
+from typing import Any
+
+from redis import ResponseError
+from redis.asyncio import Redis
+
+from app.config.settings import WorkerSetting
+from app.constants import REDIS_STREAM_MSG_FIELD, Entity, RedisQueueTransport
+from app.metrics import REDIS_STREAM_METRICS
+from app.utils.redis_queue import entity_queue_name, entity_queue_names
+
+# Message read from the transport, ack id is None if the message needs no ack
+TransportMessage = tuple[Any, bytes]
+
+
+class BaseTransport:
+    """
+    Reads messages from one or more queues. Queues are served in weighted
+    round-robin, a queue with weight N is served first in N turns of the schedule.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        queue_names: list[str],
+        weights: dict[str, int] | None = None,
+    ):
+        if not queue_names:
+            raise ValueError("At least one queue is required")
+
+        self.redis = redis
+        self.queue_names = queue_names
+        self.queue_name = ", ".join(queue_names)
+        weights = weights or {}
+        self.schedule = [
+            name for name in queue_names for _ in range(max(weights.get(name, 1), 1))
+        ]
+        self.turn = 0
+        self._logger = getLogger(self.__class__.__name__)
+
+    def next_queue_order(self) -> list[str]:
+        """Queues ordered by priority in the next turn of the schedule"""
+        start = self.turn
+        self.turn = (self.turn + 1) % len(self.schedule)
+        return list(dict.fromkeys(self.schedule[start:] + self.schedule[:start]))
+
+    async def setup(self) -> None:
+        """Override to prepare the queue before reading"""
+
+    async def read(self, count: int, timeout: float) -> list[TransportMessage]:
+        """Read at most count messages, wait at most timeout seconds for the first one"""
+        raise NotImplementedError("Not implemented")
+
+    async def ack(self, ack_ids: list) -> None:
+        """Override to confirm messages were processed"""
+
+
+class ListTransport(BaseTransport):
+    """Messages are popped from a list, they are lost if the worker crashes"""
+
+    async def read(self, count: int, timeout: float) -> list[TransportMessage]:
+        res = await self.redis.brpop(keys=self.next_queue_order(), timeout=timeout)
+        if res is None:
+            return []
+
+        queue_name, msg = res
+        msgs = await self.redis.rpop(queue_name, count=count)
+        msgs = [msg] if msgs is None else [msg, *msgs]
+        return [(None, msg) for msg in msgs]
+
+
+class StreamTransport(BaseTransport):
+    """
+    Messages are read from a stream by a consumer group and acked once processed.
+    Messages left pending by crashed workers are claimed after they are idle
+    for `claim_min_idle_time` ms. Ack id of a message is a tuple of its stream
+    and entry id. Reading several streams returns at most `count` messages
+    of each of them, weights only set the order of streams.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        redis: Redis,
+        queue_names: list[str],
+        group: str,
+        consumer: str,
+        claim_min_idle_time: int,
+        claim_interval: float,
+        weights: dict[str, int] | None = None,
+    ):
+        super().__init__(redis, queue_names, weights)
+        self.group = group
+        self.consumer = consumer
+        self.claim_min_idle_time = claim_min_idle_time
+        self.claim_interval = claim_interval
+        self.next_claim_at = 0.0
+
+    async def setup(self) -> None:
+        for stream in self.queue_names:
+            try:
+                await self.redis.xgroup_create(stream, self.group, id="0", mkstream=True)
+                self._logger.info(
+                    "Created consumer group %s of stream %s", self.group, stream
+                )
+            except ResponseError as exc:  # noqa: PERF203
+                if "BUSYGROUP" not in str(exc):
+                    raise
+
+    async def read(self, count: int, timeout: float) -> list[TransportMessage]:
+        loop = asyncio.get_running_loop()
+        if loop.time() >= self.next_claim_at:
+            self.next_claim_at = loop.time() + self.claim_interval
+            await self.update_metrics()
+            claimed = await self.claim(count)
+            if claimed:
+                return claimed
+
+        res = await self.redis.xreadgroup(
+            self.group,
+            self.consumer,
+            {stream: ">" for stream in self.next_queue_order()},
+            count=count,
+            block=max(int(timeout * 1000), 1),
+        )
+        return [
+            ((stream, msg_id), self.entry_message(fields))
+            for stream, entries in res or []
+            for msg_id, fields in entries
+        ]
+
+    async def claim(self, count: int) -> list[TransportMessage]:
+        """Claim messages pending too long in other consumers of the group"""
+        messages: list[TransportMessage] = []
+        for stream in self.next_queue_order():
+            res = await self.redis.xautoclaim(
+                stream,
+                self.group,
+                self.consumer,
+                self.claim_min_idle_time,
+                start_id="0-0",
+                count=count,
+            )
+            entries = res[1]
+            deleted = [(stream, msg_id) for msg_id, fields in entries if not fields]
+            if deleted:
+                await self.ack(deleted)
+
+            claimed = [
+                ((stream, msg_id), self.entry_message(fields))
+                for msg_id, fields in entries
+                if fields
+            ]
+            if claimed:
+                self._logger.warning(
+                    "Claimed %i pending messages from stream %s",
+                    len(claimed),
+                    stream,
+                )
+                messages.extend(claimed)
+        return messages
+
+    @staticmethod
+    def entry_message(fields: dict) -> bytes:
+        """
+        Message of the stream entry, entries without it are read as empty messages,
+        which fail parsing and are acked by the worker
+        """
+        return fields.get(REDIS_STREAM_MSG_FIELD, b"")
+
+    async def ack(self, ack_ids: list) -> None:
+        if not ack_ids:
+            return
+
+        stream_ids: dict[str, list] = {}
+        for stream, msg_id in ack_ids:
+            stream_ids.setdefault(stream, []).append(msg_id)
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for stream, msg_ids in stream_ids.items():
+                pipe.xack(stream, self.group, *msg_ids)
+                pipe.xdel(stream, *msg_ids)
+            await pipe.execute()
+
+    async def update_metrics(self) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for stream in self.queue_names:
+                pipe.xinfo_groups(stream)
+                pipe.xlen(stream)
+            results = await pipe.execute()
+
+        for stream, groups, length in zip(
+            self.queue_names, results[::2], results[1::2], strict=True
+        ):
+            self.update_stream_metrics(stream, groups, length)
+
+    def update_stream_metrics(self, stream: str, groups: list, length: int) -> None:
+        for group in groups:
+            name = group["name"]
+            if (name.decode() if isinstance(name, bytes) else name) != self.group:
+                continue
+            # Lag is reported since Redis 7, acked messages are deleted from the stream
+            # so the lag is the number of messages not delivered to the group yet
+            lag = group.get("lag")
+            if lag is None:
+                lag = length - group["pending"]
+            labels = {"stream": stream, "group": self.group}
+            REDIS_STREAM_METRICS.labels(**labels, state="pending").set(group["pending"])
+            REDIS_STREAM_METRICS.labels(**labels, state="lag").set(lag)
+
+
+def transport_from_settings(
+    entity: Entity, settings: WorkerSetting, redis: Redis
+) -> BaseTransport:
+    """
+    Transport of the entity queue, or of queues of the worker countries
+    if queues are sharded by country
+    """
+    transport = settings.REDIS_QUEUE_TRANSPORT
+    queue_names = [entity_queue_name(entity, transport)]
+    weights = {}
+    if settings.REDIS_QUEUE_SHARD_BY_COUNTRY:
+        queue_names = entity_queue_names(entity, transport, settings.WORKER_COUNTRIES)
+        weights = {
+            entity_queue_name(entity, transport, country): weight
+            for country, weight in settings.WORKER_COUNTRY_WEIGHTS.items()
+        }
+
+    if transport == RedisQueueTransport.STREAM:
+        return StreamTransport(
+            redis,
+            queue_names,
+            settings.WORKER_STREAM_GROUP,
+            settings.WORKER_STREAM_CONSUMER,
+            settings.WORKER_STREAM_CLAIM_MIN_IDLE_TIME_MS,
+            settings.WORKER_STREAM_CLAIM_INTERVAL,
+            weights,
+        )
+    return ListTransport(redis, queue_names, weights)
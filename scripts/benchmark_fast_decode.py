@@ -0,0 +1,53 @@
+"""
+Compare worker create schema decoding with and without WORKER_FAST_DECODE.
+
+Run from the project root with the worker environment set up:
+
+    python -m scripts.benchmark_fast_decode
+"""
+
+import argparse
+import time
+from unittest.mock import AsyncMock
+
+from app.config.settings import WorkerSetting
+from app.constants import Entity
+from app.workers import WORKER_CLASS_MAP
+from tests.unit.workers.test_fast_decode import message_schemas
+
+
+def benchmark(entity: Entity, count: int, repeat: int) -> tuple[float, float]:
+    worker_class, message_schema = WORKER_CLASS_MAP[entity]
+    worker = worker_class(
+        entity, WorkerSetting(), AsyncMock(), AsyncMock(), message_schema
+    )
+    messages = message_schemas(worker, entity)[:2] * (count // 2)
+
+    def run(fast_decode: bool) -> float:
+        worker.fast_decode = fast_decode
+        start = time.perf_counter()
+        worker.to_create_schemas(messages)
+        return time.perf_counter() - start
+
+    run(True), run(False)
+    dumped = min(run(False) for _ in range(repeat))
+    fast = min(run(True) for _ in range(repeat))
+    return dumped, fast
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for entity in Entity:
+        dumped, fast = benchmark(entity, args.count, args.repeat)
+        print(  # noqa: T201
+            f"{entity.value}: {dumped * 1000:.2f} ms, "
+            f"fast {fast * 1000:.2f} ms ({dumped / fast:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -123,9 +123,7 @@ def worker_settings() -> WorkerSetting:
 
 @pytest.fixture
 async def worker_redis(worker_settings) -> Redis:
-    async with RedisAdapter(
-        worker_settings.redis_dsn, encoding="utf-8", decode_responses=True
-    ) as redis:
+    async with RedisAdapter(worker_settings.redis_dsn, decode_responses=False) as redis:
         await redis.flushdb()
         yield redis
 
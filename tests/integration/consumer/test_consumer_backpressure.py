@@ -0,0 +1,64 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from redis.asyncio import Redis
+
+from app.config.settings import ConsumerSettings
+from app.constants import PRICE_EVENT_QUEUE, Entity
+from app.consumers.consumer import Consumer
+from tests.integration.consumer.conftest import REDIS_KEYS_MAP
+
+
+@pytest.fixture
+def backpressure_consumer(settings: ConsumerSettings, redis: Redis) -> Consumer:
+    settings.CONSUMER_MANUAL_ACK = True
+    settings.CONSUMER_BACKPRESSURE_HIGH_WATERMARK = 10
+    settings.CONSUMER_BACKPRESSURE_LOW_WATERMARK = 2
+    settings.CONSUMER_BACKPRESSURE_MIN_PREFETCH_COUNT = 1
+    settings.CONSUMER_BACKPRESSURE_MAX_DELAY_MULTIPLIER = 3
+    consumer = Consumer(Entity.OFFER, settings)
+    consumer.redis = redis
+    consumer.rmq.prefetch_count = consumer.base_prefetch_count = 9
+    consumer.rmq.max_delay = consumer.base_max_delay = 0.01
+    consumer.rmq.set_prefetch_count = AsyncMock()
+    return consumer
+
+
+@pytest.mark.anyio
+async def test_backpressure_not_applied_below_low_watermark(
+    backpressure_consumer: Consumer, redis: Redis
+):
+    await redis.lpush(REDIS_KEYS_MAP[Entity.OFFER], *[b"msg"] * 2)
+
+    await backpressure_consumer.apply_backpressure()
+
+    backpressure_consumer.rmq.set_prefetch_count.assert_not_awaited()
+    assert backpressure_consumer.rmq.max_delay == 0.01
+
+
+@pytest.mark.anyio
+async def test_backpressure_throttles_by_deepest_queue(
+    backpressure_consumer: Consumer, redis: Redis
+):
+    await redis.lpush(REDIS_KEYS_MAP[Entity.OFFER], *[b"msg"] * 2)
+    await redis.lpush(PRICE_EVENT_QUEUE, *[b"event"] * 6)
+
+    await backpressure_consumer.apply_backpressure()
+
+    backpressure_consumer.rmq.set_prefetch_count.assert_awaited_once_with(5)
+    assert backpressure_consumer.rmq.max_delay == pytest.approx(0.02)
+
+
+@pytest.mark.anyio
+async def test_backpressure_waits_above_high_watermark(
+    backpressure_consumer: Consumer, redis: Redis
+):
+    await redis.lpush(REDIS_KEYS_MAP[Entity.OFFER], *[b"msg"] * 10)
+    task = asyncio.create_task(backpressure_consumer.apply_backpressure())
+    await asyncio.sleep(0.05)
+    assert not task.done()
+
+    await redis.ltrim(REDIS_KEYS_MAP[Entity.OFFER], 0, 0)
+    await asyncio.wait_for(task, 1)
+    backpressure_consumer.rmq.set_prefetch_count.assert_not_awaited()
@@ -0,0 +1,74 @@
+import orjson
+import pytest
+from api_principles.message import Message
+
+from app.config.settings import ConsumerSettings
+from app.constants import Entity
+from app.consumers.consumer import Consumer
+from app.metrics import ENTITY_METRICS
+from app.parsers.envelope import decode_message_body
+from tests.integration.consumer.test_consumer import msg_body
+
+
+@pytest.fixture
+def deduplicating_consumer(settings: ConsumerSettings) -> Consumer:
+    settings.CONSUMER_DEDUPLICATE = True
+    return Consumer(Entity.SHOP, settings)
+
+
+def shop_msg(action: str, i: int, version: int) -> bytes:
+    return orjson.dumps(msg_body("shop", action, i, version, country="SK"))
+
+
+def decode_bodies(msg_bodies: list[bytes | None]) -> list[dict | None]:
+    return [decode_message_body(body) if body else None for body in msg_bodies]
+
+
+def test_collapse_keeps_highest_version(deduplicating_consumer: Consumer):
+    collapsed = ENTITY_METRICS.labels(
+        entity="shop", phase="consumer", operation="collapsed"
+    )
+    collapsed_before = collapsed._value.get()
+    msg_bodies = [
+        shop_msg("update", 1, 2),
+        shop_msg("update", 2, 1),
+        shop_msg("update", 1, 3),
+        shop_msg("update", 1, 1),
+        shop_msg("delete", 1, 1),
+        None,
+        b"invalid",
+    ]
+
+    assert deduplicating_consumer.collapse_message_bodies(
+        msg_bodies, decode_bodies(msg_bodies)
+    ) == [
+        None,
+        shop_msg("update", 2, 1),
+        shop_msg("update", 1, 3),
+        None,
+        shop_msg("delete", 1, 1),
+        None,
+        b"invalid",
+    ]
+    assert collapsed._value.get() - collapsed_before == 2
+
+
+def test_collapse_keeps_last_message_of_same_version(deduplicating_consumer: Consumer):
+    first = orjson.dumps({**msg_body("shop", "update", 1, 1), "name": "first"})
+    last = orjson.dumps({**msg_body("shop", "update", 1, 1), "name": "last"})
+    assert deduplicating_consumer.collapse_message_bodies(
+        [first, last], decode_bodies([first, last])
+    ) == [None, last]
+
+
+@pytest.mark.parametrize("deduplicate", [True, False])
+def test_filter_message_bodies_deduplicates(
+    settings: ConsumerSettings, deduplicate: bool
+):
+    settings.CONSUMER_DEDUPLICATE = deduplicate
+    consumer = Consumer(Entity.SHOP, settings)
+    msg_bodies = [shop_msg("update", 1, 1), shop_msg("update", 1, 2)]
+    messages = [Message(headers={}, body=[body], metadata={}) for body in msg_bodies]
+
+    expected = [None, msg_bodies[1]] if deduplicate else msg_bodies
+    assert consumer.filter_message_bodies(messages) == expected
@@ -0,0 +1,65 @@
+import orjson
+import pytest
+from api_principles.message import Message
+from redis.asyncio import Redis
+
+from app.config.settings import ConsumerSettings
+from app.constants import Entity
+from app.consumers.consumer import Consumer
+from app.parsers.envelope import EnvelopeCodec
+from tests.integration.consumer.conftest import REDIS_KEYS_MAP
+from tests.integration.consumer.test_consumer import msg_body
+
+
+@pytest.mark.parametrize("batch,envelope_count", [(False, 5), (True, 3)])
+@pytest.mark.anyio
+async def test_consumer_pushes_envelopes(
+    settings: ConsumerSettings, redis: Redis, batch: bool, envelope_count: int
+):
+    settings.CONSUMER_COMPACT_ENVELOPE = True
+    settings.CONSUMER_COMPACT_ENVELOPE_BATCH = batch
+    settings.CONSUMER_REDIS_PUSH_CHUNK_SIZE = 2
+    consumer = Consumer(Entity.OFFER, settings)
+    consumer.redis = redis
+    msgs = [msg_body("offer", "update", i, country="SK") for i in range(5)]
+
+    await consumer.push_messages_to_redis([orjson.dumps(msg) for msg in msgs])
+
+    envelopes = await redis.lrange(REDIS_KEYS_MAP[Entity.OFFER], 0, -1)
+    assert len(envelopes) == envelope_count
+    codec = EnvelopeCodec(Entity.OFFER)
+    decoded = [msg for envelope in reversed(envelopes) for msg in codec.decode(envelope)]
+    # Only projected fields are pushed
+    assert decoded == [
+        {"action": "update", "version": 1, "legacy": {"countryCode": "SK"}}
+    ] * len(msgs)
+
+
+@pytest.mark.parametrize("manual_ack", [False, True])
+@pytest.mark.anyio
+async def test_consumer_decodes_messages_once(
+    settings: ConsumerSettings, redis: Redis, mocker, manual_ack: bool
+):
+    settings.CONSUMER_FAST_PREFILTER = True
+    settings.CONSUMER_DEDUPLICATE = True
+    settings.CONSUMER_DROP_STALE_VERSIONS = True
+    settings.CONSUMER_COMPACT_ENVELOPE = True
+    settings.CONSUMER_COMPACT_ENVELOPE_BATCH = True
+    settings.CONSUMER_MANUAL_ACK = manual_ack
+    consumer = Consumer(Entity.OFFER, settings)
+    consumer.redis = redis
+    messages = [
+        Message(
+            headers={},
+            body=[orjson.dumps(msg_body("offer", "update", i, country="SK"))],
+            metadata={"message": mocker.AsyncMock()},
+        )
+        for i in range(5)
+    ]
+    loads_spy = mocker.patch("orjson.loads", wraps=orjson.loads)
+
+    await consumer.on_batch(messages)
+
+    assert loads_spy.call_count == len(messages)
+    (envelope,) = await redis.lrange(REDIS_KEYS_MAP[Entity.OFFER], 0, -1)
+    assert len(EnvelopeCodec(Entity.OFFER).decode(envelope)) == len(messages)
@@ -0,0 +1,112 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import orjson
+import pytest
+from redis.asyncio import Redis
+
+from app.config.settings import ConsumerSettings
+from app.constants import Entity
+from app.consumers.consumer import Consumer, DummyDecoder
+from tests.integration.consumer.conftest import REDIS_KEYS_MAP
+from tests.integration.consumer.test_consumer import msg_body
+
+
+def incoming_message(body: dict, delivery_tag: int) -> MagicMock:
+    message = MagicMock()
+    message.body = orjson.dumps(body)
+    message.delivery_tag = delivery_tag
+    message.ack = AsyncMock()
+    message.nack = AsyncMock()
+    return message
+
+
+@pytest.fixture
+def manual_ack_consumer(settings: ConsumerSettings, redis: Redis) -> Consumer:
+    settings.CONSUMER_MANUAL_ACK = True
+    settings.CONSUMER_REDIS_PUSH_CHUNK_SIZE = 2
+    consumer = Consumer(Entity.OFFER, settings)
+    consumer.redis = redis
+    return consumer
+
+
+@pytest.mark.anyio
+async def test_manual_ack_acks_pushed_messages(
+    manual_ack_consumer: Consumer, redis: Redis
+):
+    incoming = [
+        incoming_message(msg_body("offer", "update", i, country="SK"), i)
+        for i in range(1, 5)
+    ]
+    # Filtered country is acked with its chunk
+    incoming.append(incoming_message(msg_body("offer", "update", 5, country="CZ"), 5))
+
+    await manual_ack_consumer.on_batch([DummyDecoder().decode(m) for m in incoming])
+
+    assert await redis.llen(REDIS_KEYS_MAP[Entity.OFFER]) == 4
+    incoming[-1].ack.assert_awaited_once_with(multiple=True)
+    for message in incoming[:-1]:
+        message.ack.assert_not_awaited()
+    for message in incoming:
+        message.nack.assert_not_awaited()
+
+
+@pytest.mark.anyio
+async def test_manual_ack_nacks_failed_messages(
+    manual_ack_consumer: Consumer, redis: Redis
+):
+    # Pushing to a key of a different type fails
+    await redis.set(REDIS_KEYS_MAP[Entity.OFFER], "value")
+    incoming = [
+        incoming_message(msg_body("offer", "update", i, country="SK"), i)
+        for i in range(1, 4)
+    ]
+
+    await manual_ack_consumer.on_batch([DummyDecoder().decode(m) for m in incoming])
+
+    incoming[-1].nack.assert_awaited_once_with(multiple=True, requeue=True)
+    for message in incoming:
+        message.ack.assert_not_awaited()
+
+
+@pytest.mark.anyio
+async def test_manual_ack_settles_chunks_by_result(manual_ack_consumer: Consumer):
+    incoming = [incoming_message({}, i) for i in range(1, 7)]
+    messages = [DummyDecoder().decode(m) for m in incoming]
+
+    await manual_ack_consumer.settle_messages(
+        [
+            (messages[0:2], True),
+            (messages[2:3], True),
+            (messages[3:5], False),
+            (messages[5:], True),
+        ]
+    )
+
+    incoming[2].ack.assert_awaited_once_with(multiple=True)
+    incoming[4].nack.assert_awaited_once_with(multiple=True, requeue=True)
+    incoming[5].ack.assert_awaited_once_with(multiple=True)
+    assert sum(m.ack.await_count + m.nack.await_count for m in incoming) == 3
+
+
+@pytest.mark.parametrize("free_memory_in_pct", [5])
+@pytest.mark.anyio
+async def test_manual_ack_nacks_all_when_redis_full(
+    settings: ConsumerSettings, redis_full: Redis, mocker
+):
+    settings.CONSUMER_MANUAL_ACK = True
+    settings.CONSUMER_REDIS_FULL_BACKOFF = 2
+    sleep_mock = mocker.patch("app.consumers.consumer.asyncio.sleep")
+    consumer = Consumer(Entity.OFFER, settings)
+    consumer.redis = redis_full
+    consumer.redis_capacity = 90
+    incoming = [
+        incoming_message(msg_body("offer", "update", i, country="SK"), i)
+        for i in range(1, 4)
+    ]
+
+    # consumer keeps running, it backs off instead of raising
+    await consumer.on_batch([DummyDecoder().decode(m) for m in incoming])
+
+    assert await redis_full.llen(REDIS_KEYS_MAP[Entity.OFFER]) == 0
+    incoming[-1].nack.assert_awaited_once_with(multiple=True, requeue=True)
+    sleep_mock.assert_awaited_once_with(2)
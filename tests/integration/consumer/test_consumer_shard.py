@@ -0,0 +1,63 @@
+import orjson
+import pytest
+from api_principles.message import Message
+from redis.asyncio import Redis
+
+from app.config.settings import ConsumerSettings
+from app.constants import PRICE_EVENT_QUEUE, Entity
+from app.consumers.consumer import Consumer
+from tests.integration.consumer.test_consumer import msg_body
+
+
+@pytest.fixture
+def sharding_consumer(settings: ConsumerSettings, redis: Redis) -> Consumer:
+    settings.REDIS_QUEUE_SHARD_BY_COUNTRY = True
+    settings.CONSUMER_REDIS_PUSH_CHUNK_SIZE = 2
+    consumer = Consumer(Entity.OFFER, settings)
+    consumer.redis = redis
+    consumer.redis_capacity = 90
+    return consumer
+
+
+def offer_messages(*countries: str | None) -> list[Message]:
+    return [
+        Message(
+            headers={},
+            body=[orjson.dumps(msg_body("offer", "update", i, country=country))],
+            metadata={},
+        )
+        for i, country in enumerate(countries)
+    ]
+
+
+@pytest.mark.parametrize("manual_ack", [False, True])
+@pytest.mark.anyio
+async def test_consumer_routes_messages_by_country(
+    sharding_consumer: Consumer, redis: Redis, manual_ack: bool, mocker
+):
+    # CZ is filtered for offers
+    messages = offer_messages("SK", "HU", "SK", "CZ", None, "XX")
+    if manual_ack:
+        for msg in messages:
+            msg.metadata["message"] = mocker.AsyncMock()
+        await sharding_consumer.process_message_buffer_with_ack(messages)
+    else:
+        await sharding_consumer.process_message_buffer(messages)
+
+    assert await redis.lrange("rmq-offer-SK", 0, -1) == [
+        messages[2].body[0],
+        messages[0].body[0],
+    ]
+    assert await redis.lrange("rmq-offer-HU", 0, -1) == [messages[1].body[0]]
+    assert not await redis.exists("rmq-offer-CZ")
+    # Messages without known country go to the entity queue
+    assert await redis.lrange("rmq-offer", 0, -1) == [
+        messages[5].body[0],
+        messages[4].body[0],
+    ]
+
+
+def test_consumer_watches_country_queues(sharding_consumer: Consumer):
+    assert "rmq-offer" in sharding_consumer.watched_lists
+    assert "rmq-offer-SK" in sharding_consumer.watched_lists
+    assert PRICE_EVENT_QUEUE in sharding_consumer.watched_lists
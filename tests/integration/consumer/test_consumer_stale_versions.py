@@ -0,0 +1,76 @@
+import orjson
+import pytest
+from redis.asyncio import Redis
+
+from app.config.settings import ConsumerSettings
+from app.constants import Entity
+from app.consumers.consumer import Consumer
+from app.parsers.envelope import decode_message_body
+from app.utils.version_map import VersionMap
+from tests.integration.consumer.test_consumer import msg_body
+from tests.utils import custom_uuid
+
+
+@pytest.fixture
+def stale_filtering_consumer(settings: ConsumerSettings, redis: Redis) -> Consumer:
+    settings.CONSUMER_DROP_STALE_VERSIONS = True
+    consumer = Consumer(Entity.SHOP, settings)
+    consumer.redis = redis
+    return consumer
+
+
+@pytest.mark.anyio
+async def test_consumer_drops_stale_messages(
+    stale_filtering_consumer: Consumer, redis: Redis
+):
+    await VersionMap(Entity.SHOP).update(redis, {custom_uuid(1): 2})
+    msg_bodies = [
+        orjson.dumps(msg_body("shop", "update", 1, version=1)),
+        orjson.dumps(msg_body("shop", "update", 1, version=2)),
+        orjson.dumps(msg_body("shop", "update", 1, version=3)),
+        orjson.dumps(msg_body("shop", "delete", 1, version=2)),
+        orjson.dumps(msg_body("shop", "update", 2, version=1)),
+        b"invalid",
+        None,
+    ]
+
+    msg_dicts = [decode_message_body(body) if body else None for body in msg_bodies]
+
+    assert await stale_filtering_consumer.drop_stale_message_bodies(
+        msg_bodies, msg_dicts
+    ) == [
+        None,
+        None,
+        msg_bodies[2],
+        msg_bodies[3],
+        msg_bodies[4],
+        b"invalid",
+        None,
+    ]
+
+
+@pytest.mark.anyio
+async def test_consumer_keeps_messages_if_version_map_fails(
+    stale_filtering_consumer: Consumer, redis: Redis
+):
+    await redis.set(VersionMap(Entity.SHOP).key, "value")
+    msg_bodies = [orjson.dumps(msg_body("shop", "update", 1, version=1))]
+
+    msg_dicts = [decode_message_body(body) for body in msg_bodies]
+
+    assert (
+        await stale_filtering_consumer.drop_stale_message_bodies(msg_bodies, msg_dicts)
+        == msg_bodies
+    )
+
+
+@pytest.mark.parametrize(
+    "entity, force_entity_update",
+    [(Entity.AVAILABILITY, False), (Entity.BUYABLE, False), (Entity.SHOP, True)],
+)
+def test_consumer_does_not_drop_stale_messages(
+    settings: ConsumerSettings, entity: Entity, force_entity_update: bool
+):
+    settings.CONSUMER_DROP_STALE_VERSIONS = True
+    settings.FORCE_ENTITY_UPDATE = force_entity_update
+    assert Consumer(entity, settings).version_map is None
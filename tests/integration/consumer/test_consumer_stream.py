@@ -0,0 +1,46 @@
+import orjson
+import pytest
+from redis.asyncio import Redis
+
+from app.config.settings import ConsumerSettings
+from app.constants import REDIS_STREAM_MSG_FIELD, Entity, RedisQueueTransport
+from app.consumers.consumer import Consumer
+from tests.integration.consumer.test_consumer import msg_body
+
+
+@pytest.fixture
+def stream_consumer(settings: ConsumerSettings, redis: Redis) -> Consumer:
+    settings.REDIS_QUEUE_TRANSPORT = RedisQueueTransport.STREAM
+    settings.CONSUMER_REDIS_PUSH_CHUNK_SIZE = 2
+    consumer = Consumer(Entity.OFFER, settings)
+    consumer.redis = redis
+    return consumer
+
+
+@pytest.mark.anyio
+async def test_consumer_pushes_to_stream(stream_consumer: Consumer, redis: Redis):
+    msgs = [orjson.dumps(msg_body("offer", "update", i)) for i in range(3)]
+
+    await stream_consumer.push_messages_to_redis(msgs)
+
+    entries = await redis.xrange("rmq-stream-offer")
+    assert [fields[REDIS_STREAM_MSG_FIELD] for _, fields in entries] == msgs
+    assert await stream_consumer.get_queue_depth() == 3
+
+
+@pytest.mark.anyio
+async def test_consumer_pushes_chunks_to_stream(stream_consumer: Consumer, redis: Redis):
+    msgs = [orjson.dumps(msg_body("offer", "update", i)) for i in range(3)]
+
+    pushed = await stream_consumer.push_chunks_to_redis([msgs[:2], [], msgs[2:]])
+
+    assert pushed == [True, True, True]
+    assert await redis.xlen("rmq-stream-offer") == 3
+
+
+@pytest.mark.anyio
+async def test_consumer_stream_chunk_fails(stream_consumer: Consumer, redis: Redis):
+    await redis.set("rmq-stream-offer", "value")
+    msgs = [orjson.dumps(msg_body("offer", "update", i)) for i in range(3)]
+
+    assert await stream_consumer.push_chunks_to_redis([msgs[:2], []]) == [False, True]
@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+import pytest
+from redis.asyncio import Redis
+
+from app.config.settings import ConsumerSettings
+from app.constants import Entity
+from app.consumers.consumer import Consumer
+from app.consumers.redis_sampler import RedisMemorySampler, memory_usage_in_percent
+from app.exceptions import RedisFullError
+from tests.integration.consumer.conftest import REDIS_KEYS_MAP
+
+
+@pytest.mark.anyio
+async def test_sampler_samples_memory_and_lists(redis: Redis):
+    await redis.lpush(REDIS_KEYS_MAP[Entity.OFFER], b"message1", b"message2")
+    sampler = RedisMemorySampler(redis, interval=0.01)
+    sampler.watch_list(REDIS_KEYS_MAP[Entity.OFFER])
+    sampler.watch_list(REDIS_KEYS_MAP[Entity.SHOP])
+
+    sampler.start()
+    await asyncio.sleep(0.05)
+    await sampler.stop()
+
+    assert sampler.task is None
+    assert 0 < sampler.memory_usage < 100
+    assert sampler.list_lengths == {
+        REDIS_KEYS_MAP[Entity.OFFER]: 2,
+        REDIS_KEYS_MAP[Entity.SHOP]: 0,
+    }
+
+
+@pytest.mark.anyio
+async def test_sampler_survives_unexpected_errors(redis: Redis, mocker):
+    sampler = RedisMemorySampler(redis, interval=0.01)
+    sample_mock = mocker.patch.object(
+        sampler, "sample", side_effect=[ValueError("unexpected")] + [None] * 100
+    )
+
+    sampler.start()
+    await asyncio.sleep(0.05)
+    await sampler.stop()
+
+    # sampling went on after the error
+    assert sample_mock.call_count > 1
+
+
+@pytest.mark.anyio
+async def test_sampler_memory_usage_without_maxmemory(redis: Redis, mocker):
+    sampler = RedisMemorySampler(redis, interval=1)
+    mocker.patch.object(
+        redis,
+        "info",
+        mocker.AsyncMock(return_value={"used_memory": 1000, "maxmemory": 0}),
+    )
+
+    assert await sampler.get_memory_usage() == 0
+    assert sampler.fresh_memory_usage() == 0
+
+
+def test_memory_usage_in_percent():
+    assert memory_usage_in_percent({"used_memory": 25, "maxmemory": 100}) == 25
+    assert memory_usage_in_percent({"used_memory": 25, "maxmemory": 0}) == 0
+
+
+@pytest.mark.parametrize(
+    "free_memory_in_pct,sampled_memory_usage,sample_age,expected_memory_usage",
+    [
+        (50, 10, 0, 10),  # sample is far from threshold, it is used
+        (5, 10, 0, 10),  # sample is trusted until it gets close to threshold
+        (5, 88, 0, 95),  # sample is close to threshold, Redis is asked
+        (50, None, 0, 50),  # no sample yet, Redis is asked
+        (50, 10, 5, 50),  # sample is older than 3 intervals, Redis is asked
+    ],
+)
+@pytest.mark.anyio
+async def test_consumer_uses_sampled_memory_usage(
+    settings: ConsumerSettings,
+    redis_full: Redis,
+    sampled_memory_usage: float | None,
+    sample_age: float,
+    expected_memory_usage: float,
+):
+    consumer = Consumer(Entity.OFFER, settings)
+    consumer.redis = redis_full
+    consumer.redis_capacity = 90
+    consumer.redis_sampler = RedisMemorySampler(redis_full, interval=1)
+    consumer.redis_sampler.memory_usage = sampled_memory_usage
+    if sampled_memory_usage is not None:
+        consumer.redis_sampler.sampled_at = time.monotonic() - sample_age
+
+    memory_usage = await consumer.get_sampled_redis_memory_usage()
+    assert memory_usage == pytest.approx(expected_memory_usage, abs=1)
+
+
+@pytest.mark.parametrize("free_memory_in_pct", [5])
+@pytest.mark.anyio
+async def test_consumer_pushes_to_redis_when_sample_is_close_to_full(
+    settings: ConsumerSettings, redis_full: Redis, caplog
+):
+    consumer = Consumer(Entity.OFFER, settings)
+    consumer.redis = redis_full
+    consumer.redis_capacity = 90
+    consumer.redis_sampler = RedisMemorySampler(redis_full, interval=1)
+    consumer.redis_sampler.memory_usage = 86
+    consumer.redis_sampler.sampled_at = time.monotonic()
+
+    with pytest.raises(RedisFullError):
+        await consumer.push_messages_to_redis([b"message1", b"message2"])
+
+    assert await redis_full.llen(REDIS_KEYS_MAP[Entity.OFFER]) == 0
+    assert caplog.messages[-1] == "Redis is 90 pct full, 2 messages are nacked"
@@ -0,0 +1,70 @@
+from uuid import UUID
+
+import pytest
+from sqlalchemy import text
+
+from app import crud
+from app.constants import Action, Entity
+from app.schemas.offer import OfferMessageSchema
+from app.utils.pg_partitions import get_offer_partition
+from app.workers.offer import OfferMessageWorker
+from tests.msg_templator.base import entity_msg
+from tests.utils import push_messages_and_process_them_by_worker, random_one_id
+
+
+def offer_msg(action: Action, offer_id, product_id=None) -> dict:
+    body = {"id": str(offer_id), "version": 1}
+    if product_id:
+        body["productId"] = str(product_id)
+    return entity_msg(Entity.OFFER, action, body)
+
+
+@pytest.mark.anyio
+async def test_offer_shards_are_aligned_with_partitions(offer_worker):
+    offer_worker.db_concurrency = 4
+    keys = [(random_one_id(), random_one_id()) for _ in range(40)]
+    messages = [
+        offer_worker.to_message(offer_msg(Action.UPDATE, offer_id, product_id))
+        for product_id, offer_id in keys
+    ]
+
+    shards = offer_worker.split_to_shards(messages)
+
+    assert sum(len(shard) for shard in shards) == len(messages)
+    for shard in shards:
+        partitions = {
+            get_offer_partition(UUID(msg.body["productId"]), msg.identifier)
+            for msg in shard
+        }
+        assert len({partition % 4 for partition in partitions}) == 1
+
+
+@pytest.mark.anyio
+async def test_worker_writes_shards_concurrently(
+    db_engine, worker_settings, worker_redis
+):
+    worker_settings.WORKER_DB_CONCURRENCY = 4
+    worker = OfferMessageWorker(
+        Entity.OFFER, worker_settings, db_engine, worker_redis, OfferMessageSchema
+    )
+    keys = [(random_one_id(), random_one_id()) for _ in range(20)]
+
+    try:
+        await push_messages_and_process_them_by_worker(
+            worker_redis,
+            worker,
+            *(
+                offer_msg(Action.UPDATE, offer_id, product_id)
+                for product_id, offer_id in keys
+            ),
+            wait_multiplier=5,
+        )
+        async with db_engine.connect() as conn:
+            offers = await crud.offer.get_in(conn, [offer_id for _, offer_id in keys])
+        assert len(offers) == len(keys)
+    finally:
+        async with db_engine.begin() as conn:
+            await conn.execute(
+                text("DELETE FROM offers WHERE id = ANY(:ids)"),
+                {"ids": [offer_id for _, offer_id in keys]},
+            )
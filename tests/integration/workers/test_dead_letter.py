@@ -0,0 +1,59 @@
+import orjson
+import pytest
+from sqlalchemy import text
+
+from app import crud
+from app.constants import Action, Entity
+from app.schemas.offer import OfferMessageSchema
+from app.workers.offer import OfferMessageWorker
+from tests.msg_templator.base import entity_msg
+from tests.utils import push_messages_and_process_them_by_worker, random_one_id
+
+
+def offer_msg(offer_id, amount: float) -> dict:
+    return entity_msg(
+        Entity.OFFER,
+        Action.UPDATE,
+        {
+            "id": str(offer_id),
+            "productId": str(random_one_id()),
+            "version": 1,
+            "prices": [{"type": "regular", "amount": amount, "currencyCode": "CZK"}],
+        },
+    )
+
+
+@pytest.mark.anyio
+async def test_worker_dead_letters_only_bad_offers(
+    db_engine, worker_settings, worker_redis
+):
+    worker = OfferMessageWorker(
+        Entity.OFFER, worker_settings, db_engine, worker_redis, OfferMessageSchema
+    )
+    offer_ids = [random_one_id() for _ in range(5)]
+    bad_offer_id = offer_ids[3]
+
+    try:
+        await push_messages_and_process_them_by_worker(
+            worker_redis,
+            worker,
+            *(
+                # Price overflows the numeric column of offers
+                offer_msg(offer_id, 1e12 if offer_id == bad_offer_id else 10)
+                for offer_id in offer_ids
+            ),
+            wait_multiplier=5,
+        )
+        async with db_engine.connect() as conn:
+            offers = await crud.offer.get_in(conn, offer_ids)
+    finally:
+        async with db_engine.begin() as conn:
+            await conn.execute(
+                text("DELETE FROM offers WHERE id = ANY(:ids)"), {"ids": offer_ids}
+            )
+
+    assert {offer.id for offer in offers} == set(offer_ids) - {bad_offer_id}
+    dead_letters = await worker_redis.lrange(worker.dead_letter_queue, 0, -1)
+    assert [orjson.loads(item)["data"]["id"] for item in dead_letters] == [
+        str(bad_offer_id)
+    ]
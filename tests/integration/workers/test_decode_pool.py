@@ -0,0 +1,100 @@
+import pytest
+
+from app import crud
+from app.constants import Action, Entity
+from app.schemas.shop import ShopCreateSchema
+from app.utils import dump_to_json
+from app.workers.shop import ShopMessageWorker
+from tests.factories import shop_factory
+from tests.msg_templator.base import entity_msg
+from tests.utils import custom_uuid, push_messages_and_process_them_by_worker
+
+
+def shop_msg(action: Action, shop_id, version: int, **shop) -> dict:
+    return entity_msg(
+        Entity.SHOP, action, {"version": version, "shop": {"id": str(shop_id), **shop}}
+    )
+
+
+@pytest.mark.anyio
+async def test_decode_messages_sends_back_create_schemas_only(
+    shop_worker: ShopMessageWorker,
+):
+    disabled = {
+        "state": {"verified": False, "paying": False, "enabled": False},
+        "certificate": {"enabled": False},
+    }
+    redis_messages = [
+        dump_to_json(shop_msg(Action.UPDATE, custom_uuid(1), 2)),
+        b"invalid",
+        dump_to_json(shop_msg(Action.UPDATE, custom_uuid(2), 1, **disabled)),
+        dump_to_json(shop_msg(Action.UPDATE, "not-uuid", 1)),
+        dump_to_json(shop_msg(Action.DELETE, custom_uuid(3), 4)),
+    ]
+
+    batch = shop_worker.decode_messages(redis_messages, list(range(5)))
+
+    assert (batch.read, batch.invalid, batch.desired) == (5, 2, 1)
+    assert batch.settled_ack_ids == [1, 3]
+    assert [(msg.identifier, msg.body) for msg in batch.messages] == [
+        (custom_uuid(1), {}),
+        (custom_uuid(2), {}),
+        (custom_uuid(3), {}),
+    ]
+    expected = shop_worker.to_create_schema(
+        shop_worker.to_message_schema(
+            shop_worker.to_message(shop_msg(Action.UPDATE, custom_uuid(1), 2))
+        )
+    )
+    assert isinstance(batch.messages[0].create_schema, ShopCreateSchema)
+    assert batch.messages[0].create_schema == expected
+    assert batch.messages[1].create_schema is None
+    assert batch.messages[2].create_schema is None
+
+
+@pytest.mark.anyio
+async def test_worker_decodes_messages_in_process_pool(
+    db_conn, worker_redis, shop_worker: ShopMessageWorker
+):
+    shop_1 = await shop_factory(db_conn, version=1)
+    shop_2 = await shop_factory(db_conn, version=1)
+    shop_worker.decode_processes = 2
+
+    await push_messages_and_process_them_by_worker(
+        worker_redis,
+        shop_worker,
+        shop_msg(Action.UPDATE, shop_1.id, 2),
+        shop_msg(Action.DELETE, shop_2.id, 2),
+        shop_msg(Action.UPDATE, shop_1.id, 3),
+        wait_multiplier=50,
+    )
+
+    shops = await crud.shop.get_many(db_conn)
+    assert [(shop.id, shop.version) for shop in shops] == [(shop_1.id, 3)]
+    assert shop_worker.decode_pool is None
+
+
+@pytest.mark.anyio
+async def test_worker_skips_invalid_messages_in_process_pool(
+    db_conn, worker_redis, shop_worker: ShopMessageWorker
+):
+    shop_1 = await shop_factory(db_conn, version=1)
+    shop_2 = await shop_factory(db_conn, version=1)
+    shop_worker.decode_processes = 2
+    unknown_action = {**shop_msg(Action.UPDATE, shop_2.id, 3), "action": "unknown"}
+
+    await push_messages_and_process_them_by_worker(
+        worker_redis,
+        shop_worker,
+        shop_msg(Action.UPDATE, shop_1.id, 2),
+        shop_msg(Action.UPDATE, shop_1.id, "not-int"),
+        unknown_action,
+        shop_msg(Action.UPDATE, shop_2.id, 2),
+        wait_multiplier=50,
+    )
+
+    shops = await crud.shop.get_many(db_conn)
+    assert {(shop.id, shop.version) for shop in shops} == {
+        (shop_1.id, 2),
+        (shop_2.id, 2),
+    }
@@ -0,0 +1,49 @@
+import pytest
+
+from app import crud
+from app.constants import Action, Entity
+from app.metrics import ENTITY_CACHE_METRICS
+from app.utils.entity_cache import EntityCache
+from app.workers.shop import ShopMessageWorker
+from tests.factories import shop_factory
+from tests.msg_templator.base import entity_msg
+from tests.utils import push_messages_and_process_them_by_worker
+
+CACHE_HITS = ENTITY_CACHE_METRICS.labels(entity=Entity.SHOP.value, result="hit")
+
+
+def shop_msg(action: Action, shop_id, version: int, paying: bool = True) -> dict:
+    shop: dict = {"id": str(shop_id)}
+    if action != Action.DELETE:
+        shop["state"] = {"paying": paying}
+    return entity_msg(Entity.SHOP, action, {"version": version, "shop": shop})
+
+
+@pytest.mark.anyio
+async def test_worker_skips_db_reads_of_cached_unchanged_entities(
+    db_conn, worker_redis, shop_worker: ShopMessageWorker, mocker
+):
+    shop = await shop_factory(db_conn, version=1)
+    shop_worker.service.cache = EntityCache(max_size=10)
+    get_in = mocker.spy(shop_worker.service.crud, "get_in")
+    hits_before = CACHE_HITS._value.get()
+
+    async def process(msg: dict) -> None:
+        await push_messages_and_process_them_by_worker(worker_redis, shop_worker, msg)
+
+    await process(shop_msg(Action.UPDATE, shop.id, 2))
+    assert get_in.call_count == 1
+    # Republished and older messages are dropped without reading the DB
+    await process(shop_msg(Action.UPDATE, shop.id, 2))
+    await process(shop_msg(Action.UPDATE, shop.id, 1, paying=False))
+    assert get_in.call_count == 1
+    assert CACHE_HITS._value.get() - hits_before == 2
+
+    await process(shop_msg(Action.UPDATE, shop.id, 2, paying=False))
+    assert get_in.call_count == 2
+    assert (await crud.shop.get_many(db_conn))[0].paying is False
+
+    await process(shop_msg(Action.DELETE, shop.id, 3))
+    await process(shop_msg(Action.UPDATE, shop.id, 3))
+    assert get_in.call_count == 4
+    assert [s.version for s in await crud.shop.get_many(db_conn)] == [3]
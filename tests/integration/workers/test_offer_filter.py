@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from app.constants import Action, Entity
+from app.utils.offer_filter import OfferIdFilter
+from tests.factories import offer_factory
+from tests.msg_templator.base import entity_msg
+from tests.utils import custom_uuid, push_messages_and_process_them_by_worker
+
+
+@pytest.mark.anyio
+async def test_offer_filter_loads_offers_and_receives_broadcasts(db_engine, redis):
+    async with db_engine.begin() as conn:
+        offer = await offer_factory(conn)
+    offer_filter = OfferIdFilter(capacity=1000, error_rate=0.001)
+    unknown_id = custom_uuid(12345)
+    # Every offer is known until the filter is loaded
+    assert unknown_id in offer_filter
+
+    try:
+        await offer_filter.start(db_engine, redis)
+        assert offer.id in offer_filter
+        assert unknown_id not in offer_filter
+
+        await OfferIdFilter.broadcast(redis, [unknown_id])
+        await asyncio.sleep(0.1)
+        assert unknown_id in offer_filter
+    finally:
+        await offer_filter.stop()
+        async with db_engine.begin() as conn:
+            await conn.execute(
+                text("DELETE FROM offers WHERE id = ANY(:ids)"), {"ids": [offer.id]}
+            )
+
+
+@pytest.mark.anyio
+async def test_worker_drops_messages_of_unknown_offers(
+    db_conn, worker_redis, availability_worker, mocker
+):
+    offer = await offer_factory(db_conn, availability_version=1)
+    availability_worker.offer_filter = OfferIdFilter(capacity=1000, error_rate=0.001)
+    availability_worker.offer_filter.add_packed(offer.id.bytes)
+    availability_worker.offer_filter.ready = True
+    upsert = mocker.spy(availability_worker, "upsert_isolating_errors")
+    not_found_before = availability_worker.metrics.not_found_entities._value.get()
+
+    await push_messages_and_process_them_by_worker(
+        worker_redis,
+        availability_worker,
+        *(
+            entity_msg(
+                Entity.AVAILABILITY,
+                Action.UPDATE,
+                {"offerId": str(offer_id), "version": 2},
+            )
+            for offer_id in (offer.id, custom_uuid(12345))
+        ),
+    )
+
+    assert [data.id for data in upsert.call_args.args[1]] == [offer.id]
+    not_found = availability_worker.metrics.not_found_entities._value.get()
+    assert not_found - not_found_before == 1
@@ -135,7 +135,12 @@ async def test_update_price_events(db_conn, worker_redis, offer_worker, caplog):
         entity_msg(
             Entity.OFFER,
             Action.UPDATE,
-            {"id": str(offer.id), "productId": str(offer.product_id), "version": 2},
+            {
+                "id": str(offer.id),
+                "productId": str(offer.product_id),
+                "shopId": str(shop.id),
+                "version": 2,
+            },
         ),
     ]
 
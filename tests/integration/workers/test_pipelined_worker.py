@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from app import crud
+from app.constants import Action, Entity
+from app.utils import dump_to_json
+from app.workers.shop import ShopMessageWorker
+from tests.factories import shop_factory
+from tests.msg_templator.base import entity_msg
+
+
+def shop_msg(action: Action, shop_id, version: int) -> bytes:
+    return dump_to_json(
+        entity_msg(
+            Entity.SHOP, action, {"version": version, "shop": {"id": str(shop_id)}}
+        )
+    )
+
+
+def pipelined(worker: ShopMessageWorker, batches: list[list[bytes]], events: list):
+    """Worker reading given batches, then stopping itself"""
+    reads = iter(batches)
+
+    async def read(_count: int, _timeout: float):
+        batch = next(reads, None)
+        if batch is None:
+            worker.stop_consuming()
+            return []
+        events.append("read")
+        return list(enumerate(batch))
+
+    write_messages = worker.write_messages
+
+    async def ack(_ack_ids: list):
+        pass
+
+    async def slow_write_messages(messages_buffer, ack_ids):
+        events.append("write")
+        await asyncio.sleep(0.02)
+        await write_messages(messages_buffer, ack_ids)
+        events.append("written")
+
+    worker.pipeline = True
+    worker.buffer_size = 1
+    worker.transport.read = read  # type: ignore[method-assign]
+    worker.transport.ack = ack  # type: ignore[method-assign]
+    worker.write_messages = slow_write_messages  # type: ignore[method-assign]
+    return worker
+
+
+@pytest.mark.anyio
+async def test_pipelined_worker_keeps_order_of_entity_messages(db_conn, shop_worker):
+    shop_1 = await shop_factory(db_conn, version=1)
+    shop_2 = await shop_factory(db_conn, version=1)
+    events: list[str] = []
+    worker = pipelined(
+        shop_worker,
+        [
+            [shop_msg(Action.UPDATE, shop_1.id, 2)],
+            [shop_msg(Action.DELETE, shop_1.id, 3)],
+            [shop_msg(Action.UPDATE, shop_2.id, 2), b"invalid"],
+            [shop_msg(Action.UPDATE, shop_2.id, 3)],
+        ],
+        events,
+    )
+
+    await asyncio.wait_for(worker.consume_and_process_messages(), timeout=1)
+
+    shops = await crud.shop.get_many(db_conn)
+    assert [(shop.id, shop.version) for shop in shops] == [(shop_2.id, 3)]
+    assert events.count("write") == events.count("written") == 4
+    # Next batches are read before the first one is written
+    assert events[: events.index("written")].count("read") > 1
+
+
+@pytest.mark.anyio
+async def test_pipelined_worker_fails_when_write_fails_with_full_queues(
+    db_conn, shop_worker
+):
+    shop = await shop_factory(db_conn, version=1)
+    batches = [[shop_msg(Action.UPDATE, shop.id, version)] for version in range(2, 12)]
+    worker = pipelined(shop_worker, batches, [])
+    worker.pipeline_read_buffer_size = worker.pipeline_write_buffer_size = 1
+
+    async def failing_write_messages(_messages_buffer, _ack_ids):
+        # Let upstream stages fill their queues before failing
+        await asyncio.sleep(0.05)
+        raise RuntimeError("write failed")
+
+    worker.write_messages = failing_write_messages  # type: ignore[method-assign]
+
+    with pytest.raises(ExceptionGroup) as exc_info:
+        await asyncio.wait_for(worker.consume_and_process_messages(), timeout=1)
+    assert exc_info.group_contains(RuntimeError, match="write failed")
@@ -0,0 +1,251 @@
+import asyncio
+
+import pytest
+from redis import RedisError
+from redis.asyncio import Redis
+
+from app import crud
+from app.config.settings import WorkerSetting
+from app.constants import (
+    REDIS_STREAM_MSG_FIELD,
+    Action,
+    CountryCode,
+    Entity,
+    RedisQueueTransport,
+)
+from app.metrics import REDIS_STREAM_METRICS
+from app.utils import dump_to_json
+from app.workers.transport import ListTransport, StreamTransport, transport_from_settings
+from tests.factories import shop_factory
+from tests.msg_templator.base import entity_msg
+
+STREAM = "rmq-stream-shop"
+
+
+def stream_transport(redis: Redis, consumer: str, claim_min_idle_time: int = 60_000):
+    return StreamTransport(
+        redis,
+        [STREAM],
+        group="workers",
+        consumer=consumer,
+        claim_min_idle_time=claim_min_idle_time,
+        claim_interval=0,
+    )
+
+
+async def add_to_stream(redis: Redis, *msgs: bytes) -> None:
+    for msg in msgs:
+        await redis.xadd(STREAM, {REDIS_STREAM_MSG_FIELD: msg})
+
+
+@pytest.mark.anyio
+async def test_list_transport(worker_redis: Redis):
+    transport = ListTransport(worker_redis, ["rmq-shop"])
+    assert await transport.read(10, 0.01) == []
+
+    await worker_redis.lpush("rmq-shop", b"1", b"2", b"3")
+    assert await transport.read(2, 0.01) == [(None, b"1"), (None, b"2"), (None, b"3")]
+
+
+@pytest.mark.anyio
+async def test_stream_transport_read_and_ack(worker_redis: Redis):
+    transport = stream_transport(worker_redis, "worker-1")
+    await transport.setup()
+    # Creating existing group is ignored
+    await transport.setup()
+
+    await add_to_stream(worker_redis, b"1", b"2", b"3")
+    msgs = await transport.read(10, 0.01)
+    assert [msg for _, msg in msgs] == [b"1", b"2", b"3"]
+    assert await transport.read(10, 0.01) == []
+
+    pending = await worker_redis.xpending(STREAM, "workers")
+    assert pending["pending"] == 3
+
+    await transport.ack([ack_id for ack_id, _ in msgs])
+    assert (await worker_redis.xpending(STREAM, "workers"))["pending"] == 0
+    assert await worker_redis.xlen(STREAM) == 0
+
+
+@pytest.mark.anyio
+async def test_stream_transport_claims_messages_of_crashed_worker(worker_redis: Redis):
+    crashed = stream_transport(worker_redis, "worker-1")
+    await crashed.setup()
+    await add_to_stream(worker_redis, b"1", b"2", b"3")
+    await crashed.read(2, 0.01)
+
+    transport = stream_transport(worker_redis, "worker-2", claim_min_idle_time=0)
+    claimed = await transport.read(10, 0.01)
+    assert [msg for _, msg in claimed] == [b"1", b"2"]
+    await transport.ack([ack_id for ack_id, _ in claimed])
+
+    labels = {"stream": STREAM, "group": "workers"}
+    assert REDIS_STREAM_METRICS.labels(**labels, state="pending")._value.get() == 2
+    assert REDIS_STREAM_METRICS.labels(**labels, state="lag")._value.get() == 1
+
+    assert [msg for _, msg in await transport.read(10, 0.01)] == [b"3"]
+
+
+@pytest.mark.anyio
+async def test_worker_acks_stream_messages_after_processing(
+    db_conn, worker_redis: Redis, worker_settings: WorkerSetting, shop_worker
+):
+    shop = await shop_factory(db_conn, version=1)
+    worker_settings.REDIS_QUEUE_TRANSPORT = RedisQueueTransport.STREAM
+    shop_worker.transport = transport_from_settings(
+        Entity.SHOP, worker_settings, worker_redis
+    )
+    shop_worker.redis_pop_timeout = 0.01
+    await add_to_stream(
+        worker_redis,
+        dump_to_json(
+            entity_msg(
+                Entity.SHOP, Action.UPDATE, {"version": 2, "shop": {"id": str(shop.id)}}
+            )
+        ),
+        b"invalid",
+    )
+
+    task = asyncio.create_task(shop_worker.consume_and_process_messages())
+    await asyncio.sleep(0.05)
+    shop_worker.stop_consuming()
+    await asyncio.wait_for(task, timeout=1)
+
+    assert (await crud.shop.get_many(db_conn))[0].version == 2
+    assert await worker_redis.xlen(STREAM) == 0
+    assert (await worker_redis.xpending(STREAM, "workers"))["pending"] == 0
+
+
+@pytest.mark.anyio
+async def test_worker_acks_undecodable_stream_messages(
+    db_conn, worker_redis: Redis, worker_settings: WorkerSetting, shop_worker
+):
+    shops = [await shop_factory(db_conn, version=1) for _ in range(2)]
+    worker_settings.REDIS_QUEUE_TRANSPORT = RedisQueueTransport.STREAM
+    shop_worker.transport = transport_from_settings(
+        Entity.SHOP, worker_settings, worker_redis
+    )
+    shop_worker.redis_pop_timeout = 0.01
+    shop_msgs = [
+        dump_to_json(
+            entity_msg(
+                Entity.SHOP, Action.UPDATE, {"version": 2, "shop": {"id": str(shop.id)}}
+            )
+        )
+        for shop in shops
+    ]
+    await add_to_stream(
+        worker_redis,
+        shop_msgs[0],
+        dump_to_json(entity_msg(Entity.SHOP, Action.UPDATE, {"shop": {"id": "1"}})),
+        b"\xff",
+    )
+    await worker_redis.xadd(STREAM, {"other": b"field"})
+    await add_to_stream(worker_redis, shop_msgs[1])
+
+    task = asyncio.create_task(shop_worker.consume_and_process_messages())
+    await asyncio.sleep(0.05)
+    shop_worker.stop_consuming()
+    await asyncio.wait_for(task, timeout=1)
+
+    assert [shop.version for shop in await crud.shop.get_many(db_conn)] == [2, 2]
+    assert await worker_redis.xlen(STREAM) == 0
+    assert (await worker_redis.xpending(STREAM, "workers"))["pending"] == 0
+
+
+@pytest.mark.anyio
+async def test_worker_leaves_failed_stream_messages_pending(
+    db_conn, worker_redis: Redis, worker_settings: WorkerSetting, shop_worker, mocker
+):
+    shop = await shop_factory(db_conn, version=1)
+    worker_settings.REDIS_QUEUE_TRANSPORT = RedisQueueTransport.STREAM
+    shop_worker.transport = transport_from_settings(
+        Entity.SHOP, worker_settings, worker_redis
+    )
+    shop_worker.redis_pop_timeout = 0.01
+    mocker.patch.object(
+        shop_worker.service, "upsert_many", side_effect=Exception("DB Error")
+    )
+    mocker.patch.object(
+        shop_worker, "dead_letter_many", side_effect=RedisError("Redis Error")
+    )
+    await add_to_stream(
+        worker_redis,
+        dump_to_json(
+            entity_msg(
+                Entity.SHOP, Action.UPDATE, {"version": 2, "shop": {"id": str(shop.id)}}
+            )
+        ),
+        b"invalid",
+    )
+
+    task = asyncio.create_task(shop_worker.consume_and_process_messages())
+    await asyncio.sleep(0.05)
+    shop_worker.stop_consuming()
+    await asyncio.wait_for(task, timeout=1)
+
+    # only the invalid message is acked, the failed one is claimed later
+    assert await worker_redis.xlen(STREAM) == 1
+    assert (await worker_redis.xpending(STREAM, "workers"))["pending"] == 1
+
+
+@pytest.mark.anyio
+async def test_list_transport_weighted_round_robin(worker_redis: Redis):
+    transport = ListTransport(
+        worker_redis, ["rmq-shop-CZ", "rmq-shop-SK"], weights={"rmq-shop-CZ": 2}
+    )
+    await worker_redis.lpush("rmq-shop-CZ", *(f"CZ{i}".encode() for i in range(5)))
+    await worker_redis.lpush("rmq-shop-SK", *(f"SK{i}".encode() for i in range(5)))
+
+    reads = [[msg for _, msg in await transport.read(0, 0.01)] for _ in range(6)]
+    assert reads == [[b"CZ0"], [b"CZ1"], [b"SK0"], [b"CZ2"], [b"CZ3"], [b"SK1"]]
+
+    # Empty queues are skipped
+    await worker_redis.delete("rmq-shop-CZ")
+    assert await transport.read(0, 0.01) == [(None, b"SK2")]
+
+
+@pytest.mark.anyio
+async def test_stream_transport_reads_several_streams(worker_redis: Redis):
+    streams = ["rmq-stream-shop-CZ", "rmq-stream-shop-SK"]
+    transport = StreamTransport(
+        worker_redis,
+        streams,
+        group="workers",
+        consumer="worker-1",
+        claim_min_idle_time=60_000,
+        claim_interval=60,
+    )
+    await transport.setup()
+    for stream in streams:
+        await worker_redis.xadd(stream, {REDIS_STREAM_MSG_FIELD: stream.encode()})
+
+    msgs = await transport.read(10, 0.01)
+    assert sorted(msg for _, msg in msgs) == [stream.encode() for stream in streams]
+
+    await transport.ack([ack_id for ack_id, _ in msgs])
+    for stream in streams:
+        assert await worker_redis.xlen(stream) == 0
+
+
+@pytest.mark.parametrize(
+    "countries, expected",
+    [
+        ([], [f"rmq-shop-{country}" for country in CountryCode] + ["rmq-shop"]),
+        ([CountryCode.CZ, CountryCode.SK], ["rmq-shop-CZ", "rmq-shop-SK"]),
+    ],
+)
+def test_transport_of_country_queues(
+    worker_settings: WorkerSetting,
+    countries: list[CountryCode],
+    expected: list[str],
+    mocker,
+):
+    worker_settings.REDIS_QUEUE_SHARD_BY_COUNTRY = True
+    worker_settings.WORKER_COUNTRIES = countries
+    worker_settings.WORKER_COUNTRY_WEIGHTS = {CountryCode.CZ: 3}
+
+    transport = transport_from_settings(Entity.SHOP, worker_settings, mocker.Mock())
+
+    assert transport.queue_names == expected
+    assert transport.schedule.count("rmq-shop-CZ") == 3
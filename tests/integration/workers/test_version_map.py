@@ -0,0 +1,158 @@
+import pytest
+from redis.asyncio import Redis
+
+from app import crud
+from app.config.settings import WorkerSetting
+from app.constants import Action, Entity
+from app.schemas.availability import AvailabilityMessageSchema
+from app.schemas.shop import ShopMessageSchema
+from app.utils.version_map import VersionMap
+from app.workers.availability import AvailabilityMessageWorker
+from app.workers.shop import ShopMessageWorker
+from tests.factories import shop_factory
+from tests.msg_templator.base import entity_msg
+from tests.utils import (
+    custom_uuid,
+    override_obj_get_db_conn,
+    push_messages_and_process_them_by_worker,
+)
+
+VERSION_MAP = VersionMap(Entity.SHOP)
+
+
+@pytest.fixture
+async def stale_filtering_shop_worker(
+    db_engine, db_conn, worker_settings: WorkerSetting, worker_redis: Redis
+):
+    worker_settings.WORKER_DROP_STALE_VERSIONS = True
+    return override_obj_get_db_conn(
+        db_conn,
+        ShopMessageWorker(
+            Entity.SHOP, worker_settings, db_engine, worker_redis, ShopMessageSchema
+        ),
+    )
+
+
+def shop_msg(action: Action, shop_id, version: int) -> dict:
+    return entity_msg(
+        Entity.SHOP, action, {"version": version, "shop": {"id": str(shop_id)}}
+    )
+
+
+@pytest.mark.anyio
+async def test_version_map_keeps_highest_version(worker_redis: Redis):
+    ids = [custom_uuid(1), custom_uuid(2)]
+    await VERSION_MAP.update(worker_redis, {ids[0]: 3, ids[1]: 1})
+    await VERSION_MAP.update(worker_redis, {ids[0]: 2, ids[1]: 2})
+    assert await VERSION_MAP.get_many(worker_redis, ids) == {ids[0]: 3, ids[1]: 2}
+
+    await VERSION_MAP.remove(worker_redis, [ids[0]])
+    assert await VERSION_MAP.get_many(worker_redis, ids) == {ids[1]: 2}
+
+
+@pytest.mark.anyio
+async def test_version_map_finds_stale_messages(worker_redis: Redis):
+    await VERSION_MAP.update(worker_redis, {custom_uuid(1): 2})
+
+    stale = await VERSION_MAP.find_stale(
+        worker_redis,
+        [
+            (custom_uuid(1), 1, Action.UPDATE),
+            (custom_uuid(1), 2, Action.UPDATE),
+            (custom_uuid(1), 3, Action.UPDATE),
+            (custom_uuid(1), 1, Action.DELETE),
+            (custom_uuid(1), 2, Action.DELETE),
+            (custom_uuid(2), 1, Action.UPDATE),
+        ],
+    )
+    assert stale == [True, True, False, True, False, False]
+
+
+@pytest.mark.anyio
+async def test_worker_updates_version_map(
+    db_conn, worker_redis: Redis, stale_filtering_shop_worker: ShopMessageWorker
+):
+    shop_1 = await shop_factory(db_conn, version=1)
+    shop_2 = await shop_factory(db_conn, version=1)
+
+    await push_messages_and_process_them_by_worker(
+        worker_redis,
+        stale_filtering_shop_worker,
+        shop_msg(Action.UPDATE, shop_1.id, 2),
+        shop_msg(Action.DELETE, shop_2.id, 2),
+    )
+
+    assert await VERSION_MAP.get_many(worker_redis, [shop_1.id, shop_2.id]) == {
+        shop_1.id: 2
+    }
+    assert [shop.id for shop in await crud.shop.get_many(db_conn)] == [shop_1.id]
+
+
+@pytest.mark.anyio
+async def test_worker_drops_stale_messages(
+    db_conn, worker_redis: Redis, stale_filtering_shop_worker: ShopMessageWorker
+):
+    shop = await shop_factory(db_conn, version=1)
+    # Version map is ahead of the DB, so stale messages can't reach it
+    await VERSION_MAP.update(worker_redis, {shop.id: 3})
+
+    await push_messages_and_process_them_by_worker(
+        worker_redis, stale_filtering_shop_worker, shop_msg(Action.UPDATE, shop.id, 3)
+    )
+    assert (await crud.shop.get_many(db_conn))[0].version == 1
+
+    await push_messages_and_process_them_by_worker(
+        worker_redis, stale_filtering_shop_worker, shop_msg(Action.UPDATE, shop.id, 4)
+    )
+    assert (await crud.shop.get_many(db_conn))[0].version == 4
+    assert await VERSION_MAP.get_many(worker_redis, [shop.id]) == {shop.id: 4}
+
+
+@pytest.mark.anyio
+async def test_version_map_expires_after_ttl_from_creation(worker_redis: Redis):
+    version_map = VersionMap(Entity.SHOP, ttl=100)
+    await version_map.update(worker_redis, {custom_uuid(1): 1})
+    await worker_redis.expire(version_map.key, 50)
+
+    # updates don't extend the lifetime of the hash
+    await version_map.update(worker_redis, {custom_uuid(2): 1})
+    assert 0 < await worker_redis.ttl(version_map.key) <= 50
+
+
+def test_version_map_only_of_entities_owning_rows(
+    db_engine, worker_settings: WorkerSetting, worker_redis: Redis
+):
+    with pytest.raises(ValueError):
+        VersionMap(Entity.AVAILABILITY)
+
+    worker_settings.WORKER_DROP_STALE_VERSIONS = True
+    worker = AvailabilityMessageWorker(
+        Entity.AVAILABILITY,
+        worker_settings,
+        db_engine,
+        worker_redis,
+        AvailabilityMessageSchema,
+    )
+    assert worker.version_map is None
+    assert not worker.drop_stale_versions
+
+
+@pytest.mark.anyio
+async def test_forced_update_does_not_drop_stale_messages(
+    db_engine, db_conn, worker_settings: WorkerSetting, worker_redis: Redis
+):
+    worker_settings.WORKER_DROP_STALE_VERSIONS = True
+    worker_settings.FORCE_ENTITY_UPDATE = True
+    worker = override_obj_get_db_conn(
+        db_conn,
+        ShopMessageWorker(
+            Entity.SHOP, worker_settings, db_engine, worker_redis, ShopMessageSchema
+        ),
+    )
+    shop = await shop_factory(db_conn, version=1)
+    await VERSION_MAP.update(worker_redis, {shop.id: 3})
+
+    await push_messages_and_process_them_by_worker(
+        worker_redis, worker, shop_msg(Action.UPDATE, shop.id, 3)
+    )
+    assert (await crud.shop.get_many(db_conn))[0].version == 3
@@ -0,0 +1,56 @@
+import pytest
+from pydantic import ValidationError
+
+from app.config.settings import ConsumerSettings
+from app.consumers.backpressure import BackpressureController
+
+
+@pytest.fixture
+def controller() -> BackpressureController:
+    return BackpressureController(
+        high_watermark=1000,
+        low_watermark=200,
+        min_prefetch_count=10,
+        max_delay_multiplier=5,
+    )
+
+
+@pytest.mark.parametrize(
+    "queue_depth,prefetch_count,max_delay,should_wait",
+    [
+        (0, 200, 1, False),
+        (200, 200, 1, False),
+        (600, 105, 3, False),
+        (1000, 10, 5, True),
+        (5000, 10, 5, True),
+    ],
+)
+def test_backpressure_limits(
+    controller: BackpressureController,
+    queue_depth: int,
+    prefetch_count: int,
+    max_delay: float,
+    should_wait: bool,
+):
+    assert controller.prefetch_count(queue_depth, 200) == prefetch_count
+    assert controller.max_delay(queue_depth, 1) == max_delay
+    assert controller.should_wait(queue_depth) is should_wait
+
+
+def test_backpressure_keeps_lower_prefetch_count(controller: BackpressureController):
+    assert controller.prefetch_count(5000, 5) == 5
+
+
+def test_backpressure_invalid_watermarks():
+    with pytest.raises(ValueError):
+        BackpressureController(100, 200, 10, 5)
+
+
+def test_backpressure_requires_manual_ack():
+    with pytest.raises(ValidationError, match="requires manual ack"):
+        ConsumerSettings(CONSUMER_BACKPRESSURE_HIGH_WATERMARK=1000)
+
+    settings = ConsumerSettings(
+        CONSUMER_BACKPRESSURE_HIGH_WATERMARK=1000, CONSUMER_MANUAL_ACK=True
+    )
+    assert settings.CONSUMER_BACKPRESSURE_HIGH_WATERMARK == 1000
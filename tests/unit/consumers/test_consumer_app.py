@@ -0,0 +1,34 @@
+import pytest
+from pytest_mock import MockFixture
+
+from app import consumer_app
+from app.constants import Entity
+from app.consumers.consumer import Consumer
+
+
+@pytest.mark.anyio
+async def test_run_entity_consumers_share_connections(mocker: MockFixture, monkeypatch):
+    monkeypatch.setenv(
+        "PPS_RABBITMQ_ENTITY_SERVER_MAP", '{"offer": {"rmqHost": "offer-rabbitmq"}}'
+    )
+    connect_mock = mocker.patch.object(consumer_app, "connect_robust")
+    consumers: list[Consumer] = []
+
+    async def run(consumer: Consumer):
+        consumers.append(consumer)
+
+    mocker.patch.object(Consumer, "run", autospec=True, side_effect=run)
+
+    await consumer_app.run_entity_consumers(
+        [Entity.SHOP, Entity.OFFER, Entity.BUYABLE, Entity.SHOP]
+    )
+
+    assert [consumer.entity for consumer in consumers] == [
+        Entity.SHOP,
+        Entity.OFFER,
+        Entity.BUYABLE,
+    ]
+    # Offer is consumed from another server
+    assert connect_mock.await_count == 2
+    assert len({id(consumer.redis) for consumer in consumers}) == 1
+    assert all(not consumer.should_consume for consumer in consumers)
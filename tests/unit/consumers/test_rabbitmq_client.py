@@ -0,0 +1,29 @@
+import pytest
+from pytest_mock import MockFixture
+
+from app.config.settings import ConsumerSettings
+from app.constants import Entity
+from app.consumers.rabbitmq_client import RabbitmqConsumerClient
+
+
+@pytest.fixture
+def consumer_settings() -> ConsumerSettings:
+    settings = ConsumerSettings()
+    settings.RABBITMQ_PREFETCH_COUNT = 5
+    return settings
+
+
+@pytest.mark.anyio
+async def test_client_uses_shared_connection(
+    consumer_settings: ConsumerSettings, mocker: MockFixture
+):
+    connection = mocker.AsyncMock()
+    client = RabbitmqConsumerClient(Entity.SHOP, consumer_settings, connection=connection)
+
+    async with client:
+        connection.channel.assert_awaited_once()
+        client.channel.set_qos.assert_awaited_once_with(prefetch_count=5)
+        client.channel.get_queue.assert_awaited_once_with("op-pps-consumer-shop")
+
+    client.channel.close.assert_awaited_once()
+    connection.close.assert_not_awaited()
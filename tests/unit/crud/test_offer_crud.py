@@ -5,7 +5,7 @@ from sqlalchemy.exc import DBAPIError
 from app import crud
 from app.constants import Aggregate, Entity, ProductPriceType
 from app.custom_types import OfferPk
-from app.schemas.offer import OfferDBSchema
+from app.schemas.offer import OfferCreateSchema, OfferDBSchema
 from tests.factories import offer_factory, shop_factory
 from tests.utils import compare, custom_uuid
 
@@ -152,6 +152,63 @@ async def test_upsert_many(db_conn, offers: list[OfferDBSchema]):
     compare(offers_in[2], offers_in_db[3])
 
 
+@pytest.mark.anyio
+async def test_upsert_many_conditionally(db_conn, offers: list[OfferDBSchema]):
+    """
+    First offer is updated and returned with its previous row, second is older,
+    third is newer with nothing changed and fourth is inserted
+    """
+    await shop_factory(db_conn, shop_id=offers[0].shop_id, certified=True)
+    offers_in = [
+        OfferCreateSchema(
+            **offers[0].model_dump(exclude={"price", "version"}), price=2, version=3
+        ),
+        OfferCreateSchema(
+            **offers[1].model_dump(exclude={"price", "version"}), price=2, version=1
+        ),
+        OfferCreateSchema(**offers[2].model_dump(exclude={"version"}), version=3),
+        await offer_factory(offer_id=custom_uuid(4), product_id=custom_uuid(4)),
+    ]
+
+    upserted = dict(await crud.offer.upsert_many_conditionally(db_conn, offers_in))
+    assert upserted.keys() == {custom_uuid(1), custom_uuid(4)}
+    old_offer = upserted[custom_uuid(1)]
+    assert old_offer is not None
+    assert old_offer.price == 1
+    assert old_offer.certified_shop is True
+    assert upserted[custom_uuid(4)] is None
+
+    offers_in_db = {o.id: o for o in await crud.offer.get_many(db_conn)}
+    assert len(offers_in_db) == 4
+    assert offers_in_db[custom_uuid(1)].price == 2
+    assert offers_in_db[custom_uuid(2)].price == 1
+    assert offers_in_db[custom_uuid(3)].version == 2
+
+    # Forced upsert rewrites not older rows even when nothing changed
+    forced = await crud.offer.upsert_many_conditionally(
+        db_conn, offers_in[2:3], force=True
+    )
+    assert [upserted_id for upserted_id, _ in forced] == [custom_uuid(3)]
+
+
+@pytest.mark.anyio
+async def test_upsert_many_conditionally_older_offer_of_another_product(
+    db_conn, offers: list[OfferDBSchema]
+):
+    """Older offer moved to another product does not insert a second row"""
+    offers_in = [
+        OfferCreateSchema(
+            **offers[0].model_dump(exclude={"product_id", "version"}),
+            product_id=custom_uuid(5),
+            version=1,
+        )
+    ]
+
+    assert await crud.offer.upsert_many_conditionally(db_conn, offers_in) == []
+    offers_in_db = [o for o in await crud.offer.get_many(db_conn) if o.id == offers[0].id]
+    assert [(o.product_id, o.version) for o in offers_in_db] == [(custom_uuid(1), 2)]
+
+
 @pytest.mark.anyio
 async def test_remove_many(db_conn, offers: list[OfferDBSchema]):
     """
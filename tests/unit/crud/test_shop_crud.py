@@ -74,23 +74,19 @@ async def test_delete_shops(db_conn, shops: list[ShopDBSchema]):
 
 
 @pytest.mark.anyio
-async def test_get_product_ids_in_stock(db_conn, shops: list[ShopDBSchema]):
-    offers = [
-        await offer_factory(
-            db_conn, offer_id=custom_uuid(1), shop_id=shops[0].id, in_stock=True
-        ),
-        await offer_factory(
-            db_conn, offer_id=custom_uuid(2), shop_id=shops[0].id, in_stock=True
-        ),
-        await offer_factory(
-            db_conn, offer_id=custom_uuid(3), shop_id=shops[0].id, in_stock=False
-        ),
-        await offer_factory(
-            db_conn, offer_id=custom_uuid(4), shop_id=shops[1].id, in_stock=True
-        ),
-        await offer_factory(db_conn, offer_id=custom_uuid(5), shop_id=shops[1].id),
+async def test_stream_offers_in_stock_for_shops(db_conn, shops: list[ShopDBSchema]):
+    offers_in_stock = [
+        await offer_factory(db_conn, shop_id=shops[i % 2].id, in_stock=True)
+        for i in range(5)
     ]
-    offers_in_stock = await crud.shop.get_offers_in_stock_for_shops(
-        db_conn, [s.id for s in shops]
-    )
-    assert set(offers_in_stock) == {offers[0], offers[1], offers[3]}
+    await offer_factory(db_conn, shop_id=shops[0].id, in_stock=False)
+
+    batches = [
+        batch
+        async for batch in crud.shop.stream_offers_in_stock_for_shops(
+            db_conn, [s.id for s in shops], batch_size=2
+        )
+    ]
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert {o.id for batch in batches for o in batch} == {o.id for o in offers_in_stock}
@@ -0,0 +1,77 @@
+from unittest.mock import AsyncMock
+
+import orjson
+import pytest
+
+from app.config.settings import JobSettings
+from app.jobs.base import BaseJob
+
+
+class DataError(Exception):
+    sqlstate = "22003"
+
+
+class ListJob(BaseJob):
+    """Job reading given batches and failing on negative numbers, then stopping"""
+
+    def __init__(self, batches: list, settings: JobSettings):
+        super().__init__("test-job", AsyncMock(), AsyncMock(), settings)
+        self.batches = iter(batches)
+        self.processed: list[int] = []
+
+    async def read(self) -> list:
+        batch = next(self.batches, None)
+        if batch is None:
+            self.stop()
+            return []
+        if isinstance(batch, Exception):
+            raise batch
+        return batch
+
+    async def process(self, ids: list) -> None:
+        if any(i < 0 for i in ids):
+            raise DataError("numeric field overflow")
+        self.processed.extend(ids)
+
+
+@pytest.fixture
+def job_settings() -> JobSettings:
+    settings = JobSettings()
+    settings.RETRY_BASE_DELAY = 0
+    return settings
+
+
+@pytest.mark.anyio
+async def test_job_keeps_running_and_dead_letters_bad_objects(
+    job_settings: JobSettings,
+):
+    job = ListJob([[1, -2, 3, 4], ConnectionResetError("redis"), [5, -6]], job_settings)
+
+    await job.run()
+
+    assert job.processed == [1, 3, 4, 5]
+    dead_letters = [
+        orjson.loads(item)
+        for call in job.redis.lpush.call_args_list
+        for item in call.args[1:]
+    ]
+    assert [item["data"] for item in dead_letters] == [-2, -6]
+    assert dead_letters[0]["error"] == "numeric field overflow"
+    assert all(
+        call.args[0] == "dead-letter-test-job" for call in job.redis.lpush.call_args_list
+    )
+
+
+@pytest.mark.anyio
+async def test_job_adapts_batch_size(job_settings: JobSettings, mocker):
+    job_settings.JOB_BATCH_SIZE = 4
+    job_settings.JOB_ADAPTIVE_BATCH_SIZE = True
+    job_settings.JOB_ADAPTIVE_MIN_BATCH_SIZE = 2
+    job = ListJob([[1, 2, 3, 4], [5, 6, 7, 8]], job_settings)
+    job.process = mocker.AsyncMock()  # type: ignore[method-assign]
+    durations = iter([0, 0.4, 0, 0.1])
+    mocker.patch("app.jobs.base.perf_counter", side_effect=lambda: next(durations))
+
+    await job.run()
+
+    assert job.buffer_size == 5
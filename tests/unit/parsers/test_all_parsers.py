@@ -190,3 +190,48 @@ def test_parse_uuid5_not_throwing():
     parser = OfferMessageParser(Entity.OFFER, False)
     msg = parser.parse_message_body(b'{"absolute": "gibberish"}')
     assert msg.country_code is None
+
+
+@pytest.mark.parametrize(
+    "parser_class,msg,entity,country_code,entity_id,version", upsert_data, ids=id_fun
+)
+def test_prefilter_msg_body_matches_full_parse(
+    parser_class: ParserT,
+    msg: bytes,
+    entity: Entity,
+    country_code: CountryCode,
+    entity_id: UUID,
+    version: int,
+):
+    msg_schema = parser_class.prefilter_message_body(msg)
+    assert msg_schema == parser_class.parse_message_body(msg)
+    assert msg_schema.country_code == country_code
+
+
+@pytest.mark.parametrize(
+    "parser_class,msg,entity,entity_id,version", delete_data, ids=id_fun
+)
+def test_prefilter_delete_msg_body_matches_full_parse(
+    parser_class: ParserT,
+    msg: bytes,
+    entity: Entity,
+    entity_id: UUID,
+    version: int,
+):
+    assert parser_class.prefilter_message_body(msg) == parser_class.parse_message_body(
+        msg
+    )
+
+
+@pytest.mark.parametrize(
+    "msg",
+    [
+        b'{"absolute": "gibberish"}',
+        b'{"action": "update", "legacy": {"countryCode": null}}',
+        b'{"action": "update", "legacy": {"countryCode": "CZ"}, '
+        b'"other": {"countryCode": "SK"}}',
+    ],
+)
+def test_prefilter_msg_body_falls_back_to_full_parse(msg: bytes):
+    parser = OfferMessageParser(Entity.OFFER, False)
+    assert parser.prefilter_message_body(msg) == parser.parse_message_body(msg)
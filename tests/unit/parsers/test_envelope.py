@@ -0,0 +1,91 @@
+import orjson
+import pytest
+
+from app.constants import Action, Entity
+from app.exceptions import WorkerFailedParseMsgError
+from app.parsers.envelope import ENVELOPE_HEADER, ENVELOPE_MAGIC, EnvelopeCodec
+from app.workers import WORKER_CLASS_MAP
+from tests.msg_templator.base import entity_msg
+from tests.utils import custom_uuid
+
+
+@pytest.fixture
+async def entity_worker(worker_settings, entity: Entity, mocker):
+    worker_class, message_schema = WORKER_CLASS_MAP[entity]
+    return worker_class(
+        entity, worker_settings, mocker.AsyncMock(), mocker.AsyncMock(), message_schema
+    )
+
+
+def entity_msgs(entity: Entity, action: Action, count: int) -> list[bytes]:
+    return [
+        entity_msg(
+            entity,
+            action,
+            (
+                {"version": i, "id": custom_uuid(i), "offerId": custom_uuid(i)}
+                if entity != Entity.SHOP
+                else {"version": i, "shop": {"id": custom_uuid(i)}}
+            ),
+            to_bytes=True,
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+@pytest.mark.parametrize("batch", [False, True])
+@pytest.mark.parametrize("action", [Action.UPDATE, Action.DELETE])
+@pytest.mark.parametrize("entity", list(Entity))
+@pytest.mark.anyio
+async def test_envelope_messages_match_legacy_messages(
+    entity_worker, entity: Entity, action: Action, batch: bool
+):
+    msg_bodies = entity_msgs(entity, action, 3)
+    envelopes = EnvelopeCodec(entity).encode(msg_bodies, batch=batch)
+    assert len(envelopes) == (1 if batch else 3)
+    assert sum(map(len, envelopes)) < sum(map(len, msg_bodies))
+
+    messages = [
+        msg for env in envelopes for msg in entity_worker.parse_redis_messages(env)
+    ]
+    legacy_messages = [entity_worker.parse_redis_message(body) for body in msg_bodies]
+
+    assert [(m.identifier, m.version, m.action) for m in messages] == [
+        (m.identifier, m.version, m.action) for m in legacy_messages
+    ]
+    if action == Action.UPDATE:
+        create_schemas = entity_worker.to_create_schemas(
+            entity_worker.to_message_schemas(messages)
+        )
+        assert len(create_schemas) == 3
+        assert create_schemas == entity_worker.to_create_schemas(
+            entity_worker.to_message_schemas(legacy_messages)
+        )
+
+
+def test_envelope_keeps_missing_and_null_fields():
+    codec = EnvelopeCodec(Entity.OFFER)
+    msg = {"action": "update", "version": 1, "id": None, "legacy": {}}
+    (envelope,) = codec.encode([orjson.dumps(msg)])
+    assert codec.decode(envelope) == [{"action": "update", "version": 1, "id": None}]
+
+
+def test_envelope_passes_invalid_messages():
+    codec = EnvelopeCodec(Entity.OFFER)
+    assert codec.encode([b"invalid", b"[1]"], batch=True) == [b"invalid", b"[1]"]
+
+
+@pytest.mark.parametrize(
+    "envelope",
+    [
+        bytes([ENVELOPE_MAGIC]),
+        ENVELOPE_HEADER.pack(ENVELOPE_MAGIC, 255, 0) + b"[]",
+        ENVELOPE_HEADER.pack(ENVELOPE_MAGIC, 1, 1) + b"not compressed",
+        ENVELOPE_HEADER.pack(ENVELOPE_MAGIC, 1, 0) + b"[1]",
+    ],
+)
+@pytest.mark.parametrize("entity", [Entity.OFFER])
+@pytest.mark.anyio
+async def test_invalid_envelope(entity_worker, envelope: bytes):
+    with pytest.raises(WorkerFailedParseMsgError):
+        entity_worker.parse_redis_messages(envelope)
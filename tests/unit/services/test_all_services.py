@@ -45,3 +45,17 @@ async def test_should_be_updated_with_forced_update(
         metrics.assert_called_once_with(update_type="forced", entity=entity)
     else:
         metrics.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "service_class, cached",
+    [
+        (OfferService, True),
+        (ShopService, True),
+        (AvailabilityService, False),
+        (BuyableService, False),
+    ],
+)
+def test_entity_cache_only_of_entities_owning_rows(service_class, cached, monkeypatch):
+    monkeypatch.setenv("PPS_SERVICE_ENTITY_CACHE", "true")
+    assert (service_class().cache is not None) is cached
@@ -1,6 +1,13 @@
+from unittest.mock import AsyncMock
+
 import pytest
 
+from app.config.settings import JobSettings
+from app.constants import PRICE_EVENT_QUEUE
+from app.jobs.price_event import PriceEventJob
 from app.services.base import BaseEntityService
+from app.utils.price_event_codec import PriceEventCodec
+from tests.factories import price_event_factory
 from tests.utils import custom_uuid
 
 
@@ -28,3 +35,15 @@ async def test_get_many_by_ids_calls_crud_get_in(base_message_service, mocker):
         db_conn_mock, [custom_uuid(0), custom_uuid(1)]
     )
     mock_crud.assert_called_once_with(db_conn_mock, [custom_uuid(0), custom_uuid(1)])
+
+
+@pytest.mark.anyio
+async def test_send_price_events_in_binary_chunks(base_message_service, redis):
+    base_message_service.price_event_codec = PriceEventCodec(binary=True)
+    base_message_service.price_event_push_chunk_size = 2
+    events = [price_event_factory(product_id=custom_uuid(i)) for i in range(5)]
+
+    await base_message_service.send_price_events(redis, events)
+
+    job = PriceEventJob(PRICE_EVENT_QUEUE, AsyncMock(), redis, JobSettings())
+    assert sorted(await job.read(), key=lambda e: e.product_id) == events
@@ -6,7 +6,7 @@ from app.constants import CountryCode, CurrencyCode, ProductPriceType
 from app.schemas.offer import OfferCreateSchema, OfferDBSchema
 from app.schemas.price_event import PriceEventAction
 from app.services import OfferService
-from tests.factories import offer_factory
+from tests.factories import offer_factory, shop_factory
 from tests.utils import custom_uuid
 
 
@@ -102,19 +102,39 @@ async def test_generate_price_event_upsert(
 
     new_offers_msgs = [
         await offer_factory(
-            offer_id=custom_uuid(1), product_id=custom_uuid(1), price=2, version=3
+            offer_id=custom_uuid(1),
+            product_id=custom_uuid(1),
+            shop_id=offers[0].shop_id,
+            price=2,
+            version=3,
         ),
         await offer_factory(
-            offer_id=custom_uuid(2), product_id=custom_uuid(2), price=2, version=3
+            offer_id=custom_uuid(2),
+            product_id=custom_uuid(2),
+            shop_id=offers[1].shop_id,
+            price=2,
+            version=3,
         ),
         await offer_factory(
-            offer_id=custom_uuid(3), product_id=custom_uuid(3), price=2, version=3
+            offer_id=custom_uuid(3),
+            product_id=custom_uuid(3),
+            shop_id=offers[2].shop_id,
+            price=2,
+            version=3,
         ),
         await offer_factory(
-            offer_id=custom_uuid(4), product_id=custom_uuid(4), price=2, version=3
+            offer_id=custom_uuid(4),
+            product_id=custom_uuid(4),
+            shop_id=offers[3].shop_id,
+            price=2,
+            version=3,
         ),
         await offer_factory(
-            offer_id=custom_uuid(5), product_id=custom_uuid(5), price=2, version=1
+            offer_id=custom_uuid(5),
+            product_id=custom_uuid(5),
+            shop_id=offers[4].shop_id,
+            price=2,
+            version=1,
         ),
         await offer_factory(
             offer_id=custom_uuid(99), product_id=custom_uuid(6), price=2, version=3
@@ -265,7 +285,11 @@ async def test_generate_price_event_product_id_changed(
 
     offers_msgs = [
         await offer_factory(
-            offer_id=custom_uuid(2), product_id=custom_uuid(3), price=2, version=3
+            offer_id=custom_uuid(2),
+            product_id=custom_uuid(3),
+            shop_id=offers[1].shop_id,
+            price=2,
+            version=3,
         )
     ]
     await offer_service.upsert_many(db_conn_mock, redis_mock, offers_msgs)
@@ -291,6 +315,144 @@ async def test_generate_price_event_product_id_changed(
     assert events[3].action == PriceEventAction.DELETE
 
 
+@pytest.mark.anyio
+@freeze_time("2024-04-26")
+@pytest.mark.parametrize(
+    "changes, new_shop_certified, expected_events",
+    [
+        ({"version": 3}, False, []),
+        ({"shop_id": custom_uuid(9)}, True, []),
+        (
+            {"price": 2},
+            True,
+            [
+                (ProductPriceType.ALL_OFFERS, PriceEventAction.UPSERT, 1),
+                (ProductPriceType.IN_STOCK, PriceEventAction.UPSERT, 1),
+                (ProductPriceType.IN_STOCK_CERTIFIED, PriceEventAction.UPSERT, 1),
+            ],
+        ),
+        (
+            {"currency_code": CurrencyCode.EUR},
+            True,
+            [
+                (ProductPriceType.ALL_OFFERS, PriceEventAction.UPSERT, 1),
+                (ProductPriceType.IN_STOCK, PriceEventAction.UPSERT, 1),
+                (ProductPriceType.IN_STOCK_CERTIFIED, PriceEventAction.UPSERT, 1),
+            ],
+        ),
+        (
+            {"shop_id": custom_uuid(9)},
+            False,
+            [(ProductPriceType.IN_STOCK_CERTIFIED, PriceEventAction.DELETE, None)],
+        ),
+        (
+            {"shop_id": custom_uuid(9), "price": 2},
+            False,
+            [
+                (ProductPriceType.ALL_OFFERS, PriceEventAction.UPSERT, 1),
+                (ProductPriceType.IN_STOCK, PriceEventAction.UPSERT, 1),
+                (ProductPriceType.IN_STOCK_CERTIFIED, PriceEventAction.DELETE, None),
+            ],
+        ),
+    ],
+)
+async def test_generate_price_events_for_updated_only_changes(
+    changes,
+    new_shop_certified,
+    expected_events,
+    offer_service: OfferService,
+    offers: list[OfferDBSchema],
+    mocker,
+):
+    """Only events of changed prices and price types of the offer are generated"""
+    orig_offer = offers[3].model_copy(update={"currency_code": CurrencyCode.CZK})
+    get_certified_shops_mock = mocker.patch.object(offer_service, "get_certified_shops")
+    get_certified_shops_mock.return_value = {custom_uuid(9): new_shop_certified}
+    new_offer = OfferCreateSchema(**{**orig_offer.model_dump(), **changes})
+
+    events = await offer_service.generate_price_events_for_updated(
+        mocker.AsyncMock(), orig_offer, new_offer
+    )
+
+    assert [(e.type, e.action, e.old_price) for e in events] == expected_events
+    assert get_certified_shops_mock.called is ("shop_id" in changes)
+
+
+@pytest.mark.anyio
+@freeze_time("2024-04-26")
+async def test_generate_price_events_for_updated_shop_to_certified(
+    offer_service: OfferService, offers: list[OfferDBSchema], mocker
+):
+    orig_offer = offers[1]
+    new_offer = OfferCreateSchema(
+        **{**orig_offer.model_dump(), "shop_id": custom_uuid(9)}
+    )
+
+    events = await offer_service.generate_price_events_for_updated(
+        mocker.AsyncMock(), orig_offer, new_offer, {custom_uuid(9): True}
+    )
+
+    assert [(e.type, e.action, e.price) for e in events] == [
+        (ProductPriceType.IN_STOCK_CERTIFIED, PriceEventAction.UPSERT, 1)
+    ]
+
+
+@pytest.mark.anyio
+async def test_send_price_events_for_changes_reads_shops_at_once(
+    db_conn, offer_service: OfferService, offers: list[OfferDBSchema], mocker
+):
+    certified_shop = await shop_factory(db_conn, certified=True)
+    other_shop = await shop_factory(db_conn, certified=False)
+    orig_offers = [o for o in offers if o.in_stock][:2]
+    changes = [
+        (orig_offer, OfferCreateSchema(**{**orig_offer.model_dump(), "shop_id": shop.id}))
+        for orig_offer, shop in zip(orig_offers, [certified_shop, other_shop])
+    ]
+    get_in = mocker.spy(crud.shop, "get_in")
+    send_price_events = mocker.patch.object(offer_service, "send_price_events")
+
+    await offer_service.send_price_events_for_changes(
+        db_conn, mocker.AsyncMock(), changes
+    )
+
+    get_in.assert_called_once()
+    assert set(get_in.call_args.args[1]) == {certified_shop.id, other_shop.id}
+    [(_redis, events)] = [call.args for call in send_price_events.await_args_list]
+    assert [(e.type, e.action) for e in events] == [
+        (ProductPriceType.IN_STOCK_CERTIFIED, PriceEventAction.UPSERT)
+    ]
+
+
+@pytest.mark.anyio
+async def test_upsert_many_conditionally(db_conn, offer_service: OfferService, mocker):
+    offer = await offer_factory(db_conn, price=1, version=2, in_stock=True)
+    unchanged = await offer_factory(db_conn, version=2)
+    offer_service.conditional_upsert = True
+    crud_get_in_spy = mocker.spy(crud.offer, "get_in")
+    send_price_events_mock = mocker.patch.object(offer_service, "send_price_events")
+
+    new_offers_msgs = [
+        OfferCreateSchema(
+            **offer.model_dump(exclude={"price", "version"}), price=2, version=3
+        ),
+        OfferCreateSchema(**unchanged.model_dump(exclude={"version"}), version=3),
+        await offer_factory(offer_id=custom_uuid(99)),
+    ]
+    updated_ids = await offer_service.upsert_many(
+        db_conn, mocker.AsyncMock(), new_offers_msgs
+    )
+
+    assert set(updated_ids) == {offer.id, custom_uuid(99)}
+    crud_get_in_spy.assert_not_called()
+    events = send_price_events_mock.call_args.args[1]
+    assert len(events) == 3
+    assert {(e.product_id, e.type, e.old_price) for e in events} == {
+        (offer.product_id, ProductPriceType.ALL_OFFERS, 1),
+        (offer.product_id, ProductPriceType.IN_STOCK, 1),
+        (new_offers_msgs[2].product_id, ProductPriceType.ALL_OFFERS, None),
+    }
+
+
 @pytest.mark.anyio
 @pytest.mark.parametrize(
     "column, old_value_in_db, new_value_in_msg",
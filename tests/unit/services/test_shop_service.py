@@ -4,7 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncConnection
 from app import crud
 from app.constants import CountryCode, ProductPriceType
 from app.schemas.offer import OfferDBSchema
-from app.schemas.price_event import PriceEventAction
+from app.schemas.price_event import PriceEvent, PriceEventAction
 from app.schemas.shop import ShopCreateSchema, ShopDBSchema
 from app.services import ShopService
 from tests.factories import offer_factory, shop_factory
@@ -86,12 +86,28 @@ async def offers(shops: list[ShopDBSchema]) -> list[OfferDBSchema]:
     ]
 
 
+def mock_stream_offers_in_stock(mocker, offers: list[OfferDBSchema]):
+    async def stream_offers(_db_conn, shop_ids, batch_size):
+        offers_in_stock = [o for o in offers if o.shop_id in shop_ids]
+        for i in range(0, len(offers_in_stock), batch_size):
+            yield offers_in_stock[i : i + batch_size]
+
+    return mocker.patch.object(
+        crud.shop, "stream_offers_in_stock_for_shops", side_effect=stream_offers
+    )
+
+
+def sent_events(send_price_events_mock) -> list[PriceEvent]:
+    return [e for call in send_price_events_mock.call_args_list for e in call.args[1]]
+
+
 @pytest.mark.anyio
 async def test_upsert_many(shop_service: ShopService, shops: list[ShopDBSchema], mocker):
     crud_get_in_mock = mocker.patch.object(crud.shop, "get_in")
     crud_get_in_mock.return_value = shops
     crud_upsert_mock = mocker.patch.object(crud.shop, "upsert_many")
     crud_upsert_mock.side_effect = lambda _db_conn, entities: [e.id for e in entities]
+    mock_stream_offers_in_stock(mocker, [])
 
     new_shop_msgs = [
         await shop_factory(
@@ -192,12 +208,7 @@ async def test_generate_price_event_upsert(
 ):
     crud_get_in_mock = mocker.patch.object(crud.shop, "get_in")
     crud_get_in_mock.return_value = shops
-    crud_get_offers_in_stock = mocker.patch.object(
-        crud.shop, "get_offers_in_stock_for_shops"
-    )
-    crud_get_offers_in_stock.side_effect = lambda _db_conn, shop_ids: [
-        o for o in offers if o.shop_id in shop_ids
-    ]
+    mock_stream_offers_in_stock(mocker, offers)
     mocker.patch.object(crud.shop, "upsert_many")
     send_price_events_mock = mocker.patch.object(shop_service, "send_price_events")
     db_conn_mock = mocker.AsyncMock()
@@ -218,7 +229,7 @@ async def test_generate_price_event_upsert(
         await shop_factory(shop_id=custom_uuid(99), certified=True, version=3),
     ]
     await shop_service.upsert_many(db_conn_mock, redis_mock, new_shops_msgs)
-    events = send_price_events_mock.call_args.args[1]
+    events = sent_events(send_price_events_mock)
     assert len(events) == 4
 
     # first message - certified shop changed to True
@@ -262,12 +273,7 @@ async def test_generate_price_event_delete(
 ):
     crud_get_in_mock = mocker.patch.object(crud.shop, "get_in")
     crud_get_in_mock.return_value = shops
-    crud_get_offers_in_stock = mocker.patch.object(
-        crud.shop, "get_offers_in_stock_for_shops"
-    )
-    crud_get_offers_in_stock.side_effect = lambda _db_conn, shop_ids: [
-        o for o in offers if o.shop_id in shop_ids
-    ]
+    mock_stream_offers_in_stock(mocker, offers)
     crud_delete_mock = mocker.patch.object(crud.shop, "remove_many")
     crud_delete_mock.side_effect = lambda _db_conn, ids_versions: [
         idv[0] for idv in ids_versions
@@ -278,7 +284,7 @@ async def test_generate_price_event_delete(
 
     to_delete = [(custom_uuid(2), 3), (custom_uuid(3), 3)]
     await shop_service.remove_many(db_conn_mock, redis_mock, to_delete)
-    events = send_price_events_mock.call_args.args[1]
+    events = sent_events(send_price_events_mock)
     assert len(events) == 2
 
     # first message - deleted shop was not certified, do not generate anything
@@ -296,3 +302,83 @@ async def test_generate_price_event_delete(
     assert events[1].action == PriceEventAction.DELETE
     assert events[1].price == 60.0
     assert events[1].old_price is None
+
+
+@pytest.mark.anyio
+async def test_shop_price_events_are_fanned_out_in_batches(
+    shop_service: ShopService,
+    shops: list[ShopDBSchema],
+    offers: list[OfferDBSchema],
+    mocker,
+):
+    mocker.patch.object(crud.shop, "get_in", return_value=shops)
+    mocker.patch.object(crud.shop, "upsert_many")
+    stream_mock = mock_stream_offers_in_stock(mocker, offers)
+    send_price_events_mock = mocker.patch.object(shop_service, "send_price_events")
+    shop_service.fan_out_batch_size = 3
+
+    new_shops_msgs = [
+        await shop_factory(shop_id=custom_uuid(1), certified=True, version=3),
+        await shop_factory(shop_id=custom_uuid(2), certified=True, version=3),
+    ]
+    await shop_service.upsert_many(mocker.AsyncMock(), mocker.AsyncMock(), new_shops_msgs)
+
+    # Offers of both shops are read at once and sent in chunks of the batch size
+    stream_mock.assert_called_once()
+    assert stream_mock.call_args.args[1:] == ([custom_uuid(1), custom_uuid(2)], 3)
+    assert [len(call.args[1]) for call in send_price_events_mock.call_args_list] == [3, 1]
+    assert {e.product_id for e in sent_events(send_price_events_mock)} == {
+        custom_uuid(i) for i in range(1, 5)
+    }
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "orig_certified, new_certified, expected_action",
+    [
+        (None, True, PriceEventAction.UPSERT),
+        (False, True, PriceEventAction.UPSERT),
+        (True, False, PriceEventAction.DELETE),
+        (True, None, PriceEventAction.DELETE),
+        (True, True, None),
+    ],
+)
+async def test_generate_price_events_of_one_shop(
+    orig_certified,
+    new_certified,
+    expected_action,
+    shop_service: ShopService,
+    shops: list[ShopDBSchema],
+    offers: list[OfferDBSchema],
+    mocker,
+):
+    mock_stream_offers_in_stock(mocker, offers)
+    orig_shop = (
+        None
+        if orig_certified is None
+        else shops[0].model_copy(update={"certified": orig_certified})
+    )
+    new_shop = (
+        None
+        if new_certified is None
+        else ShopCreateSchema(**{**shops[0].model_dump(), "certified": new_certified})
+    )
+    db_conn_mock = mocker.AsyncMock()
+
+    if orig_shop is None:
+        events = await shop_service.generate_price_events_for_new(db_conn_mock, new_shop)
+    elif new_shop is None:
+        events = await shop_service.generate_price_events_for_delete(
+            db_conn_mock, orig_shop
+        )
+    else:
+        events = await shop_service.generate_price_events_for_updated(
+            db_conn_mock, orig_shop, new_shop
+        )
+
+    expected = (
+        []
+        if expected_action is None
+        else [(custom_uuid(1), expected_action), (custom_uuid(2), expected_action)]
+    )
+    assert [(e.product_id, e.action) for e in events] == expected
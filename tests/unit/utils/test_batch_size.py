@@ -0,0 +1,42 @@
+from prometheus_client import Gauge
+
+from app.utils.batch_size import AdaptiveBatchSize
+
+GAUGE = Gauge("test_adaptive_batch_size", "Test batch size")
+
+
+def test_batch_size_grows_while_latency_per_item_falls():
+    batch_size = AdaptiveBatchSize(100, 10, 200, max_latency=1, gauge=GAUGE)
+
+    batch_size.record_batch(100, 0.1)
+    assert batch_size.size == 100
+    batch_size.record_batch(100, 0.1)
+    assert batch_size.size == 125
+    batch_size.record_batch(125, 0.1)
+    assert batch_size.size == 156
+    # Latency per item grows, the size is kept
+    batch_size.record_batch(156, 0.5)
+    assert batch_size.size == 156
+    # Partial batches don't change the size
+    batch_size.record_batch(20, 0.001)
+    assert batch_size.size == 156
+
+    batch_size.record_batch(156, 0.2)
+    batch_size.record_batch(200, 0.2)
+    assert batch_size.size == 200
+    assert GAUGE._value.get() == 200
+
+
+def test_batch_size_shrinks_on_latency_errors_and_age():
+    batch_size = AdaptiveBatchSize(100, 10, 200, max_latency=1, max_age=0.5)
+
+    batch_size.record_batch(100, 2)
+    assert batch_size.size == 50
+    batch_size.record_error()
+    assert batch_size.size == 25
+    batch_size.record_age(0.1)
+    assert batch_size.size == 25
+    batch_size.record_age(1)
+    assert batch_size.size == 12
+    batch_size.record_error()
+    assert batch_size.size == 10
@@ -0,0 +1,18 @@
+from app.utils.bloom_filter import BloomFilter
+from tests.utils import custom_uuid
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [custom_uuid(i).bytes for i in range(1000)]
+    bloom.add_many(keys)
+
+    assert all(key in bloom for key in keys)
+
+
+def test_bloom_filter_false_positive_rate():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    bloom.add_many(custom_uuid(i).bytes for i in range(1000))
+
+    false_positives = sum(custom_uuid(i).bytes in bloom for i in range(1000, 11000))
+    assert false_positives < 200
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+from app.utils.entity_cache import EntityCache
+from tests.utils import custom_uuid
+
+
+def test_entity_cache_evicts_least_recently_used():
+    cache = EntityCache(max_size=2)
+    cache.set(custom_uuid(1), 1, 11)
+    cache.set(custom_uuid(2), 2, 22)
+    assert cache.get(custom_uuid(1)) == (1, 11)
+
+    cache.set(custom_uuid(3), 3, 33)
+
+    assert len(cache) == 2
+    assert cache.get(custom_uuid(2)) is None
+    assert cache.get(custom_uuid(1)) == (1, 11)
+    assert cache.get(custom_uuid(3)) == (3, 33)
+
+
+def test_entity_cache_discards_entities():
+    cache = EntityCache(max_size=10)
+    cache.set(custom_uuid(1), 1, 11)
+    cache.set(custom_uuid(1), 2, 12)
+
+    assert cache.get(custom_uuid(1)) == (2, 12)
+    cache.discard([custom_uuid(1), custom_uuid(2)])
+    assert cache.get(custom_uuid(1)) is None
+
+
+def test_entity_cache_fingerprint_is_stable_across_processes():
+    fingerprint_code = (
+        "from app.utils.entity_cache import EntityCache;"
+        "from types import SimpleNamespace;"
+        "print(EntityCache.fingerprint(SimpleNamespace(name='shop', price=1.5),"
+        " ['name', 'price']))"
+    )
+    fingerprints = {
+        subprocess.run(
+            [sys.executable, "-c", fingerprint_code],
+            env={**os.environ, "PYTHONHASHSEED": seed},
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+        for seed in ("1", "2")
+    }
+
+    entity = SimpleNamespace(name="shop", price=1.5)
+    assert fingerprints == {str(EntityCache.fingerprint(entity, ["name", "price"]))}
+    assert EntityCache.fingerprint(entity, ["name", "price"]) != (
+        EntityCache.fingerprint(SimpleNamespace(name="shop", price=2), ["name", "price"])
+    )
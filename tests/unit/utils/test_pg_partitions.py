@@ -0,0 +1,26 @@
+import pytest
+from sqlalchemy import text
+
+from app.utils.pg_partitions import OFFER_HASH_PARTITIONS, get_offer_partition
+from tests.utils import random_one_id
+
+
+@pytest.mark.anyio
+async def test_offer_partition_matches_postgres(db_conn):
+    keys = [(random_one_id(), random_one_id()) for _ in range(50)]
+
+    for product_id, offer_id in keys:
+        satisfies = await db_conn.scalar(
+            text(
+                "SELECT satisfies_hash_partition("
+                "'offers'::regclass, :modulus, :remainder, "
+                "CAST(:product_id AS uuid), CAST(:offer_id AS uuid))"
+            ),
+            {
+                "modulus": OFFER_HASH_PARTITIONS,
+                "remainder": get_offer_partition(product_id, offer_id),
+                "product_id": product_id,
+                "offer_id": offer_id,
+            },
+        )
+        assert satisfies
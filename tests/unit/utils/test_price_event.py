@@ -0,0 +1,99 @@
+import pytest
+
+from app import crud
+from app.constants import Aggregate, ProductPriceType
+from app.schemas.price_event import PriceEventAction
+from app.services.event_processing import EventProcessingService
+from app.utils.price_event import coalesce_price_events
+from tests.factories import price_event_factory, product_price_factory
+from tests.utils import custom_uuid
+
+UPSERT = PriceEventAction.UPSERT
+DELETE = PriceEventAction.DELETE
+
+
+def event(action: PriceEventAction, price: float, old_price: float | None = None, i=1):
+    return price_event_factory(
+        action=action,
+        price=price,
+        old_price=old_price,
+        product_id=custom_uuid(i),
+        price_type=ProductPriceType.IN_STOCK,
+    )
+
+
+def test_coalesce_keeps_lowest_and_highest_new_and_deleted_prices():
+    events = [
+        event(UPSERT, 5),
+        event(UPSERT, 3),
+        event(DELETE, 4),
+        event(UPSERT, 9),
+        event(UPSERT, 3),
+        event(DELETE, 6),
+        event(DELETE, 5),
+        event(UPSERT, 7),
+        event(UPSERT, 7, i=2),
+    ]
+
+    assert coalesce_price_events(events) == [
+        events[1],
+        events[2],
+        events[3],
+        events[5],
+        events[8],
+    ]
+
+
+def test_coalesce_only_deduplicates_replaced_prices():
+    events = [
+        event(UPSERT, 7, old_price=5),
+        event(UPSERT, 8, old_price=6),
+        event(UPSERT, 7, old_price=5),
+        event(UPSERT, 6),
+    ]
+
+    assert coalesce_price_events(events) == [events[0], events[1], events[3]]
+
+
+@pytest.mark.anyio
+async def test_coalesced_events_result_in_the_same_prices(mocker):
+    # Offers in the DB after the events, the product price is min 4 and max 8 before
+    mocker.patch.object(
+        crud.offer,
+        "get_price_for_product",
+        side_effect=lambda _db_conn, _product_id, _type, aggregate: (
+            2 if aggregate == Aggregate.MIN else 10
+        ),
+    )
+    product_price = await product_price_factory(
+        db_schema=True,
+        product_id=custom_uuid(1),
+        price_type=ProductPriceType.IN_STOCK,
+        min_price=4,
+        max_price=8,
+    )
+    events = [
+        event(UPSERT, 3),
+        event(DELETE, 4),
+        event(UPSERT, 6),
+        event(UPSERT, 10, old_price=8),
+        event(DELETE, 5),
+        event(UPSERT, 2),
+        event(UPSERT, 5, old_price=7),
+        event(DELETE, 8),
+    ]
+
+    results = [
+        await EventProcessingService().process_events_bulk(
+            mocker.AsyncMock(),
+            processed_events,
+            {(custom_uuid(1), ProductPriceType.IN_STOCK): product_price},
+        )
+        for processed_events in (events, coalesce_price_events(events))
+    ]
+
+    assert len(coalesce_price_events(events)) < len(events)
+    assert [
+        [(p.min_price, p.max_price) for p in result.upserted] for result in results
+    ] == [[(2, 10)], [(2, 10)]]
+    assert results[0].deletes == results[1].deletes
@@ -0,0 +1,78 @@
+import pytest
+
+from app.constants import CountryCode, CurrencyCode, ProductPriceType
+from app.schemas.price_event import PriceEventAction
+from app.utils import dump_to_json
+from app.utils.price_event_codec import (
+    PRICE_EVENT_ENUMS,
+    PRICE_EVENT_LAYOUTS,
+    PriceEventCodec,
+)
+from tests.factories import price_event_factory
+from tests.utils import custom_uuid
+
+
+def test_price_event_binary_round_trip():
+    events = [
+        price_event_factory(price=12.34, old_price=9999999999.99),
+        price_event_factory(
+            action=PriceEventAction.DELETE,
+            price_type=ProductPriceType.IN_STOCK_CERTIFIED,
+            product_id=custom_uuid(1),
+        ),
+    ]
+    events[1].price = None
+
+    encoded = PriceEventCodec().encode_many(events)
+
+    assert all(len(data) == PRICE_EVENT_LAYOUTS[1].size for data in encoded)
+    assert all(len(data) < len(dump_to_json(e)) / 4 for data, e in zip(encoded, events))
+    assert PriceEventCodec.decode_many(encoded) == events
+
+
+def test_price_event_json_is_still_decoded():
+    event = price_event_factory(price=10, old_price=5)
+    json_codec = PriceEventCodec(binary=False)
+
+    assert PriceEventCodec.decode_many(
+        [json_codec.encode(event), PriceEventCodec().encode(event)]
+    ) == [event, event]
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"\x09" + bytes(PRICE_EVENT_LAYOUTS[1].size - 1),
+        b"\x01" + bytes(10),
+        b"\x01" + b"\xff" * (PRICE_EVENT_LAYOUTS[1].size - 1),
+    ],
+)
+def test_price_event_invalid_binary(data: bytes):
+    with pytest.raises(ValueError):
+        PriceEventCodec.decode(data)
+
+
+@pytest.mark.parametrize(
+    "member, code",
+    [
+        (ProductPriceType.ALL_OFFERS, 0),
+        (ProductPriceType.IN_STOCK_CERTIFIED, 3),
+        (PriceEventAction.DELETE, 1),
+        (CountryCode.BA, 0),
+        (CountryCode.CZ, 3),
+        (CountryCode.SK, 8),
+        (CurrencyCode.BAM, 0),
+        (CurrencyCode.CZK, 4),
+        (CurrencyCode.RSD, 7),
+    ],
+)
+def test_price_event_codes_of_version_1(member, code):
+    """Codes of events already in the queue must not change"""
+    assert PriceEventCodec(version=1).codes[type(member)][member] == code
+
+
+def test_price_event_codes_cover_all_enum_members():
+    for enum, members in PRICE_EVENT_ENUMS[1].items():
+        assert set(members) == set(enum)
+        assert len(members) == len(set(members))
@@ -0,0 +1,97 @@
+import pytest
+
+from app.utils.retry import (
+    RetryPolicy,
+    bisect_data_errors,
+    is_data_error,
+    is_transient_error,
+    retry_transient,
+)
+
+NO_DELAY = RetryPolicy(attempts=3, base_delay=0, max_delay=0)
+
+
+class PgError(Exception):
+    def __init__(self, sqlstate: str):
+        super().__init__(sqlstate)
+        self.sqlstate = sqlstate
+
+
+def test_errors_are_classified_by_sqlstate():
+    assert is_transient_error(PgError("40P01"))
+    assert is_transient_error(PgError("40001"))
+    assert is_transient_error(ConnectionResetError())
+    assert not is_transient_error(PgError("22003"))
+    assert is_data_error(PgError("22003"))
+    assert is_data_error(PgError("23502"))
+    assert not is_data_error(ValueError())
+
+
+@pytest.mark.anyio
+async def test_retry_transient_retries_transient_errors_only():
+    calls = []
+
+    async def deadlocked_once():
+        calls.append(1)
+        if len(calls) == 1:
+            raise PgError("40P01")
+        return "done"
+
+    assert await retry_transient(deadlocked_once, NO_DELAY) == "done"
+    assert len(calls) == 2
+
+    async def always_deadlocked():
+        calls.append(1)
+        raise PgError("40P01")
+
+    calls.clear()
+    with pytest.raises(PgError):
+        await retry_transient(always_deadlocked, NO_DELAY)
+    assert len(calls) == 3
+
+    async def bad_data():
+        calls.append(1)
+        raise PgError("22003")
+
+    calls.clear()
+    with pytest.raises(PgError):
+        await retry_transient(bad_data, NO_DELAY)
+    assert len(calls) == 1
+
+
+@pytest.mark.anyio
+async def test_bisect_data_errors_isolates_bad_items():
+    calls = []
+    bad_items = []
+
+    async def process(items: list[int]) -> list[int]:
+        calls.append(items)
+        if {3, 6} & set(items):
+            raise PgError("22003")
+        return items
+
+    async def on_bad_item(item: int, exc: Exception):
+        bad_items.append(item)
+
+    assert await bisect_data_errors(list(range(8)), process, on_bad_item) == [
+        0,
+        1,
+        2,
+        4,
+        5,
+        7,
+    ]
+    assert bad_items == [3, 6]
+    assert len(calls) < 2 * 8
+
+
+@pytest.mark.anyio
+async def test_bisect_data_errors_raises_other_errors():
+    async def process(items: list[int]) -> list[int]:
+        raise ValueError("other")
+
+    async def on_bad_item(item: int, exc: Exception):
+        raise AssertionError("not a data error")
+
+    with pytest.raises(ValueError, match="other"):
+        await bisect_data_errors([1, 2], process, on_bad_item)
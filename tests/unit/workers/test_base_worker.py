@@ -1,7 +1,10 @@
+import orjson
 import pytest
+from redis import RedisError
 
 from app.constants import Action, CountryCode, Entity
 from app.schemas.buyable import BuyableCreateSchema, BuyableMessageSchema
+from app.utils import dump_to_json
 from app.workers import BuyableMessageWorker, Message
 from tests.msg_templator.base import entity_msg
 from tests.utils import custom_uuid
@@ -61,9 +64,24 @@ async def test_process_many_delete_messages_exception(
         )
     ]
 
-    await buyable_message_mock_worker.process_many_delete_messages(db_conn_mock, messages)
+    settled_ids = await buyable_message_mock_worker.process_many_delete_messages(
+        db_conn_mock, messages
+    )
     assert caplog.records[0].levelname == "ERROR"
-    assert caplog.messages[0] == "Error in process delete buyable messages"
+    assert caplog.messages[0] == (
+        "Pushing 1 buyables to dead-letter list dead-letter-buyable due to: Crud Error"
+    )
+    buyable_message_mock_worker.redis.lpush.assert_called_once()
+    # dead-lettered messages are acked
+    assert settled_ids == [custom_uuid(1)]
+
+    buyable_message_mock_worker.redis.lpush.side_effect = RedisError("Redis Error")
+    settled_ids = await buyable_message_mock_worker.process_many_delete_messages(
+        db_conn_mock, messages
+    )
+    assert caplog.messages[-1] == "Error in process delete buyable messages"
+    # messages neither deleted nor dead-lettered are left pending
+    assert settled_ids == []
 
 
 @pytest.mark.anyio
@@ -136,8 +154,208 @@ async def test_process_many_create_update_messages_exception(
         )
     ]
 
-    await buyable_message_mock_worker.process_many_create_update_messages(
+    settled_ids = await buyable_message_mock_worker.process_many_create_update_messages(
         db_conn_mock, messages
     )
     assert caplog.records[0].levelname == "ERROR"
-    assert caplog.messages[0] == "Error in process many create update buyable messages"
+    assert caplog.messages[0] == (
+        "Pushing 1 buyables to dead-letter list dead-letter-buyable due to: Crud Error"
+    )
+    buyable_message_mock_worker.redis.lpush.assert_called_once()
+    # dead-lettered messages are acked
+    assert settled_ids == [custom_uuid(1)]
+
+    buyable_message_mock_worker.redis.lpush.side_effect = RedisError("Redis Error")
+    settled_ids = await buyable_message_mock_worker.process_many_create_update_messages(
+        db_conn_mock, messages
+    )
+    assert caplog.messages[-1] == "Error in process many create update buyable messages"
+    # messages neither upserted nor dead-lettered are left pending
+    assert settled_ids == []
+
+
+def buyable_msg(action: Action, offer_id: int, version: int) -> bytes:
+    return dump_to_json(
+        entity_msg(
+            Entity.BUYABLE,
+            action,
+            {"offerId": str(custom_uuid(offer_id)), "version": version},
+        )
+    )
+
+
+@pytest.mark.anyio
+async def test_append_messages_to_buffer_keeps_newest_messages(
+    buyable_message_mock_worker: BuyableMessageWorker,
+):
+    worker = buyable_message_mock_worker
+    coalesced_before = worker.metrics.coalesced_entities._value.get()
+
+    await worker.append_messages_to_buffer(
+        [
+            buyable_msg(Action.UPDATE, 1, 3),
+            buyable_msg(Action.UPDATE, 1, 2),
+            b"invalid",
+            buyable_msg(Action.CREATE, 2, 1),
+            buyable_msg(Action.DELETE, 2, 2),
+            buyable_msg(Action.DELETE, 3, 1),
+            buyable_msg(Action.UPDATE, 3, 1),
+            buyable_msg(Action.UPDATE, 4, 1),
+        ]
+    )
+
+    assert {
+        msg.identifier: (msg.action, msg.version)
+        for msg in worker.messages_buffer.values()
+    } == {
+        custom_uuid(1): (Action.UPDATE, 3),
+        custom_uuid(2): (Action.DELETE, 2),
+        custom_uuid(3): (Action.DELETE, 1),
+        custom_uuid(4): (Action.UPDATE, 1),
+    }
+    assert worker.metrics.coalesced_entities._value.get() - coalesced_before == 3
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "invalid_data",
+    [
+        {"offerId": "not-uuid"},
+        {"offerId": ""},
+        {"version": "not-int"},
+        {"version": None},
+        {"action": "unknown"},
+    ],
+)
+async def test_append_messages_to_buffer_skips_invalid_messages(
+    buyable_message_mock_worker: BuyableMessageWorker, invalid_data: dict
+):
+    worker = buyable_message_mock_worker
+    invalid_before = worker.metrics.invalid_entities._value.get()
+    invalid_msg = orjson.loads(buyable_msg(Action.UPDATE, 2, 1))
+    invalid_msg.update(invalid_data)
+
+    await worker.append_messages_to_buffer(
+        [
+            buyable_msg(Action.UPDATE, 1, 1),
+            dump_to_json(invalid_msg),
+            buyable_msg(Action.UPDATE, 3, 1),
+        ],
+        ["ack-1", "ack-2", "ack-3"],
+    )
+
+    assert {msg.identifier: msg.ack_ids for msg in worker.messages_buffer.values()} == {
+        custom_uuid(1): ["ack-1"],
+        custom_uuid(3): ["ack-3"],
+    }
+    assert worker.pending_acks == ["ack-2"]
+    assert worker.metrics.invalid_entities._value.get() - invalid_before == 1
+
+
+@pytest.mark.anyio
+async def test_write_buffer_acks_only_settled_messages(
+    buyable_message_mock_worker: BuyableMessageWorker, mocker
+):
+    worker = buyable_message_mock_worker
+    worker.transport = mocker.AsyncMock()
+    await worker.append_transport_messages_to_buffer(
+        [
+            ("ack-1", buyable_msg(Action.UPDATE, 1, 1)),
+            ("ack-2", b"invalid"),
+            ("ack-3", buyable_msg(Action.UPDATE, 1, 2)),
+            ("ack-4", buyable_msg(Action.UPDATE, 2, 1)),
+        ]
+    )
+    # buyable 1 fails to be written and dead-lettered
+    mocker.patch.object(worker, "write_shard", return_value=[custom_uuid(2)])
+
+    await worker.process_messages_in_buffer_bulk()
+
+    worker.transport.ack.assert_awaited_once_with(["ack-2", "ack-4"])
+
+
+@pytest.mark.anyio
+async def test_buffer_is_flushed_by_count_bytes_and_linger(
+    buyable_message_mock_worker: BuyableMessageWorker,
+):
+    worker = buyable_message_mock_worker
+    worker.buffer_size = 3
+    worker.buffer_max_bytes = 0
+    worker.buffer_max_linger = 0
+    msgs = [buyable_msg(Action.UPDATE, i, 1) for i in range(3)]
+
+    await worker.append_transport_messages_to_buffer([(None, msgs[0])])
+    assert not worker.should_flush()
+    await worker.append_transport_messages_to_buffer([(None, msg) for msg in msgs[1:]])
+    assert worker.should_flush()
+
+    worker.take_buffer()
+    await worker.append_transport_messages_to_buffer([(None, msgs[0])])
+    worker.buffer_max_bytes = len(msgs[0]) * 2
+    assert not worker.should_flush()
+    await worker.append_transport_messages_to_buffer([(None, msgs[1])])
+    assert worker.should_flush()
+
+    worker.take_buffer()
+    worker.buffer_max_linger = 60
+    await worker.append_transport_messages_to_buffer([(None, msgs[0])])
+    assert not worker.should_flush()
+    assert worker.buffer_started_at is not None
+    worker.buffer_started_at -= 60
+    assert worker.should_flush()
+
+
+@pytest.mark.anyio
+async def test_take_buffer_observes_buffer_residence(
+    buyable_message_mock_worker: BuyableMessageWorker,
+):
+    worker = buyable_message_mock_worker
+    observed_before = worker.metrics.buffer_duration._sum.get()
+    await worker.append_transport_messages_to_buffer(
+        [("ack-1", buyable_msg(Action.UPDATE, 1, 1))]
+    )
+    assert worker.buffer_started_at is not None
+    worker.buffer_started_at -= 2
+
+    messages_buffer, ack_ids = worker.take_buffer()
+
+    assert list(messages_buffer) == [custom_uuid(1)]
+    assert messages_buffer[custom_uuid(1)].ack_ids == ["ack-1"]
+    # only ack ids of messages without entities are passed with the buffer
+    assert ack_ids == []
+    assert (worker.messages_buffer, worker.pending_acks) == ({}, [])
+    assert (worker.buffer_bytes, worker.buffer_started_at) == (0, None)
+    assert worker.metrics.buffer_duration._sum.get() - observed_before >= 2
+
+
+@pytest.mark.anyio
+async def test_worker_adapts_buffer_size(worker_settings, mocker):
+    worker_settings.WORKER_BUFFER_SIZE = 2
+    worker_settings.WORKER_ADAPTIVE_BUFFER_SIZE = True
+    worker_settings.WORKER_ADAPTIVE_MIN_BUFFER_SIZE = 1
+    worker_settings.WORKER_ADAPTIVE_MAX_BUFFER_AGE = 1
+    worker = BuyableMessageWorker(
+        Entity.BUYABLE,
+        worker_settings,
+        mocker.AsyncMock(),
+        mocker.AsyncMock(),
+        BuyableMessageSchema,
+    )
+    mocker.patch.object(worker, "write_buffer")
+    durations = iter([0, 0.2, 0, 0.1, 0, 0.1])
+    mocker.patch("app.workers.base.perf_counter", side_effect=lambda: next(durations))
+
+    for version in (1, 2):
+        await worker.append_transport_messages_to_buffer(
+            [(None, buyable_msg(Action.UPDATE, i, version)) for i in range(2)]
+        )
+        await worker.process_messages_in_buffer_bulk()
+    assert worker.buffer_size == 3
+
+    await worker.append_transport_messages_to_buffer(
+        [(None, buyable_msg(Action.UPDATE, 1, 2))]
+    )
+    assert worker.buffer_started_at is not None
+    worker.buffer_started_at -= 2
+    await worker.process_messages_in_buffer_bulk()
+    assert worker.buffer_size == 1
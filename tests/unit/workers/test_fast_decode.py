@@ -0,0 +1,68 @@
+import pytest
+
+from app.constants import Action, Entity
+from app.workers import WORKER_CLASS_MAP
+from app.workers.base import BaseMessageWorker
+from tests.msg_templator.base import entity_msg
+from tests.utils import custom_uuid
+
+ENTITY_MSG_VARIANTS: dict[Entity, list[dict]] = {
+    Entity.OFFER: [
+        {"id": str(custom_uuid(1)), "productId": str(custom_uuid(2)), "version": 1},
+        {
+            "prices": [
+                {"type": "discount", "amount": 1, "currencyCode": "EUR"},
+                {"type": "regular", "amount": "123.45", "currencyCode": "CZK"},
+            ],
+            "legacy": {"countryCode": "CZ"},
+        },
+        {"productId": ""},
+    ],
+    Entity.SHOP: [
+        {"shop": {"state": {"verified": None, "paying": False, "enabled": True}}},
+        {"shop": {"certificate": {"enabled": None}, "legacy": {"countryCode": "SK"}}},
+    ],
+    Entity.AVAILABILITY: [
+        {"availability": {"stockInfo": "IN_STOCK"}},
+        {"availability": {"stockInfo": "OUT_OF_STOCK"}, "version": "12"},
+    ],
+    Entity.BUYABLE: [{"buyable": True}, {"buyable": False}],
+}
+
+
+@pytest.fixture
+def entity_worker(worker_settings, entity: Entity, mocker) -> BaseMessageWorker:
+    worker_class, message_schema = WORKER_CLASS_MAP[entity]
+    return worker_class(
+        entity, worker_settings, mocker.AsyncMock(), mocker.AsyncMock(), message_schema
+    )
+
+
+def message_schemas(worker: BaseMessageWorker, entity: Entity) -> list:
+    return worker.to_message_schemas(
+        [
+            worker.to_message(entity_msg(entity, Action.UPDATE, variant))  # type: ignore[arg-type]
+            for variant in ENTITY_MSG_VARIANTS[entity]
+        ]
+    )
+
+
+@pytest.mark.parametrize("entity", list(Entity))
+def test_fast_decode_matches_create_schemas(
+    entity_worker: BaseMessageWorker, entity: Entity
+):
+    for message in message_schemas(entity_worker, entity):
+        try:
+            expected = entity_worker.to_create_schema(message)
+        except ValueError:
+            with pytest.raises(ValueError):
+                entity_worker.to_create_schema_fast(message)
+            continue
+
+        create_schema = entity_worker.to_create_schema_fast(message)
+        assert create_schema == expected
+        assert create_schema.model_fields_set == expected.model_fields_set
+        assert hash(create_schema) == hash(expected)
+        assert [(k, type(v)) for k, v in create_schema] == [
+            (k, type(v)) for k, v in expected
+        ]
@@ -143,7 +143,7 @@ async def push_messages_and_process_them_by_worker(
     worker.redis_pop_timeout = 0.01
     worker.should_consume = True
     consuming_task = asyncio.create_task(worker.consume_and_process_messages())
-    redis_list = f"rmq-{worker.entity.value}"
+    redis_list = worker.transport.queue_names[0]
 
     await push_redis_messages(
         worker_redis,